@@ -0,0 +1,97 @@
+# Benchmark of the size on disk and the lookup latency of the article archive, compared to the JSON formats
+# Run from the repository root with: python -m benchmarks.bench_archive [articles]
+# Imports
+import os, random, statistics, sys, tempfile, time
+
+# Include classes and subfolders
+from src.crawler.output import JSONLinesOutput, readJSONLines
+from src.crawler.archive import ArchiveOutput, ArchiveReader, zstandard
+
+# Benchmark settings
+ARTICLES = 20000
+LOOKUPS = 2000 # Random lookups by url in the archive
+SCAN_LOOKUPS = 20 # Lookups by scanning the JSON Lines file, which reads the file up to the article
+PARAGRAPHS = 12 # Paragraphs of each article
+WORDS = ('og i at det er en til på som de med han af for ikke der var mig sig men har om vi min havde ham hun nu '
+    'over da fra du ud sin dem os op man hans hvor eller hvad skal selv her alle vil blev kunne ind når være dog '
+    'regeringen politiet borgerne kommunen minister Danmark København Aarhus folketinget sagen ifølge fortæller '
+    'onsdag torsdag fredag millioner kroner procent undersøgelse eksperter samfund sport udland politik').split()
+
+def makeArticles(count, seed = 1):
+    # Articles with Danish-like text, the words are drawn with a skewed distribution like real text
+    generator = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(WORDS))]
+    catagories = ['samfund', 'politik', 'udland', 'sport', 'underholdning']
+    for number in range(count):
+        catagory = catagories[number % len(catagories)]
+        paragraphs = [' '.join(generator.choices(WORDS, weights, k = generator.randint(25, 60))).capitalize() + '.' for _ in range(PARAGRAPHS)]
+        yield {
+            'newspaper': 'B.T.',
+            'url': 'https://www.bt.dk/' + catagory + '/artikel-' + str(number),
+            'metainfo': {
+                'catagory': catagory
+            },
+            'title': ' '.join(generator.choices(WORDS, weights, k = 8)).capitalize(),
+            'content': ' '.join(paragraphs)
+        }
+
+def _quantiles(latencies):
+    cuts = statistics.quantiles(latencies, n = 100, method = 'inclusive')
+    return cuts[49], cuts[98]
+
+def _fileSize(*fileNames):
+    return sum(os.path.getsize(fileName) for fileName in fileNames)
+
+def run(articles = ARTICLES):
+    results = []
+    urls = [articleEntry['url'] for articleEntry in makeArticles(articles)]
+    lookupUrls = random.Random(2).choices(urls, k = LOOKUPS)
+    with tempfile.TemporaryDirectory() as directory:
+        # The JSON Lines output, looked up by scanning
+        fileName = os.path.join(directory, 'articles.jsonl')
+        output = JSONLinesOutput(fileName, flushEvery = 0)
+        for articleEntry in makeArticles(articles):
+            output.write(articleEntry)
+        output.close()
+        latencies = []
+        for url in lookupUrls[:SCAN_LOOKUPS]:
+            start = time.perf_counter()
+            next(articleEntry for articleEntry in readJSONLines(fileName) if articleEntry['url'] == url)
+            latencies.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        sum(1 for articleEntry in readJSONLines(fileName) if articleEntry['title'])
+        results.append(_result('jsonl', _fileSize(fileName), latencies, time.perf_counter() - start))
+        # The archive with each installed codec
+        for compression in ['gzip'] + (['zstd'] if zstandard else []):
+            fileName = os.path.join(directory, 'articles.' + compression)
+            output = ArchiveOutput(fileName, compression)
+            for articleEntry in makeArticles(articles):
+                output.write(articleEntry)
+            output.close()
+            with ArchiveReader(fileName) as reader:
+                latencies = []
+                for url in lookupUrls:
+                    start = time.perf_counter()
+                    reader.get(url)
+                    latencies.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                sum(1 for articleEntry in reader.iterArticles(withContent = False) if articleEntry['title'])
+                results.append(_result('archive ' + compression, _fileSize(fileName, fileName + '.content', fileName + '.index'), latencies, time.perf_counter() - start))
+    return results
+
+def _result(name, size, latencies, titleScanSeconds):
+    p50, p99 = _quantiles(latencies)
+    return {
+        'format': name,
+        'bytes': size,
+        'lookupP50Seconds': p50,
+        'lookupP99Seconds': p99,
+        'titleScanSeconds': titleScanSeconds
+    }
+
+if __name__ == '__main__':
+    articles = int(sys.argv[1]) if len(sys.argv) > 1 else ARTICLES
+    print('Articles: ' + str(articles))
+    for result in run(articles):
+        print('{:>13}  size: {:8.1f} MiB  lookup p50: {:9.3f} ms  p99: {:9.3f} ms  title scan: {:6.2f} s'.format(
+            result['format'], result['bytes'] / 1024 / 1024, result['lookupP50Seconds'] * 1000, result['lookupP99Seconds'] * 1000, result['titleScanSeconds']))
@@ -0,0 +1,45 @@
+# Benchmark of the downloads avoided by URL canonicalization, measured on a link corpus
+# Run from the repository root with: python -m benchmarks.bench_canonical [directory of saved B.T. .html pages]
+# Without a directory, pages generated by the local benchmark site with link variants are used.
+# Imports
+import sys, time
+
+# Include classes and subfolders
+from src.newspapers.bt import BT
+from benchmarks.localsite import LocalSite
+from benchmarks.bench_parser import loadCorpus
+
+# Benchmark settings
+GENERATED_PAGES = 500
+
+def _generateCorpus():
+    # Render pages with link variants, linking to B.T. URLs
+    site = LocalSite(GENERATED_PAGES, fanOut = 40, variants = True)
+    site.getUrl = lambda: BT.NEWSPAPER_URL
+    return [site.renderArticle(number) for number in range(GENERATED_PAGES)]
+
+def run(corpus):
+    # Collect the links the crawler would queue from each page
+    links = []
+    for number, html in enumerate(corpus):
+        links.extend(BT(BT.NEWSPAPER_URL + '/samfund/side-' + str(number), html).getLinkedArticles())
+    start = time.perf_counter()
+    canonicalLinks = set(BT.canonicalizeUrl(link) for link in links)
+    elapsed = time.perf_counter() - start
+    rawLinks = set(links)
+    return {
+        'links': len(links),
+        'distinctRaw': len(rawLinks),
+        'distinctCanonical': len(canonicalLinks),
+        'fetchesAvoided': len(rawLinks) - len(canonicalLinks),
+        'usPerLink': elapsed / max(1, len(links)) * 1e6
+    }
+
+if __name__ == '__main__':
+    corpus = loadCorpus(sys.argv[1]) if len(sys.argv) > 1 else _generateCorpus()
+    result = run(corpus)
+    print('Links in corpus: {}'.format(result['links']))
+    print('Distinct URLs without canonicalization: {}'.format(result['distinctRaw']))
+    print('Distinct canonical URLs: {}'.format(result['distinctCanonical']))
+    print('Downloads avoided: {} ({:.1f}%)'.format(result['fetchesAvoided'], 100 * result['fetchesAvoided'] / max(1, result['distinctRaw'])))
+    print('Canonicalization cost: {:.1f} us per link'.format(result['usPerLink']))
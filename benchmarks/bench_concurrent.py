@@ -0,0 +1,48 @@
+# Benchmark of crawl throughput against a local site with artificial latency, for a range of worker counts
+# Run from the repository root with: python -m benchmarks.bench_concurrent
+# Imports
+import contextlib, os, sys, tempfile, time
+
+# Include classes and subfolders
+from main import Crawler
+from benchmarks.localsite import LocalSite
+
+# Benchmark settings
+WORKER_COUNTS = [1, 2, 4, 8, 16]
+ARTICLES = 200 # Articles on the local site
+LATENCY = 0.05 # Seconds of latency added to each response
+
+def crawl(site, workers, parseProcesses = None):
+    # Create a crawler that only knows the local newspaper, without crawl delay
+    class BenchCrawler(Crawler):
+        NEWSPAPERS = [site.makeNewspaper()]
+        CRAWL_DELAY = 0
+        MIN_CRAWL_DELAY = 0
+        MAX_FETCHES_PER_HOST = workers
+    with tempfile.TemporaryDirectory() as directory:
+        crawler = BenchCrawler(os.path.join(directory, 'articles.jsonl'), storeQueue = False, outputFormat = 'jsonl')
+        crawler.addArticle(site.getUrl() + '/')
+        start = time.perf_counter()
+        # Hide the status output of the crawler
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            crawler.run(workers, parseProcesses)
+        elapsed = time.perf_counter() - start
+        crawler.finalize()
+    pages = len(crawler._queue)
+    return {
+        'workers': workers,
+        'pages': pages,
+        'pagesPerSecond': pages / elapsed
+    }
+
+def run(workerCounts = WORKER_COUNTS):
+    site = LocalSite(ARTICLES, latency = LATENCY).start()
+    try:
+        return [crawl(site, workers) for workers in workerCounts]
+    finally:
+        site.stop()
+
+if __name__ == '__main__':
+    workerCounts = [int(workers) for workers in sys.argv[1:]] or WORKER_COUNTS
+    for result in run(workerCounts):
+        print('Workers: {:>3}  pages: {:>5}  pages/sec: {:7.1f}'.format(result['workers'], result['pages'], result['pagesPerSecond']))
@@ -0,0 +1,53 @@
+# Benchmark of the near duplicate index lookup cost as the number of stored fingerprints grows
+# Run from the repository root with: python -m benchmarks.bench_dedup
+# Imports
+import random, sys, time
+
+# Include classes and subfolders
+from src.crawler.dedup import SimHashIndex, simHash
+
+# Benchmark settings
+INDEX_SIZES = [10000, 100000, 1000000]
+LOOKUPS = 20000 # Lookups timed at each size, half near duplicates and half new fingerprints
+
+def _flipBits(fingerprint, bits):
+    for bit in random.sample(range(64), bits):
+        fingerprint ^= 1 << bit
+    return fingerprint
+
+def run(indexSizes = INDEX_SIZES):
+    random.seed(1)
+    results = []
+    index = SimHashIndex()
+    stored = []
+    for indexSize in indexSizes:
+        # Fill the index with random fingerprints
+        while len(index) < indexSize:
+            fingerprint = random.getrandbits(64)
+            index.add(fingerprint, len(stored))
+            stored.append(fingerprint)
+        # Near duplicates of stored fingerprints, and unrelated fingerprints
+        lookups = [_flipBits(random.choice(stored), 3) for _ in range(LOOKUPS // 2)]
+        lookups += [random.getrandbits(64) for _ in range(LOOKUPS // 2)]
+        start = time.perf_counter()
+        found = sum(1 for fingerprint in lookups if index.find(fingerprint) is not None)
+        elapsed = time.perf_counter() - start
+        results.append({
+            'fingerprints': indexSize,
+            'usPerLookup': elapsed / LOOKUPS * 1e6,
+            'found': found
+        })
+    # Cost of fingerprinting an article of about 600 words
+    article = {'title': 'Titel', 'content': ' '.join('ord' + str(random.randrange(3000)) for _ in range(600))}
+    start = time.perf_counter()
+    for _ in range(100):
+        simHash(article)
+    return results, (time.perf_counter() - start) / 100 * 1e6
+
+if __name__ == '__main__':
+    sizes = [int(size) for size in sys.argv[1:]] or INDEX_SIZES
+    results, usPerSimHash = run(sizes)
+    for result in results:
+        print('Fingerprints: {:>8}  lookup: {:6.1f} us  near duplicates found: {} of {}'.format(
+            result['fingerprints'], result['usPerLookup'], result['found'], LOOKUPS // 2))
+    print('SimHash of a 600 word article: {:.1f} us'.format(usPerSimHash))
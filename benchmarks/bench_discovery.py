@@ -0,0 +1,96 @@
+# Benchmark of the requests needed to find the articles of the local site, by following the links of the
+# front page and section index pages, and by reading the sitemap. A second pass counts the requests of a
+# recrawl after a share of the articles changed, and the version records written for the changed articles. The
+# sitemap crawl is run both without and through the response cache, which must not hide the changed articles
+# Run from the repository root with: python -m benchmarks.bench_discovery [articles]
+# Imports
+import contextlib, os, sys, tempfile, time
+
+# Include classes and subfolders
+from main import Crawler
+from benchmarks.localsite import LocalSite
+from src.newspapers.newspaper import Newspaper
+from src.newspapers.transport import Transport
+from src.newspapers.cache import ResponseCache
+
+# Benchmark settings
+ARTICLES = 2000 # Articles on the local site
+FAN_OUT = 5 # Article links on each page
+SECTIONS = 200 # Section index pages linked from the front page
+CHANGED = 20 # Articles changed before the second pass
+WORKERS = 8
+
+def countArticles(crawler):
+    # New articles, and changed articles downloaded again
+    counters = crawler.getMetrics().snapshot()['counters']
+    return crawler._downloadedArticles + counters.get('changes_total', 0)
+
+def countVersions(crawler):
+    # Version records written for the changed articles
+    return crawler.getMetrics().snapshot()['counters'].get('versions_total', 0)
+
+def crawl(site, newspaper, discover, articles, cache):
+    # Create a crawler that only knows the given local newspaper, without crawl delay
+    class BenchCrawler(Crawler):
+        NEWSPAPERS = [newspaper]
+        CRAWL_DELAY = 0
+        MIN_CRAWL_DELAY = 0
+        MAX_FETCHES_PER_HOST = WORKERS
+        PRINT_STATUS = False
+    # The recrawl stands in for the next discovery interval, when the cached sitemaps are asked for again
+    BenchCrawler.DISCOVERY_CACHE_TTL = 0
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        transport = Transport(cache = ResponseCache(os.path.join(directory, 'cache'))) if cache else Transport()
+        Newspaper.setTransport(transport)
+        crawler = BenchCrawler(os.path.join(directory, 'articles.jsonl'), storeQueue = False, outputFormat = 'jsonl')
+        for passNumber in range(2):
+            if passNumber:
+                # Change some articles, and find them again
+                for number in range(0, articles, max(articles // CHANGED, 1)):
+                    site.changeArticle(number)
+            requestsBefore = site.getRequestCount()
+            articlesBefore = countArticles(crawler)
+            versionsBefore = countVersions(crawler)
+            start = time.perf_counter()
+            # Hide the status output of the crawler
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                if discover:
+                    crawler.discoverArticles()
+                elif passNumber:
+                    # Without lastmods, finding changes means downloading the index pages again
+                    for queueEntry in list(crawler._queue.getEntries()):
+                        if queueEntry['status'] == Crawler.URLStatus.ISINDEX:
+                            crawler._queue.requeue(queueEntry)
+                else:
+                    crawler.addArticle(site.getUrl() + '/')
+                crawler.run(WORKERS)
+            results.append({
+                'name': ('sitemap' if discover else 'links') + (' cached' if cache else '') + (' recrawl' if passNumber else ''),
+                'requests': site.getRequestCount() - requestsBefore,
+                'articles': countArticles(crawler) - articlesBefore,
+                'versions': countVersions(crawler) - versionsBefore,
+                'seconds': time.perf_counter() - start
+            })
+        crawler.finalize()
+        transport.close()
+    return results
+
+def run(articles = ARTICLES):
+    # Each crawl gets a fresh site, so the request counts and changed articles are its own
+    results = []
+    for discover, cache in ((False, False), (True, False), (True, True)):
+        site = LocalSite(articles, FAN_OUT, sections = SECTIONS).start()
+        try:
+            newspaper = site.makeSitemapNewspaper() if discover else site.makeNewspaper()
+            results += crawl(site, newspaper, discover, articles, cache)
+        finally:
+            site.stop()
+    return results
+
+if __name__ == '__main__':
+    articles = int(sys.argv[1]) if len(sys.argv) > 1 else ARTICLES
+    print('Articles: ' + str(articles))
+    for result in run(articles):
+        print('{:>22}  requests: {:>6}  articles: {:>6}  version records: {:>4}  requests per article: {:6.2f}  seconds: {:6.2f}'.format(
+            result['name'], result['requests'], result['articles'], result['versions'], result['requests'] / max(result['articles'], 1), result['seconds']))
@@ -0,0 +1,79 @@
+# Benchmark of the content text extraction of a single article, comparing the string building of the old
+# BT.getContent to the shared TextExtractor, for normal articles and long live blogs
+# Run from the repository root with: python -m benchmarks.bench_extract
+# Imports
+import time
+
+# Include classes and subfolders
+from src.newspapers import parser
+from src.newspapers.bt import BT
+from src.newspapers.text import TextExtractor
+
+# Benchmark settings
+ARTICLE_SIZES = [12, 200, 2000] # Paragraphs of each article, the largest like a long live blog
+REPEATS = 20 # Extractions of each article
+
+def makeArticle(paragraphs):
+    # Paragraphs of text, with a photo credit and a 'Vis mere' link now and then
+    html = ['<html><body><h1 class="article-title">Live: Følg dagens udvikling</h1><div class="article-content">']
+    for number in range(paragraphs):
+        if number % 10 == 5:
+            html.append('<p>Foto: Ritzau Scanpix</p>')
+        elif number % 10 == 9:
+            html.append('<p><a href="/live">Vis mere</a></p>')
+        else:
+            html.append('<p>  Opdatering {}: Regeringen fremlægger i dag et udspil, der skal styrke sammenhængskraften i samfundet. <b>Læs mere</b> her.\n</p>'.format(number))
+    html.append('</div></body></html>')
+    return ''.join(html).encode('utf-8')
+
+def _legacyGetContent(contentArray):
+    # The string building of BT.getContent before the TextExtractor, on soup elements like the example newspaper
+    articleContentText = ""
+    for content in contentArray:
+        try:
+            content.text.index('Foto: ')
+            continue
+        except: pass
+        try:
+            content.text.index('Vis mere')
+            continue
+        except: pass
+        articleContentText += content.text.strip() + " "
+    return articleContentText
+
+def _time(function, argument):
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        function(argument)
+    return (time.perf_counter() - start) / REPEATS * 1e6
+
+def run(articleSizes = ARTICLE_SIZES):
+    # The extractor with the same output as the legacy code, and with the normalization used by BT
+    extractor = TextExtractor(BT.CONTENT_SKIP_RULES)
+    normalizingExtractor = TextExtractor(BT.CONTENT_SKIP_RULES, BT.NORMALIZE_WHITESPACE, BT.UNICODE_FORM)
+    results = []
+    for paragraphs in articleSizes:
+        html = makeArticle(paragraphs)
+        elements = parser.makeSoup(html).find(class_ = BT.CONTENT_CLASS).find_all('p')
+        texts = parser.extractPage(html, BT.TITLE_CLASS, BT.CONTENT_CLASS).paragraphs
+        results.append({
+            'paragraphs': paragraphs,
+            'legacySoupUs': _time(_legacyGetContent, elements),
+            'extractorSoupUs': _time(extractor.extract, elements),
+            'legacyTextUs': _time(_legacyGetContent, [_Text(text) for text in texts]),
+            'extractorTextUs': _time(extractor.extract, texts),
+            'normalizingTextUs': _time(normalizingExtractor.extract, texts)
+        })
+    return results
+
+# _Text class definition
+# A string with the text attribute of a soup element, so the legacy code can run on extracted paragraphs
+class _Text(str):
+    @property
+    def text(self):
+        return self
+
+if __name__ == '__main__':
+    for result in run():
+        print('Paragraphs: {:>5}  soup elements: legacy {:9.1f} us  extractor {:9.1f} us   extracted text: legacy {:9.1f} us  extractor {:9.1f} us  normalizing {:9.1f} us'.format(
+            result['paragraphs'], result['legacySoupUs'], result['extractorSoupUs'], result['legacyTextUs'], result['extractorTextUs'], result['normalizingTextUs']))
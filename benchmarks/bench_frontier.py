@@ -0,0 +1,62 @@
+# Benchmark of the per-page enqueue cost of the frontier as the queue grows
+# Run from the repository root with: python -m benchmarks.bench_frontier
+# Imports
+import time, sys
+
+# Include classes and subfolders
+from src.crawler.frontier import Frontier
+from src.crawler.scheduler import PriorityFrontier
+
+# Frontiers compared, by name
+FRONTIERS = {
+    'fifo': Frontier,
+    'priority': PriorityFrontier
+}
+
+# Benchmark settings
+QUEUE_SIZES = [1000, 10000, 100000, 1000000]
+LINKS_PER_PAGE = 200 # Number of links found on a page, about what a B.T. front page holds
+KNOWN_LINK_RATIO = 0.5 # Share of the links on a page that are already queued
+PAGES = 200 # Pages enqueued at each queue size
+
+def _makeUrl(number):
+    return 'https://www.bt.dk/samfund/article-' + str(number)
+
+def _makePage(frontier, nextUrl):
+    # Mix links already in the queue with new links
+    knownLinks = int(LINKS_PER_PAGE * KNOWN_LINK_RATIO)
+    page = [_makeUrl(i * 7919 % len(frontier)) for i in range(nextUrl, nextUrl + knownLinks)]
+    page += [_makeUrl(i) for i in range(nextUrl, nextUrl + LINKS_PER_PAGE - knownLinks)]
+    return page
+
+def run(queueSizes = QUEUE_SIZES, frontierClass = Frontier):
+    results = []
+    frontier = frontierClass()
+    nextUrl = 0
+    for queueSize in queueSizes:
+        # Grow the queue to the wanted size
+        while len(frontier) < queueSize:
+            frontier.add(_makeUrl(nextUrl))
+            nextUrl += 1
+        # Build the pages up front, so only the enqueue is timed
+        pages = []
+        for _ in range(PAGES):
+            pages.append(_makePage(frontier, nextUrl))
+            nextUrl += LINKS_PER_PAGE
+        # Time the enqueue of each page, including marking one entry as downloaded
+        start = time.perf_counter()
+        for page in pages:
+            frontier.addMany(page, 1)
+            frontier.updateStatus(frontier.getNext(), 1)
+        elapsed = time.perf_counter() - start
+        results.append({
+            'queueSize': queueSize,
+            'usPerPage': elapsed / PAGES * 1e6
+        })
+    return results
+
+if __name__ == '__main__':
+    sizes = [int(size) for size in sys.argv[1:]] or QUEUE_SIZES
+    for name, frontierClass in FRONTIERS.items():
+        for result in run(sizes, frontierClass):
+            print('Frontier: {:>8}  queue size: {:>9}  enqueue cost per page: {:8.1f} us'.format(name, result['queueSize'], result['usPerPage']))
@@ -0,0 +1,58 @@
+# Benchmark of the startup time of a resumed crawl, loading a queue snapshot and replaying the journal
+# Run from the repository root with: python -m benchmarks.bench_journal [queue size]
+# Imports
+import os, sys, tempfile, time
+
+# Include classes and subfolders
+from src.crawler.journal import QueueJournal
+from src.crawler.urlstatus import URLStatus
+
+# Benchmark settings
+QUEUE_SIZE = 1000000 # URLs in the queue snapshot
+JOURNAL_EVENTS = [0, 100000, 500000] # Events in the journal after the snapshot
+
+def _makeUrl(number):
+    return 'https://www.bt.dk/samfund/article-' + str(number)
+
+def _writeCrawl(directory, queueSize, journalEvents):
+    snapshotFile = os.path.join(directory, '.queue')
+    journalFile = os.path.join(directory, '.queue.journal')
+    for fileName in (snapshotFile, journalFile):
+        if os.path.exists(fileName):
+            os.remove(fileName)
+    # Build the snapshot
+    journal = QueueJournal(snapshotFile, journalFile)
+    frontier = journal.load()
+    frontier.setJournal(None)
+    frontier.addMany(_makeUrl(number) for number in range(queueSize))
+    journal.snapshot(frontier)
+    # Log the journal events, half new links and half status changes
+    frontier.setJournal(journal)
+    for number in range(journalEvents // 2):
+        frontier.updateStatus(frontier.getNext(), URLStatus.DOWNLOADED)
+        frontier.add(_makeUrl(queueSize + number))
+    journal.close()
+    return snapshotFile, journalFile
+
+def run(queueSize = QUEUE_SIZE, journalEvents = JOURNAL_EVENTS):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for events in journalEvents:
+            snapshotFile, journalFile = _writeCrawl(directory, queueSize, events)
+            # Time the resume
+            start = time.perf_counter()
+            journal = QueueJournal(snapshotFile, journalFile)
+            frontier = journal.load()
+            elapsed = time.perf_counter() - start
+            journal.close()
+            results.append({
+                'queueSize': len(frontier),
+                'journalEvents': events,
+                'startupSeconds': elapsed
+            })
+    return results
+
+if __name__ == '__main__':
+    queueSize = int(sys.argv[1]) if len(sys.argv) > 1 else QUEUE_SIZE
+    for result in run(queueSize):
+        print('Queue size: {:>9}  journal events: {:>7}  startup: {:6.2f} s'.format(result['queueSize'], result['journalEvents'], result['startupSeconds']))
@@ -0,0 +1,67 @@
+# Micro-benchmark of the compiled path matcher against a list scan, for growing numbers of rules
+# Run from the repository root with: python -m benchmarks.bench_matcher
+# Imports
+import random, time
+
+# Include classes and subfolders
+from src.newspapers.matcher import PathMatcher
+from src.newspapers.bt import BT
+
+# Benchmark settings
+LINKS = 100000
+RULE_COUNTS = [len(BT.EXCLUDE_SUBPATHS), 100, 300, 600]
+
+def _makeRules(count):
+    # The B.T. rules, extended with prefix rules and a few globs and regexes
+    rules = list(BT.EXCLUDE_SUBPATHS)
+    number = 0
+    while len(rules) < count:
+        if number % 20 == 0:
+            rules.append('/*/galleri-' + str(number) + '/*')
+        elif number % 50 == 1:
+            rules.append('re:/arkiv-' + str(number) + r'/\d+')
+        else:
+            rules.append('/sektion-' + str(number) + '/')
+        number += 1
+    return rules
+
+def _makeLinks():
+    random.seed(1)
+    categories = ['samfund', 'sport', 'underholdning', 'royale', 'podcast', 'tip', 'sektion-' + str(random.randrange(600))]
+    return ['/' + random.choice(categories) + '/artikel-' + str(number) for number in range(LINKS)]
+
+def _listScan(rules, path):
+    # A prefix scan over all rules, the cost grows with the number of rules
+    for rule in rules:
+        if path.startswith(rule):
+            return True
+    return False
+
+def run():
+    links = _makeLinks()
+    results = []
+    for count in RULE_COUNTS:
+        rules = _makeRules(count)
+        start = time.perf_counter()
+        matcher = PathMatcher(rules)
+        compileTime = time.perf_counter() - start
+        start = time.perf_counter()
+        matched = sum(1 for path in links if matcher.matches(path))
+        matcherTime = time.perf_counter() - start
+        prefixRules = [rule for rule in rules if not rule.startswith('re:') and '*' not in rule]
+        start = time.perf_counter()
+        sum(1 for path in links if _listScan(prefixRules, path))
+        scanTime = time.perf_counter() - start
+        results.append({
+            'rules': count,
+            'matched': matched,
+            'compileMs': compileTime * 1000,
+            'matcherNsPerLink': matcherTime / LINKS * 1e9,
+            'listScanNsPerLink': scanTime / LINKS * 1e9
+        })
+    return results
+
+if __name__ == '__main__':
+    for result in run():
+        print('Rules: {:>4}  matched: {:>6}  compile: {:6.2f} ms  matcher: {:7.0f} ns/link  list scan of the prefix rules: {:7.0f} ns/link'.format(
+            result['rules'], result['matched'], result['compileMs'], result['matcherNsPerLink'], result['listScanNsPerLink']))
@@ -0,0 +1,50 @@
+# Benchmark of the per-article write latency of the output formats as the output grows
+# Run from the repository root with: python -m benchmarks.bench_output
+# Imports
+import os, sys, tempfile, time
+
+# Include classes and subfolders
+from src.crawler.output import JSONArrayOutput, JSONLinesOutput
+
+# Benchmark settings
+ARTICLES = 100000 # Articles written with the streaming output
+LEGACY_ARTICLES = 1000 # Articles written with the JSON array output, which grows quadratically
+REPORT_EVERY = 10000 # Number of articles in each reported window
+
+def _makeArticle(number):
+    return {
+        'newspaper': 'B.T.',
+        'url': 'https://www.bt.dk/samfund/article-' + str(number),
+        'metainfo': {'catagory': 'samfund'},
+        'title': 'Artikel nummer ' + str(number),
+        'content': 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 40
+    }
+
+def _timeWrites(output, articles, reportEvery):
+    # Time each window of writes and return the average latency per article in each window
+    windows = []
+    start = time.perf_counter()
+    for number in range(articles):
+        output.write(_makeArticle(number))
+        if (number + 1) % reportEvery == 0:
+            now = time.perf_counter()
+            windows.append({
+                'articles': number + 1,
+                'usPerArticle': (now - start) / reportEvery * 1e6
+            })
+            start = now
+    output.close()
+    return windows
+
+def run(articles = ARTICLES, legacyArticles = LEGACY_ARTICLES):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        results['jsonl'] = _timeWrites(JSONLinesOutput(os.path.join(directory, 'articles.jsonl')), articles, REPORT_EVERY)
+        results['json'] = _timeWrites(JSONArrayOutput(os.path.join(directory, 'articles.json')), legacyArticles, legacyArticles // 4)
+    return results
+
+if __name__ == '__main__':
+    articles = int(sys.argv[1]) if len(sys.argv) > 1 else ARTICLES
+    for outputFormat, windows in run(articles).items():
+        for window in windows:
+            print('{:>5}  articles: {:>7}  write latency per article: {:10.1f} us'.format(outputFormat, window['articles'], window['usPerArticle']))
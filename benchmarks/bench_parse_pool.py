@@ -0,0 +1,41 @@
+# Benchmark of the parse stage throughput in a process pool, for a range of process counts
+# Run from the repository root with: python -m benchmarks.bench_parse_pool [directory of saved .html pages]
+# Imports
+import os, sys, time
+from concurrent.futures import ProcessPoolExecutor
+
+# Include classes and subfolders
+from src.crawler.pipeline import parsePage
+from benchmarks.localsite import LocalBT
+from benchmarks.bench_parser import loadCorpus
+
+# Benchmark settings
+PROCESS_COUNTS = sorted({1, 2, 4, os.cpu_count() or 1})
+REPEATS = 3 # Passes over the corpus
+
+# Parse with the pure Python parser, the slowest and most CPU-bound backend
+class SoupBT(LocalBT):
+    PARSER_BACKEND = 'html.parser'
+
+def run(corpus, processCounts = PROCESS_COUNTS):
+    results = []
+    urls = [SoupBT.NEWSPAPER_URL + '/samfund/artikel-' + str(number) for number in range(len(corpus))]
+    for processes in processCounts:
+        with ProcessPoolExecutor(max_workers = processes) as pool:
+            # Start the processes before timing
+            list(pool.map(parsePage, [SoupBT], urls[:1], corpus[:1]))
+            start = time.perf_counter()
+            for _ in range(REPEATS):
+                list(pool.map(parsePage, [SoupBT] * len(corpus), urls, corpus, chunksize = 8))
+            elapsed = time.perf_counter() - start
+        results.append({
+            'processes': processes,
+            'pagesPerSecond': len(corpus) * REPEATS / elapsed
+        })
+    return results
+
+if __name__ == '__main__':
+    corpus = loadCorpus(sys.argv[1] if len(sys.argv) > 1 else None)
+    print('Pages in corpus: {}  cores: {}'.format(len(corpus), os.cpu_count()))
+    for result in run(corpus):
+        print('Processes: {:>3}  pages/sec: {:8.1f}'.format(result['processes'], result['pagesPerSecond']))
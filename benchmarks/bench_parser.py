@@ -0,0 +1,79 @@
+# Benchmark of the parser backends over a corpus of saved pages, comparing throughput and peak memory
+# Run from the repository root with: python -m benchmarks.bench_parser [directory of saved .html pages]
+# Without a directory, pages generated by the local benchmark site are used.
+# Peak memory is measured with tracemalloc, which does not see memory allocated inside C extensions.
+# Imports
+import os, sys, time, tracemalloc
+
+# Include classes and subfolders
+from src.newspapers import parser
+from src.newspapers.bt import BT
+from benchmarks.localsite import LocalSite
+
+# Benchmark settings
+GENERATED_PAGES = 300 # Pages generated when no corpus is given
+REPEATS = 3 # Passes over the corpus for the throughput measurement
+
+def loadCorpus(directory = None):
+    if directory is None:
+        # Render pages from the local site without starting the server
+        site = LocalSite(GENERATED_PAGES, fanOut = 150)
+        site.getUrl = lambda: BT.NEWSPAPER_URL
+        return [site.renderArticle(number) for number in range(GENERATED_PAGES)]
+    corpus = []
+    for fileName in sorted(os.listdir(directory)):
+        if fileName.endswith('.html') or fileName.endswith('.htm'):
+            with open(os.path.join(directory, fileName), 'rb') as pageFile:
+                corpus.append(pageFile.read())
+    return corpus
+
+def _soupExtract(html, backend):
+    # The three walks of the BeautifulSoup tree done by BT before the single pass extraction
+    soup = parser.makeSoup(html, backend)
+    soup.find(class_ = BT.TITLE_CLASS)
+    content = soup.find(class_ = BT.CONTENT_CLASS)
+    if content:
+        content.find_all('p')
+    soup.find_all('a')
+
+def _streamExtract(html, backend):
+    parser.extractPage(html, BT.TITLE_CLASS, BT.CONTENT_CLASS, backend)
+
+def _measure(corpus, extract, backend):
+    # Throughput over a number of passes
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        for html in corpus:
+            extract(html, backend)
+    elapsed = time.perf_counter() - start
+    # Peak memory of extracting a single page, the largest page in the corpus
+    largest = max(corpus, key = len)
+    tracemalloc.start()
+    extract(largest, backend)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'pagesPerSecond': len(corpus) * REPEATS / elapsed,
+        'peakBytes': peak
+    }
+
+def run(corpus):
+    results = []
+    for backend in parser.getAvailableBackends():
+        methods = [('soup', _soupExtract), ('single pass', _streamExtract)]
+        # Selectolax does not build a BeautifulSoup tree
+        if backend == 'selectolax':
+            methods = methods[1:]
+        for method, extract in methods:
+            result = _measure(corpus, extract, backend)
+            result['backend'] = backend
+            result['method'] = method
+            results.append(result)
+    return results
+
+if __name__ == '__main__':
+    corpus = loadCorpus(sys.argv[1] if len(sys.argv) > 1 else None)
+    print('Pages in corpus: ' + str(len(corpus)))
+    for result in run(corpus):
+        print('{:>12} {:>12}  pages/sec: {:8.1f}  peak memory: {:8.1f} KiB'.format(
+            result['backend'], result['method'], result['pagesPerSecond'], result['peakBytes'] / 1024))
@@ -0,0 +1,86 @@
+# Benchmark of revisiting the downloaded articles of the local site, against a naive full recrawl of the site
+# for the same number of rounds. The local site changes a share of the articles after each time they are
+# downloaded. Revisits use conditional requests through the response cache and only append the changes to a
+# versions file, the naive recrawl downloads every page again and appends every article to the output again.
+# The revisit intervals are scaled down from minutes and hours to fractions of a second
+# Run from the repository root with: python -m benchmarks.bench_revisit [articles]
+# Imports
+import contextlib, os, sys, tempfile, time
+
+# Include classes and subfolders
+from main import Crawler
+from benchmarks.localsite import LocalSite
+from src.newspapers.newspaper import Newspaper
+from src.newspapers.transport import Transport
+from src.newspapers.cache import ResponseCache
+from src.crawler.revisit import getVersionsFileName
+
+# Benchmark settings
+ARTICLES = 500 # Articles on the local site
+FAN_OUT = 10 # Article links on each page
+CHANGE_RATE = 0.2 # Share of the articles changed after each download
+REVISIT_INTERVALS = (0.25, 0.5, 1.0) # Seconds from each download to the next revisit
+WORKERS = 8
+
+def crawl(site, revisit, directory):
+    # Create a crawler that only knows the local newspaper, without crawl delay
+    class BenchCrawler(Crawler):
+        NEWSPAPERS = [site.makeNewspaper()]
+        CRAWL_DELAY = 0
+        MIN_CRAWL_DELAY = 0
+        MAX_FETCHES_PER_HOST = WORKERS
+        PRINT_STATUS = False
+    BenchCrawler.REVISIT_INTERVALS = REVISIT_INTERVALS
+    # Every article of the local site is new, however deep it is found
+    BenchCrawler.REVISIT_MAX_DEPTH = None
+    outFileName = os.path.join(directory, 'articles.jsonl')
+    # Without duplicate detection, like re-adding the urls of the articles to a new crawl
+    crawler = BenchCrawler(outFileName, storeQueue = False, outputFormat = 'jsonl', detectDuplicates = False, revisit = revisit)
+    crawler.addArticle(site.getUrl() + '/')
+    # Hide the queue exhausted message of the crawler, the run ends when the last article was revisited
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        crawler.run(WORKERS)
+    crawler.finalize()
+    return outFileName
+
+def run(revisit, articles = ARTICLES):
+    site = LocalSite(articles, FAN_OUT, changeRate = CHANGE_RATE).start()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            # Revisits ask the server if the page changed since it was cached, the naive recrawl has no cache
+            transport = Transport(cache = ResponseCache(os.path.join(directory, 'cache'))) if revisit else Transport()
+            Newspaper.setTransport(transport)
+            start = time.perf_counter()
+            if revisit:
+                outFileName = crawl(site, True, directory)
+            else:
+                for _ in range(len(REVISIT_INTERVALS) + 1):
+                    outFileName = crawl(site, False, directory)
+            elapsed = time.perf_counter() - start
+            versionsFileName = getVersionsFileName(outFileName)
+            versions = 0
+            storedBytes = os.path.getsize(outFileName)
+            if os.path.exists(versionsFileName):
+                storedBytes += os.path.getsize(versionsFileName)
+                with open(versionsFileName, encoding = 'utf-8') as versionsFile:
+                    versions = sum(1 for line in versionsFile if line.strip())
+            transportMetrics = transport.getMetrics()
+            transport.close()
+    finally:
+        site.stop()
+    return {
+        'name': 'revisit' if revisit else 'naive recrawl',
+        'requests': site.getRequestCount(),
+        'bytesReceived': transportMetrics['bytesReceived'],
+        'storedBytes': storedBytes,
+        'versions': versions,
+        'changes': site.getChangeCount(),
+        'seconds': elapsed
+    }
+
+if __name__ == '__main__':
+    articles = int(sys.argv[1]) if len(sys.argv) > 1 else ARTICLES
+    print('Articles: {}  rounds: {}  change rate: {}'.format(articles, len(REVISIT_INTERVALS) + 1, CHANGE_RATE))
+    for result in (run(False, articles), run(True, articles)):
+        print('{:>14}  requests: {:>6}  received: {:>9} bytes  stored: {:>9} bytes  version records: {:>5}  changes on site: {:>5}  seconds: {:6.2f}'.format(
+            result['name'], result['requests'], result['bytesReceived'], result['storedBytes'], result['versions'], result['changes'], result['seconds']))
@@ -0,0 +1,83 @@
+# Benchmark of a sharded crawl of the local site, run with a range of shard counts. Each shard is a process of
+# its own, coordinated through a SQLite file, and the urls are shared out by url since the local site is a
+# single host. The added latency stands in for the network wait of real newspapers, so the shards are not only
+# competing for the CPU. Reports the pages/sec of all shards together, and the scaling compared to a single shard
+# Run from the repository root with: python -m benchmarks.bench_sharding [shards ...]
+# Imports
+import argparse, contextlib, json, os, subprocess, sys, tempfile, time
+
+# Include classes and subfolders
+from main import Crawler
+from benchmarks.localsite import LocalSite, LocalBT
+from src.crawler.sharding import SQLiteCoordinator, getShardFileName, mergeOutputs
+
+# Benchmark settings
+SHARD_COUNTS = [1, 2, 4]
+ARTICLES = 1000 # Articles on the local site
+FAN_OUT = 10 # Article links on each page
+LATENCY = 0.1 # Seconds of latency added to each response
+WORKERS = 2 # Download threads of each shard
+
+def crawlShard(siteUrl, shard, shards, directory):
+    # Crawl the share of the local site of one shard, in this process
+    LocalBT.NEWSPAPER_URL = siteUrl
+
+    class BenchCrawler(Crawler):
+        NEWSPAPERS = [LocalBT]
+        CRAWL_DELAY = 0
+        MIN_CRAWL_DELAY = 0
+        MAX_FETCHES_PER_HOST = WORKERS
+        PRINT_STATUS = False
+        COORDINATION_INTERVAL = 0.05
+
+    coordinator = SQLiteCoordinator(os.path.join(directory, 'coordinator'), shard, shards, 'url')
+    crawler = BenchCrawler(getShardFileName(os.path.join(directory, 'articles.jsonl'), shard), storeQueue = False, outputFormat = 'jsonl', coordinator = coordinator)
+    crawler.addArticle(siteUrl + '/')
+    # Hide the queue exhausted message of the crawler
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        crawler.run(WORKERS)
+    pages = len(crawler._queue)
+    crawler.finalize()
+    return pages
+
+def run(shards, articles = ARTICLES):
+    site = LocalSite(articles, FAN_OUT, LATENCY).start()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            processes = [
+                subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_sharding', '--crawl', site.getUrl(), '--shard', str(shard), '--shards', str(shards), '--directory', directory], stdout = subprocess.PIPE)
+                for shard in range(shards)
+            ]
+            pages = sum(json.loads(process.communicate()[0])['pages'] for process in processes)
+            elapsed = time.perf_counter() - start
+            fileNames = [getShardFileName(os.path.join(directory, 'articles.jsonl'), shard) for shard in range(shards)]
+            merged = mergeOutputs(fileNames, os.path.join(directory, 'articles.jsonl'))
+    finally:
+        site.stop()
+    return {
+        'shards': shards,
+        'pages': pages,
+        'articles': merged,
+        'pagesPerSecond': pages / elapsed
+    }
+
+if __name__ == '__main__':
+    arguments = argparse.ArgumentParser(description = 'Sharded crawl benchmark')
+    arguments.add_argument('shardCounts', metavar = 'shards', type = int, nargs = '*', default = SHARD_COUNTS)
+    arguments.add_argument('--articles', type = int, default = ARTICLES)
+    # Used by run to crawl a single shard in a new process
+    arguments.add_argument('--crawl', help = argparse.SUPPRESS)
+    arguments.add_argument('--shard', type = int, help = argparse.SUPPRESS)
+    arguments.add_argument('--shards', type = int, help = argparse.SUPPRESS)
+    arguments.add_argument('--directory', help = argparse.SUPPRESS)
+    options = arguments.parse_args()
+    if options.crawl:
+        print(json.dumps({'pages': crawlShard(options.crawl, options.shard, options.shards, options.directory)}))
+        sys.exit(0)
+    baseline = None
+    for shards in options.shardCounts:
+        result = run(shards, options.articles)
+        baseline = baseline or result['pagesPerSecond'] / shards
+        print('Shards: {:>3}  pages: {:>5}  articles: {:>5}  pages/sec: {:7.1f}  scaling: {:5.2f}x of linear'.format(
+            result['shards'], result['pages'], result['articles'], result['pagesPerSecond'], result['pagesPerSecond'] / (baseline * shards)))
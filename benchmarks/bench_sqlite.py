@@ -0,0 +1,54 @@
+# Benchmark of the resident memory of the SQLite frontier as the queue grows, compared to the in-memory frontier
+# Run from the repository root with: python -m benchmarks.bench_sqlite [memory|sqlite]
+# Each frontier runs in its own process, since the peak resident memory of a process never goes down.
+# Imports
+import os, resource, subprocess, sys, tempfile, time
+
+# Include classes and subfolders
+from src.crawler.frontier import Frontier
+from src.crawler.sqlitestore import openDatabase, SQLiteFrontier
+
+# Benchmark settings
+QUEUE_SIZES = [100000, 500000, 1000000]
+LINKS_PER_PAGE = 200 # Links queued per page, in one batch
+
+def _peakRSS():
+    # Peak resident memory of this process in MiB, ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def runBackend(backend):
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        if backend == 'sqlite':
+            database = openDatabase(os.path.join(directory, 'crawl.db'))
+            frontier = SQLiteFrontier(database)
+        else:
+            database = None
+            frontier = Frontier()
+        queued = 0
+        start = time.perf_counter()
+        for queueSize in QUEUE_SIZES:
+            # Queue pages of links, committing after each page like the crawler does
+            while queued < queueSize:
+                frontier.addMany('https://www.bt.dk/samfund/article-' + str(number) for number in range(queued, queued + LINKS_PER_PAGE))
+                queued += LINKS_PER_PAGE
+                if database:
+                    database.commit()
+            results.append({
+                'backend': backend,
+                'queueSize': queued,
+                'peakRSSMiB': _peakRSS(),
+                'seconds': time.perf_counter() - start
+            })
+        if database:
+            database.close()
+    return results
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        for result in runBackend(sys.argv[1]):
+            print('{:>7}  queue size: {:>8}  peak RSS: {:7.1f} MiB  elapsed: {:6.1f} s'.format(
+                result['backend'], result['queueSize'], result['peakRSSMiB'], result['seconds']))
+    else:
+        for backend in ('memory', 'sqlite'):
+            subprocess.run([sys.executable, '-m', 'benchmarks.bench_sqlite', backend], check = True)
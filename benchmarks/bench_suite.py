@@ -0,0 +1,184 @@
+# Offline benchmark suite, crawling the local B.T. stand-in site end to end and timing the BT extractors
+# Run from the repository root with: python -m benchmarks.bench_suite [--output results.json] [--compare old.json]
+# Each crawl runs in its own process, so the peak resident memory is that of the crawl alone. The results are
+# saved as JSON together with the commit, so the results of two commits can be compared with --compare.
+# Imports
+import argparse, contextlib, json, os, platform, resource, statistics, subprocess, sys, tempfile, time
+
+# Include classes and subfolders
+from main import Crawler
+from benchmarks.localsite import LocalSite
+
+# Benchmark settings
+ARTICLES = 500 # Articles on the local site
+FAN_OUT = 20 # Article links on each page
+LATENCY = 0.01 # Seconds of latency added to each response
+ERROR_RATE = 0.02 # Share of the articles failing their first request
+WORKER_COUNTS = [1, 8] # Crawls run with each number of workers, 0 runs the sequential crawl loop
+EXTRACTOR_PAGES = 200 # Pages the extractors are timed on
+METRICS = ['pagesPerSecond', 'p50Seconds', 'p99Seconds', 'peakRSSMiB', 'outputBytes', 'usPerPage'] # Compared by --compare
+
+def _peakRSS():
+    # Peak resident memory of this process in MiB, ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _quantiles(latencies):
+    # Exact p50 and p99 of the measured latencies
+    if len(latencies) < 2:
+        return (latencies[0], latencies[0]) if latencies else (None, None)
+    cuts = statistics.quantiles(latencies, n = 100, method = 'inclusive')
+    return cuts[49], cuts[98]
+
+def crawl(settings, workers):
+    # Crawl the whole local site once, in this process
+    site = LocalSite(settings['articles'], settings['fanOut'], settings['latency'], errorRate = settings['errorRate']).start()
+
+    # Create a crawler that only knows the local newspaper, without crawl delay, timing each page
+    class BenchCrawler(Crawler):
+        NEWSPAPERS = [site.makeNewspaper()]
+        CRAWL_DELAY = 0
+        MIN_CRAWL_DELAY = 0
+        MAX_FETCHES_PER_HOST = max(workers, 1)
+        PRINT_STATUS = False
+        latencies = []
+
+        def _downloadEntry(self, queueEntry):
+            start = time.perf_counter()
+            try:
+                return super()._downloadEntry(queueEntry)
+            finally:
+                self.latencies.append(time.perf_counter() - start)
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            outFileName = os.path.join(directory, 'articles.jsonl')
+            crawler = BenchCrawler(outFileName, storeQueue = False, outputFormat = 'jsonl')
+            crawler.addArticle(site.getUrl() + '/')
+            start = time.perf_counter()
+            # Hide the queue exhausted message of the crawler
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                crawler.run(workers or None)
+            elapsed = time.perf_counter() - start
+            crawler.finalize()
+            outputBytes = os.path.getsize(outFileName)
+    finally:
+        site.stop()
+    p50, p99 = _quantiles(BenchCrawler.latencies)
+    return {
+        'name': 'crawl workers=' + str(workers),
+        'pages': len(BenchCrawler.latencies),
+        'articles': crawler._downloadedArticles,
+        'errors': site.getErrorCount(),
+        'pagesPerSecond': len(BenchCrawler.latencies) / elapsed,
+        'p50Seconds': p50,
+        'p99Seconds': p99,
+        'peakRSSMiB': _peakRSS(),
+        'outputBytes': outputBytes
+    }
+
+def runCrawl(settings, workers):
+    # Run the crawl in a new process, which writes its result to a file
+    with tempfile.TemporaryDirectory() as directory:
+        resultFile = os.path.join(directory, 'result.json')
+        subprocess.run([sys.executable, '-m', 'benchmarks.bench_suite', '--crawl', str(workers), '--result', resultFile, '--settings', json.dumps(settings)], check = True)
+        with open(resultFile) as infile:
+            return json.load(infile)
+
+def timeExtractors(settings):
+    # Time getTitle, getContent and getLinkedArticles of BT on pages of the local site. Each runs on a fresh
+    # page, so the times include the single pass extraction done on first use
+    site = LocalSite(settings['articles'], settings['fanOut']).start()
+    try:
+        newspaper = site.makeNewspaper()
+        pages = [(site.getUrl() + site.getArticlePath(number), site.renderArticle(number)) for number in range(min(EXTRACTOR_PAGES, settings['articles']))]
+    finally:
+        site.stop()
+    results = []
+    for extractor in ('getTitle', 'getContent', 'getLinkedArticles'):
+        latencies = []
+        for articleUrl, articleHtml in pages:
+            newspage = newspaper(articleUrl, articleHtml)
+            start = time.perf_counter()
+            getattr(newspage, extractor)()
+            latencies.append(time.perf_counter() - start)
+        p50, p99 = _quantiles(latencies)
+        results.append({
+            'name': 'BT.' + extractor,
+            'pages': len(latencies),
+            'usPerPage': sum(latencies) / len(latencies) * 1e6,
+            'p50Seconds': p50,
+            'p99Seconds': p99
+        })
+    return results
+
+def run(settings, workerCounts = WORKER_COUNTS):
+    return {
+        'commit': _getCommit(),
+        'python': platform.python_version(),
+        'time': time.time(),
+        'settings': settings,
+        'results': [runCrawl(settings, workers) for workers in workerCounts] + timeExtractors(settings)
+    }
+
+def compare(old, new):
+    # Print the change of each metric of the results present in both runs
+    oldResults = {result['name']: result for result in old['results']}
+    print('Compared to commit ' + str(old.get('commit')))
+    for result in new['results']:
+        oldResult = oldResults.get(result['name'])
+        if oldResult is None:
+            continue
+        for metric in METRICS:
+            if result.get(metric) and oldResult.get(metric):
+                print('{:>28} {:>15}: {:12.4g} -> {:12.4g}  ({:+.1f}%)'.format(
+                    result['name'], metric, oldResult[metric], result[metric], (result[metric] / oldResult[metric] - 1) * 100))
+
+def _getCommit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _printResult(result):
+    line = '{:>28}  pages: {:>5}'.format(result['name'], result['pages'])
+    if 'pagesPerSecond' in result:
+        line += '  pages/sec: {:7.1f}  peak RSS: {:6.1f} MiB  output: {:9} bytes  errors: {:>3}'.format(
+            result['pagesPerSecond'], result['peakRSSMiB'], result['outputBytes'], result['errors'])
+    else:
+        line += '  per page: {:8.1f} us'.format(result['usPerPage'])
+    line += '  p50: {:8.2f} ms  p99: {:8.2f} ms'.format(result['p50Seconds'] * 1000, result['p99Seconds'] * 1000)
+    print(line)
+
+if __name__ == '__main__':
+    arguments = argparse.ArgumentParser(description = 'Offline crawler benchmark suite')
+    arguments.add_argument('--articles', type = int, default = ARTICLES)
+    arguments.add_argument('--fan-out', type = int, default = FAN_OUT)
+    arguments.add_argument('--latency', type = float, default = LATENCY)
+    arguments.add_argument('--error-rate', type = float, default = ERROR_RATE)
+    arguments.add_argument('--workers', type = int, nargs = '+', default = WORKER_COUNTS)
+    arguments.add_argument('--output', help = 'File to save the results to as JSON')
+    arguments.add_argument('--compare', help = 'Results of an earlier run to compare to')
+    # Used by runCrawl to run a single crawl in a new process
+    arguments.add_argument('--crawl', type = int, help = argparse.SUPPRESS)
+    arguments.add_argument('--result', help = argparse.SUPPRESS)
+    arguments.add_argument('--settings', help = argparse.SUPPRESS)
+    options = arguments.parse_args()
+    if options.crawl is not None:
+        with open(options.result, 'w') as outfile:
+            json.dump(crawl(json.loads(options.settings), options.crawl), outfile)
+        sys.exit(0)
+    settings = {
+        'articles': options.articles,
+        'fanOut': options.fan_out,
+        'latency': options.latency,
+        'errorRate': options.error_rate
+    }
+    results = run(settings, options.workers)
+    for result in results['results']:
+        _printResult(result)
+    if options.output:
+        with open(options.output, 'w') as outfile:
+            json.dump(results, outfile, indent = 2)
+    if options.compare:
+        with open(options.compare) as infile:
+            compare(json.load(infile), results)
@@ -0,0 +1,242 @@
+# A local stand-in for a B.T.-like newspaper site, used by the benchmarks
+# Imports
+import gzip, hashlib, threading, time
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Include classes and subfolders
+from src.newspapers.bt import BT
+
+# LocalBT class definition
+# A BT newspaper pointing to the local site. It is defined at module level so it can be pickled to parse
+# processes; LocalSite.makeNewspaper sets the URL, which forked processes inherit.
+class LocalBT(BT):
+    NEWSPAPER_NAME = 'Local B.T.'
+    NEWSPAPER_URL = 'http://127.0.0.1'
+
+# LocalSitemapBT class definition
+# The local BT newspaper found through the sitemap of the local site instead of by following links
+class LocalSitemapBT(LocalBT):
+    FOLLOW_LINKS = False
+
+# LocalSite class definition
+# Serves a front page linking to the articles, and a set of articles that each link to other articles. The
+# pages use the same markup as B.T. so the BT newspaper class can parse them. With sections, the front page
+# also links to that many section index pages, each linking to a share of the articles. The articles are
+# listed in a sitemap index at /sitemap.xml, with a sitemap of SITEMAP_SIZE articles each.
+class LocalSite:
+    SITEMAP_SIZE = 1000 # Articles in each sitemap
+
+    SITEMAP_EPOCH = datetime(2024, 1, 1, tzinfo = timezone.utc) # Lastmod of the first article, each next one is a minute later
+
+    # Variants of a link, as found on real newspaper pages
+    LINK_VARIANTS = [
+        '{}',
+        '{}?utm_source=frontpage&utm_medium=link',
+        '{}#comments',
+        '{}/',
+        '{}?fbclid=abc123'
+    ]
+
+    def __init__(self, articles = 1000, fanOut = 20, latency = 0.0, compress = False, variants = False, errorRate = 0.0, sections = 0, changeRate = 0.0):
+        # Number of articles on the site
+        self._articles = articles
+        # Number of article links on each page
+        self._fanOut = fanOut
+        # Delay in seconds before each response
+        self._latency = latency
+        # Gzip the responses to clients that accept it
+        self._compress = compress
+        # Write the links as a mix of variants, with tracking parameters, fragments and trailing slashes
+        self._variants = variants
+        # Share of the articles answered with a 503 error on their first request, picked by a hash of the path
+        # so the same articles fail on every run
+        self._errorRate = errorRate
+        self._failedPaths = set()
+        # Number of section index pages
+        self._sections = sections
+        # Share of the articles changed after each time they are downloaded, picked by a hash of the path and the
+        # number of downloads so the same articles change on every run
+        self._changeRate = changeRate
+        self._downloads = {}
+        # Number of requests served, and the number of times each changed article was changed
+        self._requests = 0
+        self._changed = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        # Serve the site on a free local port
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._makeHandler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target = self._server.serve_forever, daemon = True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def getUrl(self):
+        return 'http://127.0.0.1:' + str(self._server.server_address[1])
+
+    def makeNewspaper(self):
+        # Point the local BT newspaper class to the local site
+        LocalBT.NEWSPAPER_URL = self.getUrl()
+        return LocalBT
+
+    def makeSitemapNewspaper(self):
+        # The local BT newspaper reading the sitemap of the local site, without following links
+        LocalBT.NEWSPAPER_URL = self.getUrl()
+        LocalSitemapBT.SITEMAP_URLS = [self.getUrl() + '/sitemap.xml']
+        return LocalSitemapBT
+
+    def getRequestCount(self):
+        return self._requests
+
+    def changeArticle(self, number):
+        # Add an update to the article, and give it a later lastmod in the sitemap
+        with self._lock:
+            self._changed[number] = self._changed.get(number, 0) + 1
+
+    def getChangeCount(self):
+        return sum(self._changed.values())
+
+    def getArticlePath(self, number):
+        return '/samfund/artikel-' + str(number)
+
+    def renderFrontPage(self):
+        links = [self.getArticlePath(number) for number in range(min(self._fanOut * 5, self._articles))]
+        links += ['/sektion-' + str(section) + '/' for section in range(self._sections)]
+        return self._renderPage(None, links)
+
+    def renderSection(self, section):
+        # Link to every article whose number falls in the section
+        return self._renderPage(None, [self.getArticlePath(number) for number in range(section, self._articles, self._sections)])
+
+    def renderSitemapIndex(self):
+        xml = ['<?xml version="1.0" encoding="UTF-8"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+        for start in range(0, self._articles, LocalSite.SITEMAP_SIZE):
+            numbers = range(start, min(start + LocalSite.SITEMAP_SIZE, self._articles))
+            lastmod = max(self._getLastmod(number) for number in numbers)
+            xml.append('<sitemap><loc>' + self.getUrl() + '/sitemap-' + str(start // LocalSite.SITEMAP_SIZE) + '.xml</loc><lastmod>' + lastmod + '</lastmod></sitemap>')
+        xml.append('</sitemapindex>')
+        return ''.join(xml).encode('utf-8')
+
+    def renderSitemap(self, index):
+        xml = ['<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+        for number in range(index * LocalSite.SITEMAP_SIZE, min((index + 1) * LocalSite.SITEMAP_SIZE, self._articles)):
+            xml.append('<url><loc>' + self.getUrl() + self.getArticlePath(number) + '</loc><lastmod>' + self._getLastmod(number) + '</lastmod></url>')
+        xml.append('</urlset>')
+        return ''.join(xml).encode('utf-8')
+
+    def _getLastmod(self, number):
+        # Changed articles were changed a year after they were published, and a year after each change
+        lastmod = LocalSite.SITEMAP_EPOCH + timedelta(minutes = number, days = 365 * self._changed.get(number, 0))
+        return lastmod.isoformat()
+
+    def renderArticle(self, number):
+        # Link to the following articles, so the whole site is reachable from the front page
+        links = [self.getArticlePath((number * 7 + offset) % self._articles) for offset in range(1, self._fanOut + 1)]
+        paragraphs = ['Afsnit {} af artikel {}. '.format(paragraph, number) * 8 for paragraph in range(12)]
+        # Each change rewrites a sentence of a paragraph
+        for change in range(self._changed.get(number, 0)):
+            paragraphs[change % len(paragraphs)] += 'Opdatering {} af artikel {}.'.format(change + 1, number)
+        return self._renderPage('Artikel nummer ' + str(number), links, paragraphs)
+
+    def _renderPage(self, title, links, paragraphs = ()):
+        html = ['<html><head><title>Local B.T.</title></head><body>']
+        if title:
+            html.append('<h1 class="article-title">' + title + '</h1>')
+            html.append('<div class="article-content">')
+            html.extend('<p>' + paragraph + '</p>' for paragraph in paragraphs)
+            html.append('<p>Foto: Local B.T.</p></div>')
+        if self._variants:
+            links = [LocalSite.LINK_VARIANTS[(index + len(link)) % len(LocalSite.LINK_VARIANTS)].format(link) for index, link in enumerate(links)]
+        html.extend('<a href="' + self.getUrl() + link + '">' + link + '</a>' for link in links)
+        html.append('<a href="/tip/">Tip</a><a href="https://example.com/">Ekstern</a></body></html>')
+        return ''.join(html).encode('utf-8')
+
+    def _render(self, path):
+        # Return the page at the path, or None if it does not exist
+        if path == '/':
+            return self.renderFrontPage()
+        if path == '/sitemap.xml':
+            return self.renderSitemapIndex()
+        if path.startswith('/sitemap-') and path[len('/sitemap-'):-len('.xml')].isdigit():
+            return self.renderSitemap(int(path[len('/sitemap-'):-len('.xml')]))
+        section = path.rstrip('/')[len('/sektion-'):]
+        if path.startswith('/sektion-') and section.isdigit() and int(section) < self._sections:
+            return self.renderSection(int(section))
+        prefix = '/samfund/artikel-'
+        if path.startswith(prefix) and path[len(prefix):].isdigit():
+            number = int(path[len(prefix):])
+            if number < self._articles:
+                body = self.renderArticle(number)
+                self._countDownload(number)
+                return body
+        return None
+
+    def _countDownload(self, number):
+        # Change the chosen articles after they were downloaded
+        if not self._changeRate:
+            return
+        with self._lock:
+            downloads = self._downloads[number] = self._downloads.get(number, 0) + 1
+        key = (self.getArticlePath(number) + '#' + str(downloads)).encode('utf-8')
+        if int(hashlib.md5(key).hexdigest()[:8], 16) / 0xffffffff < self._changeRate:
+            self.changeArticle(number)
+
+    def _isError(self, path):
+        # Fail the first request of the chosen articles, a retry gets the page
+        if not self._errorRate or not path.startswith('/samfund/'):
+            return False
+        if int(hashlib.md5(path.encode('utf-8')).hexdigest()[:8], 16) / 0xffffffff >= self._errorRate:
+            return False
+        with self._lock:
+            if path in self._failedPaths:
+                return False
+            self._failedPaths.add(path)
+            return True
+
+    def getErrorCount(self):
+        return len(self._failedPaths)
+
+    def _makeHandler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with site._lock:
+                    site._requests += 1
+                if site._latency:
+                    time.sleep(site._latency)
+                if site._isError(self.path):
+                    self.send_error(503)
+                    return
+                body = site._render(self.path)
+                if body is None:
+                    self.send_error(404)
+                    return
+                # Answer conditional requests for unchanged pages without a body
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/xml' if self.path.endswith('.xml') else 'text/html; charset=utf-8')
+                self.send_header('ETag', etag)
+                if site._compress and 'gzip' in self.headers.get('Accept-Encoding', ''):
+                    body = gzip.compress(body)
+                    self.send_header('Content-Encoding', 'gzip')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -1,11 +1,33 @@
 # Imports
-import signal, time, os
-import json
+import signal, time, os, sys
+import contextlib
+import argparse, subprocess
+import threading
 import traceback
+import requests
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from urllib.parse import urlparse
 
 # Include classes and subfolders
 from src.newspapers.bt import BT
+from src.newspapers.newspaper import Newspaper
+from src.newspapers.transport import Transport
+from src.newspapers.cache import ResponseCache
+from src.crawler.urlstatus import URLStatus
+from src.crawler.frontier import Frontier
+from src.crawler.scheduler import PriorityFrontier
+from src.crawler.output import OUTPUT_FORMATS, JSONLinesOutput, iterArticles, readJSONLines
+from src.crawler.dedup import DuplicateDetector, getFingerprintsFileName
+from src.crawler.politeness import AdaptivePoliteness, parseRetryAfter
+from src.crawler.retry import PageError, RetryQueue, classifyError
+from src.crawler.discovery import SitemapDiscovery
+from src.crawler.revisit import RevisitScheduler, VersionStore, getVersionsFileName
+from src.crawler.sharding import SQLiteCoordinator, ShardRouter, getShardFileName, mergeOutputs
+from src.crawler.pipeline import parsePage
+from src.crawler.metrics import Metrics
+from src.crawler.profiling import StageProfiler
+from src.crawler.journal import QueueJournal
+from src.crawler.sqlitestore import openDatabase, SQLiteFrontier, SQLiteArticleOutput, SQLiteFingerprintOutput, readSQLiteArticles, readSQLiteFingerprints
 
 # Crawler class definition
 class Crawler:
@@ -13,264 +35,765 @@ class Crawler:
         BT
     ]
 
-    CRAWL_DELAY = 20 # Delay in milliseconds between each page download
+    CRAWL_DELAY = 20 # Delay in milliseconds between each page download from a newspaper, when the crawl starts
+
+    MIN_CRAWL_DELAY = 5 # The delay adapts to the response times of the newspaper, within these limits
+
+    MAX_CRAWL_DELAY = 60000
+
+    OBEY_CRAWL_DELAY = True # Never download faster than the Crawl-delay in the robots.txt of the newspaper
+
+    MAX_FETCHES_PER_HOST = 4 # Maximum number of concurrent downloads from the same newspaper
 
     QUEUE_STORE_FILE = '.queue'
 
-    class URLStatus:
-        PENDING = 0
-        DOWNLOADED = 1
-        UNSUPPORTED = 2
-        UNAVALIABLE = 3
-        INVALID = 4
-        ISINDEX = 5
-        FAILED = 6
-
-        TEXT_STATUS = {
-            PENDING: 'Pending download',
-            DOWNLOADED: 'Downloaded',
-            UNSUPPORTED: 'The newspaper is unsupported',
-            UNAVALIABLE: 'The URL is inavaliable',
-            INVALID: 'The URL is invalid',
-            ISINDEX: 'The page is an index',
-            FAILED: 'Download failed',
-        }
+    QUEUE_JOURNAL_FILE = '.queue.journal' # Changes to the queue since it was last stored
+
+    RESPONSE_CACHE_DIR = '.cache' # Directory of the on-disk cache of downloaded pages
+
+    PRINT_STATUS = True # Print the status of each page, turn off at high page rates
+
+    METRICS_INTERVAL = 10 # Seconds between each update of the queue metrics and the metrics file
+
+    UNSUPPORTED_SCORE = 1000 # Score of pages of unsupported newspapers, served after all others
+
+    DISCOVERY_INTERVAL = 10 * 60 # Seconds between each reading of the sitemaps and feeds of the newspapers
+
+    DISCOVERY_CACHE_TTL = 5 * 60 # Seconds a downloaded sitemap or feed may be used without asking the server
+    MAX_DISCOVERY_BYTES = 50 * 1024 * 1024 # Largest sitemap or feed downloaded, the limit of the sitemaps protocol
+
+    REVISIT_INTERVALS = RevisitScheduler.INTERVALS # Seconds from each download of an article to its next revisit
+    REVISIT_MAX_AGE = RevisitScheduler.MAX_AGE # Seconds since its lastmod a new article is revisited, None for any age
+    REVISIT_MAX_DEPTH = RevisitScheduler.MAX_DEPTH # Links from the front page a new article without a lastmod is revisited
+
+    PROFILE_DIR = 'profile' # Directory of the reports of a profiled run
+
+    COORDINATION_INTERVAL = 1 # Seconds between each look for links handed over by other shards
+
+    COORDINATOR_FILE = '.coordinator' # Coordination database of a sharded crawl
+
+    SHARD_OUTPUT_FILE = 'articles.jsonl' # The outputs of the shards are merged into this file
+
+    # States of the crawler, returned by getState
+    STATE_STOPPED = 'stopped' # Not running, or stopped before the queue was exhausted
+    STATE_RUNNING = 'running'
+    STATE_PAUSED = 'paused'
+    STATE_IDLE = 'idle' # Waiting for an index page to be downloaded again
+    STATE_DRAINED = 'drained' # The queue is exhausted, and no page will be downloaded again
+
+    # Transport metrics exported by the crawler, and their metric names
+    TRANSPORT_METRICS = {
+        'requests': 'transport_requests_total',
+        'connections': 'transport_connections_total',
+        'bytesReceived': 'transport_received_bytes_total',
+        'bytesDecoded': 'transport_decoded_bytes_total',
+        'responseSeconds': 'transport_response_seconds_total',
+        'transferSeconds': 'transport_transfer_seconds_total'
+    }
+
+    URLStatus = URLStatus
 
     class UnsupportedNewspaper(Exception):
         pass
 
-    class QueueIsEmpty(Exception):
-        pass
+    PageError = PageError
+
+    QueueIsEmpty = Frontier.QueueIsEmpty
 
-    def __init__(self, outFileName = 'articles.json', storeQueue = True):
+    def __init__(self, outFileName = 'articles.json', storeQueue = True, outputFormat = 'json', database = None, detectDuplicates = True, prioritize = False, metricsFile = None, metricsPort = None, coordinator = None, revisit = False):
         self._downloadedArticles = 0
         self._lastRun = 0
         self._doRun = False
+        self._paused = False
+        self._state = Crawler.STATE_STOPPED
+        # Wakes the crawl loop on stop, resume and new articles. The lock is reentrant, so the control methods
+        # can be called from a signal handler interrupting the loop
+        self._control = threading.Condition(threading.RLock())
+        self._wakeUps = 0
         self._storeQueue = storeQueue
+        # With a coordinator, the crawler is one shard of a sharded crawl. It only downloads the urls of its
+        # shard, hands the other urls to their shards, and stores its queue in files of its own
+        self._coordinator = coordinator
+        self._nextReceiveTime = 0
+        self._queueStoreFile = self.QUEUE_STORE_FILE
+        self._queueJournalFile = self.QUEUE_JOURNAL_FILE
+        if coordinator is not None:
+            self._queueStoreFile = getShardFileName(self.QUEUE_STORE_FILE, coordinator.getShard())
+            self._queueJournalFile = getShardFileName(self.QUEUE_JOURNAL_FILE, coordinator.getShard())
+        # With prioritize, the queue is served by the score of the newspaper instead of in insertion order
+        self._frontierFactory = self._makePriorityFrontier if prioritize else Frontier
+        # With a database file, the queue and the articles are stored in SQLite instead of in memory
+        self._database = openDatabase(database) if database else None
+        if self._database:
+            self._storeQueue = False
+            self._queue = SQLiteFrontier(self._database)
         # Try loading a saved queue if saveQueue is enabled
-        if self._storeQueue:
+        elif self._storeQueue:
             self._loadQueue()
         else:
             # Instantiate variable to store queue
-            self._queue = []
-        # Store the queue index of the current task
-        self._queueIndex = 0
+            self._queue = self._frontierFactory()
+        # Limit the concurrent downloads and the download rate of each newspaper host
+        self._politeness = AdaptivePoliteness(self.CRAWL_DELAY / 1000, self.MIN_CRAWL_DELAY / 1000, self.MAX_CRAWL_DELAY / 1000, self.MAX_FETCHES_PER_HOST)
+        self._knownHosts = set()
+        # Pages that failed with a transient error, waiting to be downloaded again
+        self._retries = RetryQueue()
+        # Reads the sitemaps and feeds of the newspapers, and the time they are due to be read again
+        self._discovery = SitemapDiscovery(self._fetchDocument)
+        self._nextDiscoveryTime = None
         # Save the output file name
         self._outFileName = outFileName
+        hasArticles = os.path.exists(self._outFileName) and os.path.getsize(self._outFileName) > 0
+        # Create the output writer, 'jsonl' appends each article instead of rewriting the file
+        if self._database:
+            self._output = SQLiteArticleOutput(self._database, commitEvery = 0)
+        else:
+            self._output = OUTPUT_FORMATS[outputFormat](self._outFileName)
+        # Changes to the stored articles are appended to a versions file next to the output. With revisit, recent
+        # articles are downloaded again on a decaying interval to find their changes
+        self._versions = VersionStore(self._output, getVersionsFileName(outFileName))
+        self._revisits = None
+        if revisit:
+            self._revisits = RevisitScheduler(self._versions, self.REVISIT_INTERVALS, self.REVISIT_MAX_AGE, self.REVISIT_MAX_DEPTH)
+        # Skip articles with the same or nearly the same text as an article already in the output. The hash and
+        # fingerprint of each article are stored next to the output, so the articles of earlier runs are not
+        # read and hashed again
+        self._duplicates = None
+        self._fingerprints = None
+        if detectDuplicates:
+            if self._database:
+                self._fingerprints = SQLiteFingerprintOutput(self._database, commitEvery = 0)
+                self._duplicates = DuplicateDetector(store = self._fingerprints)
+                self._duplicates.load(readSQLiteFingerprints(self._database))
+                # Articles stored before the fingerprints are hashed once
+                self._duplicates.addAll(readSQLiteArticles(self._database, unfingerprinted = True))
+            else:
+                fingerprintsFileName = getFingerprintsFileName(self._outFileName)
+                hasFingerprints = os.path.exists(fingerprintsFileName)
+                self._fingerprints = JSONLinesOutput(fingerprintsFileName)
+                self._duplicates = DuplicateDetector(store = self._fingerprints)
+                if hasArticles and hasFingerprints:
+                    self._duplicates.load(readJSONLines(fingerprintsFileName))
+                else:
+                    # The fingerprints of an output that was removed are dropped, and the articles of an output
+                    # written before the fingerprints are hashed once
+                    self._fingerprints.truncate()
+                    if hasArticles:
+                        self._duplicates.addAll(iterArticles(self._outFileName))
+        # Timers and counters of the crawl, written to metricsFile as JSON and served on metricsPort in the
+        # Prometheus text format, if given
+        self._metrics = Metrics()
+        self._metricsFile = metricsFile
+        self._lastMetricsUpdate = 0
+        self._metricsServer = self._metrics.serve(metricsPort) if metricsPort else None
+        # Profiles the stages of each page in a run started by profile
+        self._profiler = None
 
     def curlAllNewspapers(self):
         # For each of the newspages, get the front page and get all related articles
         for newspaper in Crawler.NEWSPAPERS:
             # # Instantiate the newspaper to the front page
             # np = newspaper(newspaper.NEWSPAPER_URL)
-            # Add the article
-            self.addArticle(newspaper.NEWSPAPER_URL)
+            # Add the article, unless the links of the newspaper are not followed
+            if newspaper.FOLLOW_LINKS:
+                self.addArticle(newspaper.NEWSPAPER_URL)
             # # Get related articles
             # for articleURL in np.getLinkedArticles():
             #     # Add the article
             #     self.addArticle(articleURL)
+        # Get the articles listed in the sitemaps and feeds
+        self.discoverArticles()
 
     def addArticle(self, articleURL):
-        # Validate that the link is not already in the queue
-        if not self._isLinkInQueue(articleURL):
-            # Add the article
-            self._queueLink(articleURL)
-            # Return true to indicate success
-            return True
-        else:
-            # Link already in queue, return false to indicate failure
-            return False
+        # Add the article, returns false if the link is already in the queue or belongs to another shard
+        added = self._queueLink(self._canonicalizeUrl(articleURL), 0)
+        # Wake a waiting daemon
+        self._wakeUp()
+        return added
+
+    def discoverArticles(self):
+        # Queue the articles in the sitemaps and feeds of the newspapers, returns the number of new queue items.
+        # Articles already downloaded are only queued again if their lastmod is later than when last seen
+        queuedItems = 0
+        hasSources = False
+        for newspaper in self.NEWSPAPERS:
+            # In a sharded crawl, the sitemaps of a newspaper are read by the shard of its front page
+            if self._coordinator is not None and not self._coordinator.isLocal(newspaper.NEWSPAPER_URL):
+                continue
+            discoveryUrls = newspaper.getDiscoveryUrls()
+            hasSources = hasSources or bool(discoveryUrls)
+            with self._metrics.timer('discovery_seconds'):
+                for articleURL, lastmod in self._discovery.discover(discoveryUrls):
+                    if self._queueDiscovered(newspaper, articleURL, lastmod):
+                        queuedItems += 1
+        # Read the sitemaps and feeds again on an interval
+        self._nextDiscoveryTime = time.time() + self.DISCOVERY_INTERVAL if hasSources else None
+        self._checkpointQueue()
+        self._wakeUp()
+        return queuedItems
 
-    def run(self):
+    def run(self, workers = None, parseProcesses = None, daemon = False):
         # Set do run
         self._doRun = True
-        # Start the task
-        self._task()
+        self._state = Crawler.STATE_RUNNING
+        # Start the task, if a number of workers is given the pages are downloaded concurrently
+        # With parseProcesses, the downloaded pages are parsed in a pool of that many processes
+        # With daemon, the crawler keeps running when the queue is exhausted, until stop is called
+        try:
+            if workers:
+                self._concurrentTask(workers, parseProcesses, daemon)
+            else:
+                self._task(daemon)
+        finally:
+            if self._state != Crawler.STATE_DRAINED:
+                self._state = Crawler.STATE_STOPPED
+
+    def profile(self, reportDir = None, daemon = False):
+        # Run the crawl in the calling thread, profiling the download, the parsing and applying the result of each
+        # page with cProfile and tracemalloc. The reports are written to reportDir when the run stops, returns
+        # their file names
+        self._profiler = StageProfiler(reportDir or self.PROFILE_DIR)
+        self._profiler.start()
+        try:
+            self.run(daemon = daemon)
+        finally:
+            fileNames = self._profiler.stop()
+            self._profiler = None
+        return fileNames
 
     def stop(self):
         # Set do run
         self._doRun = False
+        self._wakeUp()
+
+    def pause(self):
+        # Finish the pages in flight, and start no new downloads until resume is called
+        self._paused = True
+        self._wakeUp()
+
+    def resume(self):
+        self._paused = False
+        self._wakeUp()
+
+    def getState(self):
+        return self._state
+
+    def getMetrics(self):
+        return self._metrics
 
     def finalize(self):
         # Stop running
         self.stop()
+        # Flush and close the output, before the queue marks its articles as downloaded
+        self._output.close()
         # Save the queue if enabled
         if self._storeQueue:
             self._saveQueue()
+            self._journal.close()
+        # Write the final metrics
+        self._updateMetrics()
+        if self._metricsServer:
+            self._metricsServer.shutdown()
+        self._versions.close()
+        if self._fingerprints is not None:
+            self._fingerprints.close()
+        if self._database:
+            self._database.close()
+        if self._coordinator is not None:
+            self._coordinator.close()
         
-    @staticmethod
-    def _getNewspaperFromURL(url):
+    @classmethod
+    def _getNewspaperFromURL(_class, url):
         # Parse the link
         parsedUrl = urlparse(url)
+        netloc = parsedUrl.netloc.lower()
         # Look-up the netloc and compare to known newspapers
-        for newspaper in Crawler.NEWSPAPERS:
+        for newspaper in _class.NEWSPAPERS:
             # If netlock matches newspaper URL, return the newspaper
-            if parsedUrl.netloc == newspaper.getNetloc():
+            if netloc == newspaper.getNetloc():
                 return newspaper
         # If loop did not return a newspaper, newspaper is unsupported
         return Crawler._unsupportedNewspaper        
 
     def _loadQueue(self):
-        try:
-            with open(Crawler.QUEUE_STORE_FILE, "r") as queueFile:
-                # Load queue
-                self._queue = json.load(queueFile)
-        except FileNotFoundError: # If the file exists, an exception is thrown
-            self._queue = []
+        # Load the stored queue and replay the changes made after it was stored
+        self._journal = QueueJournal(self._queueStoreFile, self._queueJournalFile)
+        self._queue = self._journal.load(self._frontierFactory)
+        # Count the articles downloaded in earlier runs
+        self._downloadedArticles = self._queue.countByStatus(Crawler.URLStatus.DOWNLOADED)
 
     def _saveQueue(self):
-        try:
-            # Try creating the file
-            with open(Crawler.QUEUE_STORE_FILE, "x") as queueFile:
-                # Dump the new data
-                json.dump(self._queue, queueFile)
-        except FileExistsError: # If the file exists, override the file
-            with open(Crawler.QUEUE_STORE_FILE, "w") as queueFile:
-                # Dump the new data
-                json.dump(self._queue, queueFile)
-
-    def _queueLink(self, url):
-        # Add the url to the queue
-        self._queue.append({
-            'url': url,
-            'status': Crawler.URLStatus.PENDING
-        })
+        # Store a snapshot of the queue, and start the journal over
+        self._journal.snapshot(self._queue)
+
+    def _checkpointQueue(self):
+        # Make the changes of the last page durable, and store a snapshot when the journal has grown long. The
+        # links of other shards are handed over first
+        if self._coordinator is not None:
+            self._coordinator.flush()
+        if self._database:
+            self._database.commit()
+        elif self._storeQueue and self._output.getPendingCount() == 0:
+            # An output holding articles back, like the blocks of the archive, holds back the journal too, so a
+            # page is never stored as downloaded before its article is in the output
+            self._journal.flush()
+            if self._journal.needsSnapshot(self._queue):
+                self._saveQueue()
 
     def _updateQueueEntry(self, queueEntry, status):
-        # Find the queue entry
-        entryIndex = self._queue.index(queueEntry)
-        # Update the status
-        self._queue[entryIndex]['status'] = status
+        # Update the status of the entry
+        self._queue.updateStatus(queueEntry, status)
 
     def _getNextInQueue(self):
-        # Get the length of the queue
-        queueLength = len(self._queue)
-        # Keep incrementing the queueIndex, until the next element in the queue is found
-        while self._queueIndex < queueLength:
-            # Get the queue entry
-            queueEntry = self._queue[self._queueIndex]
-            # Increment the queueIndex
-            self._queueIndex += 1
-            # If the article is already downloaded mark if
-            if queueEntry['status'] == Crawler.URLStatus.DOWNLOADED:
-                self._downloadedArticles += 1
-            # Check the status of the entry
-            if queueEntry['status'] == Crawler.URLStatus.PENDING or queueEntry['status'] == Crawler.URLStatus.UNSUPPORTED:
-                # Return the queueEntry
-                return queueEntry
-        # Raise exception if the queue is exhausted
-        raise Crawler.QueueIsEmpty()
-
-    def _task(self):
-        while True:
-            if self._doRun:
-                try:
-                    # Store run time
-                    self._lastRun = time.time()
-                    # Get the next link to download
-                    queueEntry = self._getNextInQueue()
-                    # Print output
-                    self._printPreDownloadStatusToTerminal(queueEntry['url'])
-                    articleStatus = Crawler.URLStatus.FAILED
-                    numRelatedArticles = 0
-                    # Get the newspaper from the URL
-                    newspaper = Crawler._getNewspaperFromURL(queueEntry['url'])
-                    # Try getting the article from the newspaper
-                    try:
-                        newspage = newspaper(queueEntry['url'])
-                        # Get the articleEntry
-                        articleEntry = newspage.getArticleEntry()
-                        if articleEntry:
-                            # Save the article
-                            Crawler._saveEntryToOutput(self._outFileName, articleEntry)
-                            # Count up in downloaded articles
-                            self._downloadedArticles += 1
-                            # Update the article status
-                            articleStatus = Crawler.URLStatus.DOWNLOADED
-                        else:
-                            # The page does not contain an article, just get related
-                            articleStatus = Crawler.URLStatus.ISINDEX 
-                        # Queue related articles
-                        numRelatedArticles = self._queueRelatedArticles(newspage.getLinkedArticles())
-                        # Mark the entry as downloaded in the queue
-                        self._updateQueueEntry(queueEntry, articleStatus)
-                    except Crawler.UnsupportedNewspaper:
-                        # Marke article as unsupported in queue
-                        self._updateQueueEntry(queueEntry, Crawler.URLStatus.UNSUPPORTED)
-                    # Print output
-                    self._printEndDownloadStatusToTerminal(articleStatus, numRelatedArticles)
-                    # Calcualte time until next run
-                    millisecToNextRun = Crawler.CRAWL_DELAY - (round(time.time() * 1000) - self._lastRun)
-                    # Wait a time to avoid getting blocked by newspaper
-                    time.sleep(0 if millisecToNextRun < 0 else millisecToNextRun)
-                except Crawler.QueueIsEmpty:
-                    Crawler._printQueueEmpty()
-                    # Stop running the task
-                    self._doRun = False
-
-    def _queueRelatedArticles(self, relatedArticles): # This is ! efficient
-        # Keep track of queue items
-        queuedItems = 0
-        # For each related articles, queue it
-        for articleLink in relatedArticles:
-            if not self._isLinkInQueue(articleLink):
-                self._queueLink(articleLink)
-                queuedItems += 1
-            else:
+        # Get the next entry to download, failed pages that are due to be retried first. Raises QueueIsEmpty
+        # if the queue is exhausted
+        if self._nextDiscoveryTime is not None and time.time() >= self._nextDiscoveryTime:
+            self.discoverArticles()
+        if self._coordinator is not None and time.time() >= self._nextReceiveTime:
+            self._receiveLinks()
+        url = self._retries.getNext()
+        if url is None and self._revisits is not None:
+            # Then downloaded articles that are due to be revisited. An article queued again because it changed
+            # is downloaded from the queue instead
+            url = self._revisits.getNext()
+            if url is not None and self._queue.getEntry(url)['status'] == Crawler.URLStatus.CHANGED:
+                self._revisits.skip(url)
+                url = None
+        if url is not None:
+            return self._queue.getEntry(url)
+        return self._queue.getNext()
+
+    def _task(self, daemon = False):
+        while self._doRun:
+            # Changes made after this point wake the waits below
+            wakeUps = self._wakeUps
+            if self._paused:
+                self._waitForWakeUp(wakeUps, Crawler.STATE_PAUSED)
                 continue
-        return queuedItems
+            try:
+                # Get the next link to download
+                queueEntry = self._getNextInQueue()
+            except Crawler.QueueIsEmpty:
+                if not self._waitForWork(wakeUps, daemon):
+                    break
+                continue
+            self._state = Crawler.STATE_RUNNING
+            # Store run time
+            self._lastRun = time.time()
+            # Print output
+            self._printPreDownloadStatusToTerminal(queueEntry['url'])
+            # Try getting the article from the newspaper, the download waits for the crawl delay of the host
+            try:
+                result = self._downloadEntry(queueEntry)
+            except Exception as error:
+                # A failed page must not stop the crawl, the error is handled by _applyResult
+                result = error
+            # Save the article and queue related articles
+            with self._profileStage('apply'):
+                articleStatus, numRelatedArticles = self._applyResult(queueEntry, result)
+            # Drop the page before waiting for the next download
+            del result
+            if self._profiler is not None:
+                self._profiler.sample()
+            # Print output
+            self._printEndDownloadStatusToTerminal(articleStatus, numRelatedArticles)
+
+    def _concurrentTask(self, workers, parseProcesses = None, daemon = False):
+        # Fetches run in the worker threads and parsing in the worker threads or the process pool, while the
+        # queue and the output are only touched from this thread
+        parsePool = ProcessPoolExecutor(max_workers = parseProcesses) if parseProcesses else None
+        try:
+            with ThreadPoolExecutor(max_workers = workers) as pool:
+                fetching = {}
+                parsing = {}
+                while self._doRun:
+                    # Changes made after this point wake the waits below
+                    wakeUps = self._wakeUps
+                    # Keep the workers busy with the next entries in the queue
+                    isEmpty = False
+                    while len(fetching) < workers and not self._paused:
+                        try:
+                            queueEntry = self._getNextInQueue()
+                        except Crawler.QueueIsEmpty:
+                            isEmpty = True
+                            break
+                        # Print output
+                        self._printPreDownloadStatusToTerminal(queueEntry['url'])
+                        if parsePool:
+                            # The page is parsed in the process pool, not while it downloads
+                            future = pool.submit(self._fetchEntry, queueEntry, False)
+                        else:
+                            future = pool.submit(self._downloadEntry, queueEntry)
+                        fetching[future] = queueEntry
+                    # When nothing is in flight, wait for resume or more work, or stop when the queue is exhausted
+                    if not fetching and not parsing:
+                        if self._paused:
+                            self._waitForWakeUp(wakeUps, Crawler.STATE_PAUSED)
+                        elif isEmpty and not self._waitForWork(wakeUps, daemon):
+                            break
+                        continue
+                    self._state = Crawler.STATE_RUNNING
+                    # Wait for a fetch or parse to finish
+                    done, _ = wait(list(fetching) + list(parsing), return_when = FIRST_COMPLETED)
+                    for future in done:
+                        isFetched = future in fetching
+                        queueEntry = fetching.pop(future) if isFetched else parsing.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as error:
+                            result = error
+                        # Hand fetched pages to the parse stage
+                        if isFetched and parsePool and not isinstance(result, Exception):
+                            newspaper, articleHtml, extraction = result
+                            parsing[parsePool.submit(parsePage, newspaper, queueEntry['url'], articleHtml, extraction)] = queueEntry
+                            continue
+                        # Apply the results
+                        articleStatus, numRelatedArticles = self._applyResult(queueEntry, result)
+                        # Print output
+                        self._printEndDownloadStatusToTerminal(articleStatus, numRelatedArticles)
+        finally:
+            if parsePool:
+                parsePool.shutdown()
 
-    def _isLinkInQueue(self, link):
-        # Search through the queue
-        for queueEntry in self._queue:
-            # If the link is present return true
-            if link == queueEntry['url']:
+    def _waitForWork(self, wakeUps, daemon):
+        # Called when the queue is exhausted. Returns false if the crawl should stop, else waits until a failed
+        # page is due to be retried, an index page or the sitemaps are due again (in daemon mode), an article is
+        # added or the crawler is stopped
+        dueTimes = [self._retries.getNextTime()]
+        if self._revisits is not None:
+            dueTimes.append(self._revisits.getNextTime())
+        if daemon:
+            getNextRepollTime = getattr(self._queue, 'getNextRepollTime', None)
+            dueTimes += [getNextRepollTime() if getNextRepollTime else None, self._nextDiscoveryTime]
+        dueTimes = [dueTime for dueTime in dueTimes if dueTime is not None]
+        if self._coordinator is not None:
+            # Links handed over by other shards are work too
+            if self._receiveLinks():
                 return True
-        # Link not in queue, return false
+            # Look for links from the other shards on an interval, until every shard is finished
+            if daemon or dueTimes or not self._coordinator.isFinished():
+                dueTimes.append(time.time() + self.COORDINATION_INTERVAL)
+        dueTime = min(dueTimes) if dueTimes else None
+        if not daemon and dueTime is None:
+            Crawler._printQueueEmpty()
+            self._state = Crawler.STATE_DRAINED
+            self._doRun = False
+            return False
+        # Nothing is downloaded while waiting, so the articles the output holds back are written and the queue
+        # is made durable
+        self._output.flush()
+        self._checkpointQueue()
+        if dueTime is None:
+            # Nothing will be downloaded until an article is added
+            Crawler._printQueueDrained()
+            self._waitForWakeUp(wakeUps, Crawler.STATE_DRAINED)
+        else:
+            self._waitForWakeUp(wakeUps, Crawler.STATE_IDLE, max(0, dueTime - time.time()))
+        return True
+
+    def _waitForWakeUp(self, wakeUps, state, timeout = None):
+        # Block without using CPU until woken by a control method or the timeout
+        self._state = state
+        with self._control:
+            self._control.wait_for(lambda: self._wakeUps != wakeUps or not self._doRun, timeout)
+
+    def _wakeUp(self):
+        with self._control:
+            self._wakeUps += 1
+            self._control.notify_all()
+
+    def _fetchEntry(self, queueEntry, extract = True):
+        # Get the newspaper from the URL
+        newspaper = self._getNewspaperFromURL(queueEntry['url'])
+        if newspaper is Crawler._unsupportedNewspaper:
+            raise Crawler.UnsupportedNewspaper()
+        netloc = newspaper.getNetloc()
+        if netloc not in self._knownHosts:
+            self._addHost(newspaper)
+        # Download the page, waiting for a free slot on the newspaper host
+        start = time.perf_counter()
+        with self._politeness.slot(netloc):
+            self._metrics.observe('politeness_wait_seconds', time.perf_counter() - start)
+            # Parse the page while it downloads, if the newspaper and parser backend allow it
+            extractor = newspaper.makeExtractor() if extract else None
+            start = time.perf_counter()
+            # A revisited or changed article must not be served from the cache unasked
+            revalidate = queueEntry['status'] in (Crawler.URLStatus.DOWNLOADED, Crawler.URLStatus.CHANGED)
+            response = newspaper.getPage(queueEntry['url'], extractor.feed if extractor else None, revalidate)
+            # The latency of the host leaves out the parsing
+            latency = time.perf_counter() - start - (extractor.getSeconds() if extractor else 0.0)
+        # Adapt the download rate of the host to the response, pages from the cache were not requested
+        retryAfter = parseRetryAfter(response.headers.get('Retry-After'))
+        if not getattr(response, 'fromCache', False):
+            self._metrics.observe('fetch_seconds', latency)
+            self._politeness.report(netloc, latency, response.status_code, retryAfter)
+        if response.status_code >= 400:
+            raise Crawler.PageError(response.status_code, retryAfter)
+        extraction = None
+        if extractor:
+            extraction = extractor.close()
+            self._metrics.observe('parse_seconds', extractor.getSeconds(), stage = 'extract')
+        return newspaper, response.content, extraction
+
+    def _addHost(self, newspaper):
+        # Read the Crawl-delay of a newspaper the first time it is downloaded from
+        self._knownHosts.add(newspaper.getNetloc())
+        if self.OBEY_CRAWL_DELAY:
+            crawlDelay = newspaper.getCrawlDelay()
+            if crawlDelay:
+                self._politeness.setCrawlDelay(newspaper.getNetloc(), crawlDelay)
+
+    def _fetchDocument(self, url, onChunk):
+        # Download a sitemap or feed, waiting for a free slot on its host like a page, and pass each piece of it
+        # to onChunk as it arrives. False if it failed or is larger than MAX_DISCOVERY_BYTES
+        netloc = urlparse(url).netloc.lower()
+        try:
+            with self._politeness.slot(netloc):
+                start = time.perf_counter()
+                response = Newspaper.getTransport().get(url, self.DISCOVERY_CACHE_TTL, maxBytes = self.MAX_DISCOVERY_BYTES, onChunk = onChunk)
+                latency = time.perf_counter() - start
+        except requests.RequestException:
+            return None
+        if not getattr(response, 'fromCache', False):
+            self._metrics.increment('discovery_requests_total')
+            self._politeness.report(netloc, latency, response.status_code, parseRetryAfter(response.headers.get('Retry-After')))
+        return response.status_code == 200
+
+    def _queueDiscovered(self, newspaper, articleURL, lastmod):
+        # Only queue the pages of the newspaper on paths that are crawled
+        parsedUrl = urlparse(articleURL)
+        if parsedUrl.netloc.lower() != newspaper.getNetloc() or newspaper.isExcludedPath(parsedUrl.path):
+            return False
+        # New pages are one link from the front page
+        return self._queueLink(newspaper.canonicalizeUrl(articleURL), 1, lastmod)
+
+    def _queueLink(self, articleURL, depth, lastmod = None):
+        # Queue a canonical url, or hand it to its shard. Returns true if the url was queued or queued again
+        if self._coordinator is not None and not self._coordinator.isLocal(articleURL):
+            self._coordinator.send([(articleURL, depth, lastmod)])
+            return False
+        queueEntry = self._queue.getEntry(articleURL)
+        if queueEntry is None:
+            return self._queue.add(articleURL, depth, lastmod)
+        knownLastmod = queueEntry.get('lastmod')
+        if lastmod is None or (knownLastmod is not None and lastmod <= knownLastmod):
+            return False
+        self._queue.setLastmod(queueEntry, lastmod)
+        # Download an article again if it changed after it was downloaded. Without a known lastmod, the page
+        # is taken to be unchanged. The changed status sends the article to the versions file instead of
+        # through the duplicate check
+        if knownLastmod is not None and queueEntry['status'] == Crawler.URLStatus.DOWNLOADED:
+            self._queue.requeue(queueEntry, Crawler.URLStatus.CHANGED)
+            return True
         return False
 
+    def _receiveLinks(self):
+        # Queue the links handed over by other shards, returns the number of links received
+        self._nextReceiveTime = time.time() + self.COORDINATION_INTERVAL
+        links = self._coordinator.receive()
+        for articleURL, depth, lastmod in links:
+            self._queueLink(articleURL, depth, lastmod)
+        if links:
+            self._checkpointQueue()
+        return len(links)
+
+    def _downloadEntry(self, queueEntry):
+        # Download and parse the page in the calling thread
+        with self._profileStage('fetch'):
+            newspaper, articleHtml, extraction = self._fetchEntry(queueEntry)
+        with self._profileStage('parse'):
+            return parsePage(newspaper, queueEntry['url'], articleHtml, extraction)
+
+    def _profileStage(self, name):
+        # Profile the block as a stage in a profiled run
+        return self._profiler.stage(name) if self._profiler is not None else contextlib.nullcontext()
+
+    def _applyResult(self, queueEntry, result):
+        # The result is the error if the page failed
+        if isinstance(result, Exception):
+            return self._applyError(queueEntry, result)
+        self._retries.forget(queueEntry['url'])
+        # Record the time spent in each parse step
+        for stage, seconds in result.timings.items():
+            self._metrics.observe('parse_seconds', seconds, stage = stage)
+        # A downloaded article is only served again to be revisited, or because its lastmod changed
+        if queueEntry['status'] == Crawler.URLStatus.DOWNLOADED and self._revisits is not None:
+            return self._applyRevisit(queueEntry, result)
+        if queueEntry['status'] == Crawler.URLStatus.CHANGED:
+            return self._applyRevisit(queueEntry, result)
+        articleEntry = result.articleEntry
+        if articleEntry and self._duplicates is not None and self._checkDuplicate(articleEntry):
+            # The article is already in the output under another URL
+            articleStatus = Crawler.URLStatus.DUPLICATE
+        elif articleEntry:
+            # Save the article
+            self._saveEntryToOutput(articleEntry)
+            if self._revisits is not None:
+                self._revisits.add(queueEntry['url'], articleEntry, queueEntry.get('lastmod'), queueEntry.get('depth', 0))
+            # Count up in downloaded articles
+            self._downloadedArticles += 1
+            # Update the article status
+            articleStatus = Crawler.URLStatus.DOWNLOADED
+        else:
+            # The page does not contain an article, just get related
+            articleStatus = Crawler.URLStatus.ISINDEX
+        # Queue related articles, one link deeper than the page, if the links of the newspaper are followed
+        numRelatedArticles = 0
+        if self._getNewspaperFromURL(queueEntry['url']).FOLLOW_LINKS:
+            numRelatedArticles = self._queueRelatedArticles(result.linkedArticles, queueEntry.get('depth', 0) + 1)
+        # Mark the entry as downloaded in the queue
+        self._updateQueueEntry(queueEntry, articleStatus)
+        self._checkpointQueue()
+        self._countPage(articleStatus)
+        return articleStatus, numRelatedArticles
+
+    def _applyRevisit(self, queueEntry, result):
+        # Append a version record if the article changed since the last version. The article was stored before,
+        # so it is not checked for duplicates, and the queue entry stays or becomes downloaded again
+        changed = queueEntry['status'] == Crawler.URLStatus.CHANGED
+        with self._metrics.timer('output_seconds'):
+            if changed:
+                versionRecord = self._versions.update(queueEntry['url'], result.articleEntry)
+            else:
+                versionRecord = self._revisits.update(queueEntry['url'], result.articleEntry)
+        self._metrics.increment('changes_total' if changed else 'revisits_total')
+        if versionRecord is not None:
+            self._metrics.increment('versions_total')
+        if changed:
+            self._updateQueueEntry(queueEntry, Crawler.URLStatus.DOWNLOADED)
+            self._countPage(Crawler.URLStatus.DOWNLOADED)
+        # Queue the links added to the article since it was downloaded
+        numRelatedArticles = 0
+        if self._getNewspaperFromURL(queueEntry['url']).FOLLOW_LINKS:
+            numRelatedArticles = self._queueRelatedArticles(result.linkedArticles, queueEntry.get('depth', 0) + 1)
+        self._checkpointQueue()
+        return Crawler.URLStatus.DOWNLOADED, numRelatedArticles
+
+    def _applyError(self, queueEntry, error):
+        if queueEntry['status'] == Crawler.URLStatus.DOWNLOADED and self._revisits is not None:
+            # A failed revisit keeps the downloaded article, it is revisited again after the next interval
+            self._revisits.skip(queueEntry['url'])
+            self._metrics.increment('errors_total', type = type(error).__name__)
+            return Crawler.URLStatus.DOWNLOADED, 0
+        if isinstance(error, Crawler.UnsupportedNewspaper):
+            status, retry = Crawler.URLStatus.UNSUPPORTED, False
+        elif isinstance(error, Transport.ContentTypeNotAccepted):
+            # Not a web page, like a PDF or an image
+            status, retry = Crawler.URLStatus.UNSUPPORTED, False
+            self._metrics.increment('errors_total', type = type(error).__name__)
+        else:
+            status, retry = classifyError(error)
+            self._metrics.increment('errors_total', type = type(error).__name__)
+        # Leave the entry pending until it is downloaded again, unless it has used all its attempts
+        if retry and self._retries.schedule(queueEntry['url'], getattr(error, 'retryAfter', None)):
+            self._metrics.increment('retries_total')
+            self._printRetry(error)
+            return Crawler.URLStatus.PENDING, 0
+        # Mark the entry with its final status in the queue. A changed article that can not be downloaded again
+        # keeps the version stored
+        if queueEntry['status'] == Crawler.URLStatus.CHANGED:
+            status = Crawler.URLStatus.DOWNLOADED
+        self._updateQueueEntry(queueEntry, status)
+        self._checkpointQueue()
+        self._countPage(status)
+        return status, 0
+
+    def _checkDuplicate(self, articleEntry):
+        with self._metrics.timer('dedup_seconds'):
+            return self._duplicates.check(articleEntry)
+
+    def _countPage(self, status):
+        # Count the page, and update the slower metrics on an interval
+        self._metrics.increment('pages_total', status = Crawler.URLStatus.NAME[status])
+        if time.time() - self._lastMetricsUpdate >= self.METRICS_INTERVAL:
+            self._updateMetrics()
+
+    def _updateMetrics(self):
+        # Update the queue depth by status and the transport counters, and write the metrics file
+        self._lastMetricsUpdate = time.time()
+        for status, name in Crawler.URLStatus.NAME.items():
+            self._metrics.setGauge('queue_entries', self._queue.countByStatus(status), status = name)
+        transportMetrics = Newspaper.getTransport().getMetrics()
+        for name, metricName in Crawler.TRANSPORT_METRICS.items():
+            self._metrics.setCounter(metricName, transportMetrics[name])
+        if self._metricsFile:
+            self._metrics.writeSnapshot(self._metricsFile)
+
+    def _queueRelatedArticles(self, relatedArticles, depth = 0):
+        # Queue the canonical form of the related articles, returns the number of new queue items
+        with self._metrics.timer('enqueue_seconds'):
+            articleURLs = (self._canonicalizeUrl(articleURL) for articleURL in relatedArticles)
+            if self._coordinator is None:
+                return self._queue.addMany(articleURLs, depth)
+            # Hand the links of other shards to their shards
+            localURLs = []
+            for articleURL in articleURLs:
+                if self._coordinator.isLocal(articleURL):
+                    localURLs.append(articleURL)
+                else:
+                    self._coordinator.send([(articleURL, depth, None)])
+            return self._queue.addMany(localURLs, depth)
+
+    def _makePriorityFrontier(self, entries = None):
+        return PriorityFrontier(entries, self._scoreUrl)
+
+    def _scoreUrl(self, url, depth):
+        # Score the page by the rules of its newspaper
+        newspaper = self._getNewspaperFromURL(url)
+        if newspaper is Crawler._unsupportedNewspaper:
+            return self.UNSUPPORTED_SCORE
+        return newspaper.scoreUrl(url, depth)
+
+    def _canonicalizeUrl(self, url):
+        # Use the rules of the newspaper of the URL, the host is compared in lowercase
+        newspaper = self._getNewspaperFromURL(url)
+        if newspaper is Crawler._unsupportedNewspaper:
+            return url
+        return newspaper.canonicalizeUrl(url)
+
     def _printPreDownloadStatusToTerminal(self, url):
+        if not self.PRINT_STATUS:
+            return
         #Crawler.screen_clear()
         print('----------- Periodic run -----------')
-        print('Queue index: ' + str(self._queueIndex))
+        print('Queue index: ' + str(self._queue.getIndex()))
         print('Queue length: ' + str(len(self._queue)))
         print('Downloading article: ' + url)
         
     def _printEndDownloadStatusToTerminal(self, articleStatus, numRelatedArticles):
+        if not self.PRINT_STATUS:
+            return
         #Crawler.screen_clear()
         print('Article status: ' + Crawler.URLStatus.TEXT_STATUS[articleStatus] )
         print('Queueing new articles: ' + str(numRelatedArticles))
         print('New queue length: ' + str(len(self._queue)))
         print('----------- End run -----------')
 
+    def _printRetry(self, error):
+        if not self.PRINT_STATUS:
+            return
+        print('Download failed, retrying later: ' + (str(error) or type(error).__name__))
+
     @staticmethod
     def _printQueueEmpty():
         print('----------- Periodic run -----------')
         print('Queue exhausted. Stopping.')
         print('----------- End run -----------')
 
+    @staticmethod
+    def _printQueueDrained():
+        print('----------- Periodic run -----------')
+        print('Queue exhausted. Waiting for new articles.')
+        print('----------- End run -----------')
+
     @staticmethod
     def _unsupportedNewspaper(*kwargs):
         raise Crawler.UnsupportedNewspaper()
 
-    @staticmethod
-    def _saveEntryToOutput(outFileName, articleEntry):
-        # Open the output file
-        try:
-            # Try creating the file
-            with open(outFileName, "x") as outfile:
-                # Dump the new data
-                json.dump([articleEntry], outfile)
-        except FileExistsError: # If the file exists, an exception is thrown
-            with open(outFileName, "r+") as outfile:
-                # Load the current data from the file
-                entries = json.load(outfile)
-                # Add new data to the entry
-                entries.append(articleEntry)
-                # Reset the file pointer
-                outfile.seek(0)
-                # Dump the new data
-                json.dump(entries, outfile)
+    def _saveEntryToOutput(self, articleEntry):
+        # Write the entry to the output
+        with self._metrics.timer('output_seconds'):
+            self._output.write(articleEntry)
 
 # On keyboard interrupt or shutdown
 def signal_handler(signal, frame):
@@ -278,23 +801,80 @@ def signal_handler(signal, frame):
     print("Terminat signal recieved")
     raise ExitProgram()
 
+# On pause and resume signals
+def pause_handler(signal, frame):
+    print("Pause signal recieved")
+    crawler.pause()
+
+def resume_handler(signal, frame):
+    print("Resume signal recieved")
+    crawler.resume()
+
 # Program exit exception
 class ExitProgram(Exception):
     pass
 
+def runShards(shards):
+    # Run each shard in a process of its own with the same arguments, and merge their outputs when all stopped
+    processes = [subprocess.Popen([sys.executable, os.path.abspath(__file__)] + sys.argv[1:] + ['--shard', str(shard)]) for shard in range(shards)]
+    # Ctrl+C reaches the shards by itself, a terminate signal is passed on
+    signal.signal(signal.SIGTERM, lambda signal, frame: [process.terminate() for process in processes])
+    for process in processes:
+        while process.poll() is None:
+            try:
+                process.wait()
+            except KeyboardInterrupt:
+                # Wait for the shards to save their queues
+                continue
+    fileNames = [getShardFileName(Crawler.SHARD_OUTPUT_FILE, shard) for shard in range(shards)]
+    print('Merged articles: ' + str(mergeOutputs(fileNames, Crawler.SHARD_OUTPUT_FILE)))
+
 # Main
 if __name__ == '__main__':
+    arguments = argparse.ArgumentParser(description = 'Web article crawler')
+    # With --daemon, the crawler downloads the front pages again and revisits new articles on an interval, and
+    # runs until stopped
+    arguments.add_argument('--daemon', action = 'store_true', help = 'Keep running when the queue is exhausted')
+    arguments.add_argument('--shards', type = int, default = 1, help = 'Crawl in this many processes, each downloading its share of the urls')
+    arguments.add_argument('--shard', type = int, help = 'Run only this shard of a sharded crawl')
+    arguments.add_argument('--profile', nargs = '?', const = Crawler.PROFILE_DIR, metavar = 'DIR', help = 'Profile the crawl with cProfile and tracemalloc, writing the reports to DIR')
+    arguments.add_argument('--shard-key', choices = ShardRouter.KEYS, default = 'host', help = 'Share the urls out by host or by url')
+    arguments.add_argument('--metrics-port', type = int, metavar = 'PORT', help = 'Serve the metrics in the Prometheus text format on PORT, shard n on PORT + n')
+    arguments.add_argument('--metrics-file', metavar = 'FILE', help = 'Write a JSON snapshot of the metrics to FILE on an interval, each shard to a file of its own')
+    options = arguments.parse_args()
+    daemon = options.daemon
+    # With --shards, start a process for each shard
+    if options.shards > 1 and options.shard is None:
+        runShards(options.shards)
+        sys.exit(0)
     # Attatch listener for shutdown
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
-    # Create an instance of the crawler class
-    crawler = Crawler()
+    # A shard of a sharded crawl has its own output and cache, and finds the other shards in the coordinator
+    if options.shard is not None:
+        coordinator = SQLiteCoordinator(Crawler.COORDINATOR_FILE, options.shard, options.shards, options.shard_key)
+        Newspaper.setTransport(Transport(cache = ResponseCache(getShardFileName(Crawler.RESPONSE_CACHE_DIR, options.shard))))
+        metricsFile = getShardFileName(options.metrics_file, options.shard) if options.metrics_file else None
+        metricsPort = options.metrics_port + options.shard if options.metrics_port else None
+        crawler = Crawler(getShardFileName(Crawler.SHARD_OUTPUT_FILE, options.shard), outputFormat = 'jsonl', prioritize = daemon, metricsFile = metricsFile, metricsPort = metricsPort, coordinator = coordinator, revisit = daemon)
+    else:
+        # Cache the downloaded pages on disk, so unchanged pages are not transferred again on the next run
+        Newspaper.setTransport(Transport(cache = ResponseCache(Crawler.RESPONSE_CACHE_DIR)))
+        # Create an instance of the crawler class
+        crawler = Crawler(prioritize = daemon, metricsFile = options.metrics_file, metricsPort = options.metrics_port, revisit = daemon)
+    # Pause with SIGUSR1 and resume with SIGUSR2, where supported
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, pause_handler)
+        signal.signal(signal.SIGUSR2, resume_handler)
     #crawler.addArticle('https://www.bt.dk/samfund/han-vandt-danmarkshistoriens-naeststoerste-lottogevinst-nu-fortaeller-han-hvordan')
     #crawler.addArticle('https://www.bt.dk/royale/efter-royalt-skilsmissedrama-nu-reagerer-prins-louis-ekshustru')
     crawler.curlAllNewspapers()
     # Monitor program status
     try:
-        crawler.run()
+        if options.profile:
+            crawler.profile(options.profile, daemon)
+        else:
+            crawler.run(daemon = daemon)
     except ExitProgram:
         print("Stop command recieved")
     except Exception:
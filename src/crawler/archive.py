@@ -0,0 +1,366 @@
+# Imports
+import bisect, hashlib, json, mmap, os, struct, zlib
+
+# Optional zstd compression, gzip (zlib) is always available
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Block compression codecs, stored in the header of each block
+GZIP = 1
+ZSTD = 2
+CODECS = {
+    'gzip': GZIP,
+    'zstd': ZSTD
+}
+
+MAGIC = b'ARTARCH1' # First bytes of each archive file
+BLOCK_HEADER = struct.Struct('<BII') # Codec, compressed length and number of records of a block
+RECORD_LENGTH = struct.Struct('<I') # Length of each record inside a block
+INDEX_ENTRY = struct.Struct('<QHQQI') # Url hash, newspaper number, metadata block offset, content block offset, record in block
+INDEX_HEADER_LENGTH = struct.Struct('<I') # Length of the JSON header of the index
+
+def isArchive(fileName):
+    # Archives start with the magic bytes, the JSON formats with text
+    with open(fileName, "rb") as infile:
+        return infile.read(len(MAGIC)) == MAGIC
+
+def _hashUrl(url):
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size = 8).digest(), 'little')
+
+def _compress(codec, data):
+    if codec == ZSTD:
+        return zstandard.ZstdCompressor(level = 10).compress(data)
+    return zlib.compress(data, 6)
+
+def _decompress(codec, data):
+    if codec == ZSTD:
+        if zstandard is None:
+            raise RuntimeError('The archive is compressed with zstd, install zstandard to read it')
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+def _packRecords(records):
+    return b''.join(RECORD_LENGTH.pack(len(record)) + record for record in records)
+
+def _unpackRecords(data, count):
+    records = []
+    position = 0
+    for _ in range(count):
+        length = RECORD_LENGTH.unpack_from(data, position)[0]
+        position += RECORD_LENGTH.size
+        records.append(data[position:position + length])
+        position += length
+    return records
+
+def _readBlock(fileObject, offset):
+    # Return the records and the end offset of the block at the offset, or None if it is cut short
+    fileObject.seek(offset)
+    header = fileObject.read(BLOCK_HEADER.size)
+    if len(header) < BLOCK_HEADER.size:
+        return None
+    codec, length, count = BLOCK_HEADER.unpack(header)
+    data = fileObject.read(length)
+    if len(data) < length:
+        return None
+    return _unpackRecords(_decompress(codec, data), count), offset + BLOCK_HEADER.size + length
+
+# ArchiveOutput class definition
+# Writes the articles to a compressed archive of three files. The articles are written in blocks of about
+# BLOCK_BYTES of content, compressed with gzip or zstd. The small fields (newspaper, url, metainfo and title)
+# go to the metadata blocks in fileName, and the content to matching blocks in fileName.content, so a scan of
+# the metadata never decompresses a body. When closed, an index of the url and newspaper of each article is
+# written to fileName.index, used by ArchiveReader for random access. Articles written since the last flush
+# are lost in a crash; when an archive is opened again, a block cut short is removed and a missing index is
+# rebuilt from the blocks.
+class ArchiveOutput:
+    BLOCK_BYTES = 256 * 1024 # Uncompressed content in each block
+    BLOCK_RECORDS = 512 # Maximum articles in each block
+
+    def __init__(self, fileName, compression = None, blockBytes = BLOCK_BYTES):
+        self._fileName = fileName
+        # Use zstd when installed, it compresses better and decompresses faster than gzip
+        compression = compression or ('zstd' if zstandard else 'gzip')
+        if compression == 'zstd' and zstandard is None:
+            raise RuntimeError('zstd compression needs the zstandard package')
+        self._codec = CODECS[compression]
+        self._blockBytes = blockBytes
+        # Articles of the block being filled
+        self._metaRecords = []
+        self._contentRecords = []
+        self._contentBytes = 0
+        # Index entries of the blocks written, and the numbers of the newspapers
+        self._index = []
+        self._newspapers = {}
+        self._metaFile, self._contentFile = ArchiveOutput._openFiles(fileName)
+        # Recover the index of an existing archive
+        self._index, newspapers = ArchiveOutput._loadIndex(fileName, self._metaFile, self._contentFile)
+        self._newspapers = {name: number for number, name in enumerate(newspapers)}
+        # Positions in the index of the articles of each url hash, built by the first look-up
+        self._positions = None
+
+    def write(self, articleEntry):
+        newspaper = self._newspapers.setdefault(articleEntry['newspaper'], len(self._newspapers))
+        meta = {key: value for key, value in articleEntry.items() if key != 'content'}
+        content = articleEntry['content'].encode('utf-8')
+        self._metaRecords.append((articleEntry['url'], newspaper, json.dumps(meta, ensure_ascii = False).encode('utf-8')))
+        self._contentRecords.append(content)
+        self._contentBytes += len(content)
+        if self._contentBytes >= self._blockBytes or len(self._contentRecords) >= self.BLOCK_RECORDS:
+            self.flush()
+
+    def flush(self):
+        # Write the articles of the partial block, smaller blocks compress less well
+        self._writeBlock()
+        self._metaFile.flush()
+        self._contentFile.flush()
+
+    def get(self, url):
+        # Return the last article written with the url, or None. The articles of the block being filled are
+        # looked at first, then the blocks written, found by url hash
+        for (recordUrl, _, meta), content in zip(reversed(self._metaRecords), reversed(self._contentRecords)):
+            if recordUrl == url:
+                articleEntry = json.loads(meta)
+                articleEntry['content'] = content.decode('utf-8')
+                return articleEntry
+        if self._positions is None:
+            self._positions = {}
+            for position, entry in enumerate(self._index):
+                self._positions.setdefault(entry[0], []).append(position)
+        for position in reversed(self._positions.get(_hashUrl(url), ())):
+            _, _, metaOffset, contentOffset, record = self._index[position]
+            articleEntry = json.loads(_readBlock(self._metaFile, metaOffset)[0][record])
+            if articleEntry['url'] == url:
+                articleEntry['content'] = _readBlock(self._contentFile, contentOffset)[0][record].decode('utf-8')
+                return articleEntry
+        return None
+
+    def getPendingCount(self):
+        # Articles of the block being filled, which a crash loses. A full block is flushed when it is written
+        return len(self._contentRecords)
+
+    def close(self):
+        if self._metaFile.closed:
+            return
+        self.flush()
+        os.fsync(self._metaFile.fileno())
+        os.fsync(self._contentFile.fileno())
+        self._writeIndex()
+        self._metaFile.close()
+        self._contentFile.close()
+
+    def _writeBlock(self):
+        if not self._contentRecords:
+            return
+        metaOffset = self._metaFile.seek(0, os.SEEK_END)
+        contentOffset = self._contentFile.seek(0, os.SEEK_END)
+        # Write the content block before the metadata block, so a metadata block always has its content
+        compressed = _compress(self._codec, _packRecords(self._contentRecords))
+        self._contentFile.write(BLOCK_HEADER.pack(self._codec, len(compressed), len(self._contentRecords)) + compressed)
+        compressed = _compress(self._codec, _packRecords([record[2] for record in self._metaRecords]))
+        self._metaFile.write(BLOCK_HEADER.pack(self._codec, len(compressed), len(self._metaRecords)) + compressed)
+        for position, (url, newspaper, _) in enumerate(self._metaRecords):
+            self._index.append((_hashUrl(url), newspaper, metaOffset, contentOffset, position))
+            if self._positions is not None:
+                self._positions.setdefault(self._index[-1][0], []).append(len(self._index) - 1)
+        self._metaRecords = []
+        self._contentRecords = []
+        self._contentBytes = 0
+
+    def _writeIndex(self):
+        # Write the index sorted by url hash, next to the old one and renamed, so it is never seen half written
+        self._index.sort()
+        self._positions = None
+        newspapers = sorted(self._newspapers, key = self._newspapers.get)
+        header = json.dumps({
+            'newspapers': newspapers,
+            'metaSize': self._metaFile.seek(0, os.SEEK_END),
+            'contentSize': self._contentFile.seek(0, os.SEEK_END)
+        }).encode('utf-8')
+        with open(self._fileName + '.index.tmp', "wb") as indexFile:
+            indexFile.write(MAGIC + INDEX_HEADER_LENGTH.pack(len(header)) + header)
+            indexFile.write(b''.join(INDEX_ENTRY.pack(*entry) for entry in self._index))
+        os.replace(self._fileName + '.index.tmp', self._fileName + '.index')
+
+    @staticmethod
+    def _openFiles(fileName):
+        files = []
+        for name in (fileName, fileName + '.content'):
+            try:
+                archiveFile = open(name, "xb+")
+                archiveFile.write(MAGIC)
+            except FileExistsError:
+                archiveFile = open(name, "rb+")
+                if archiveFile.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(name + ' is not an article archive')
+            files.append(archiveFile)
+        return files
+
+    @staticmethod
+    def _loadIndex(fileName, metaFile, contentFile):
+        # Use the stored index if it covers the whole archive, else rebuild it from the blocks
+        metaSize = metaFile.seek(0, os.SEEK_END)
+        contentSize = contentFile.seek(0, os.SEEK_END)
+        try:
+            with open(fileName + '.index', "rb") as indexFile:
+                header, entries = ArchiveReader._parseIndex(indexFile.read())
+            if header['metaSize'] == metaSize and header['contentSize'] == contentSize:
+                return [INDEX_ENTRY.unpack_from(entries, offset) for offset in range(0, len(entries), INDEX_ENTRY.size)], header['newspapers']
+        except (FileNotFoundError, ValueError):
+            pass
+        index = []
+        newspapers = {}
+        metaOffset = contentOffset = len(MAGIC)
+        while True:
+            metaBlock = _readBlock(metaFile, metaOffset)
+            contentBlock = _readBlock(contentFile, contentOffset)
+            if metaBlock is None or contentBlock is None:
+                break
+            for position, record in enumerate(metaBlock[0]):
+                meta = json.loads(record)
+                newspaper = newspapers.setdefault(meta['newspaper'], len(newspapers))
+                index.append((_hashUrl(meta['url']), newspaper, metaOffset, contentOffset, position))
+            metaOffset, contentOffset = metaBlock[1], contentBlock[1]
+        # Remove the blocks cut short by a crash
+        metaFile.truncate(metaOffset)
+        contentFile.truncate(contentOffset)
+        return index, sorted(newspapers, key = newspapers.get)
+
+# ArchiveReader class definition
+# Reads an archive written by ArchiveOutput. The index is memory-mapped and searched by url hash, so looking up
+# an article decompresses only its metadata and content blocks. The last blocks read are kept, so looking up
+# articles stored together is cheap.
+class ArchiveReader:
+    def __init__(self, fileName):
+        self._metaFile = open(fileName, "rb")
+        self._contentFile = open(fileName + '.content', "rb")
+        if self._metaFile.read(len(MAGIC)) != MAGIC:
+            raise ValueError(fileName + ' is not an article archive')
+        with open(fileName + '.index', "rb") as indexFile:
+            self._indexMap = mmap.mmap(indexFile.fileno(), 0, access = mmap.ACCESS_READ)
+        header, self._entries = ArchiveReader._parseIndex(self._indexMap)
+        self._newspapers = header['newspapers']
+        self._length = len(self._entries) // INDEX_ENTRY.size
+        # Last metadata and content block read, by file offset
+        self._cachedBlocks = {}
+
+    def __len__(self):
+        return self._length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._entries.release()
+        self._indexMap.close()
+        self._metaFile.close()
+        self._contentFile.close()
+
+    def get(self, url, withContent = True):
+        # Return the article of the url, or None if it is not in the archive
+        urlHash = _hashUrl(url)
+        position = bisect.bisect_left(_IndexHashes(self._entries, self._length), urlHash)
+        # Check each entry with the hash, as two urls can share a hash
+        while position < self._length:
+            entryHash, _, metaOffset, contentOffset, record = INDEX_ENTRY.unpack_from(self._entries, position * INDEX_ENTRY.size)
+            if entryHash != urlHash:
+                break
+            meta = json.loads(self._getRecords(self._metaFile, metaOffset)[record])
+            if meta['url'] == url:
+                if withContent:
+                    meta['content'] = self._getRecords(self._contentFile, contentOffset)[record].decode('utf-8')
+                return meta
+            position += 1
+        return None
+
+    def __contains__(self, url):
+        return self.get(url, withContent = False) is not None
+
+    def getNewspapers(self):
+        return list(self._newspapers)
+
+    def iterArticles(self, newspaper = None, withContent = True):
+        # Stream the articles in the order they were written, optionally only those of one newspaper. Without
+        # the content, only the metadata blocks are read
+        blockOffsets = None
+        if newspaper is not None:
+            # Only read the blocks holding articles of the newspaper, found in the index
+            if newspaper not in self._newspapers:
+                return iter(())
+            number = self._newspapers.index(newspaper)
+            blockOffsets = set(entry[2] for entry in INDEX_ENTRY.iter_unpack(self._entries) if entry[1] == number)
+        return _iterBlocks(self._metaFile, self._contentFile, newspaper, withContent, blockOffsets)
+
+    def _getRecords(self, fileObject, offset):
+        key = (fileObject is self._contentFile, offset)
+        records = self._cachedBlocks.get(key)
+        if records is None:
+            records = _readBlock(fileObject, offset)[0]
+            # Keep one block of each file
+            self._cachedBlocks = {cachedKey: cached for cachedKey, cached in self._cachedBlocks.items() if cachedKey[0] != key[0]}
+            self._cachedBlocks[key] = records
+        return records
+
+    @staticmethod
+    def _parseIndex(data):
+        # Return the JSON header and a view of the entries of an index
+        if bytes(data[:len(MAGIC)]) != MAGIC:
+            raise ValueError('Not an article archive index')
+        headerLength = INDEX_HEADER_LENGTH.unpack_from(data, len(MAGIC))[0]
+        start = len(MAGIC) + INDEX_HEADER_LENGTH.size
+        header = json.loads(bytes(data[start:start + headerLength]))
+        return header, memoryview(data)[start + headerLength:]
+
+# _IndexHashes class definition
+# Sequence of the url hashes of the index entries, read from the memory-mapped index, for bisect
+class _IndexHashes:
+    def __init__(self, entries, length):
+        self._entries = entries
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, position):
+        return struct.unpack_from('<Q', self._entries, position * INDEX_ENTRY.size)[0]
+
+def _iterBlocks(metaFile, contentFile, newspaper, withContent, blockOffsets = None):
+    # Read the blocks of the archive files in order, and yield their articles. With blockOffsets, only the
+    # metadata blocks at those offsets are read
+    offset = contentOffset = len(MAGIC)
+    while True:
+        # The content blocks follow the metadata blocks one to one
+        metaFile.seek(offset)
+        header = metaFile.read(BLOCK_HEADER.size)
+        if len(header) < BLOCK_HEADER.size:
+            return
+        contentFile.seek(contentOffset)
+        nextContentOffset = contentOffset + BLOCK_HEADER.size + BLOCK_HEADER.unpack(contentFile.read(BLOCK_HEADER.size))[1]
+        if blockOffsets is not None and offset not in blockOffsets:
+            offset += BLOCK_HEADER.size + BLOCK_HEADER.unpack(header)[1]
+            contentOffset = nextContentOffset
+            continue
+        metaBlock = _readBlock(metaFile, offset)
+        if metaBlock is None:
+            return
+        metaRecords, offset = metaBlock
+        contentRecords = None
+        for position, record in enumerate(metaRecords):
+            meta = json.loads(record)
+            if newspaper is not None and meta['newspaper'] != newspaper:
+                continue
+            if withContent:
+                if contentRecords is None:
+                    contentRecords = _readBlock(contentFile, contentOffset)[0]
+                meta['content'] = contentRecords[position].decode('utf-8')
+            yield meta
+        contentOffset = nextContentOffset
+
+def iterArchive(fileName, newspaper = None, withContent = True):
+    # Stream the articles of an archive without using its index, so archives that were not closed can be read
+    with open(fileName, "rb") as metaFile, open(fileName + '.content', "rb") as contentFile:
+        yield from _iterBlocks(metaFile, contentFile, newspaper, withContent)
@@ -0,0 +1,119 @@
+# Imports
+import hashlib, re
+
+# Words of the article text, used for hashing
+WORD_PATTERN = re.compile(r'\w+')
+
+def _getWords(articleEntry):
+    # Lowercase words of the title and content, so whitespace and case differences do not matter
+    return WORD_PATTERN.findall((articleEntry['title'] + ' ' + articleEntry['content']).lower())
+
+def contentHash(articleEntry):
+    # Hash of the normalized article text, equal for exact duplicates
+    return hashlib.sha1(' '.join(_getWords(articleEntry)).encode('utf-8')).digest()
+
+def getFingerprintsFileName(fileName):
+    # Name of the fingerprints file of an output, 'articles.json' becomes 'articles.fingerprints.jsonl'
+    base, dot, extension = fileName.rpartition('.')
+    if not base or '/' in extension:
+        base = fileName
+    return base + '.fingerprints.jsonl'
+
+def simHash(articleEntry, shingleSize = 3):
+    # 64 bit SimHash of the word shingles of the article. Articles with mostly the same text get
+    # fingerprints that differ in few bits
+    words = _getWords(articleEntry)
+    shingles = [' '.join(words[index:index + shingleSize]) for index in range(max(1, len(words) - shingleSize + 1))]
+    hashes = b''.join(hashlib.blake2b(shingle.encode('utf-8'), digest_size = 8).digest() for shingle in shingles)
+    # Each bit of the fingerprint is set if the bit is set in most of the shingle hashes. The hashes are written
+    # out as one string of bits, so the bits in the same position of every hash are counted with a single
+    # slice instead of a Python loop over the hashes
+    bits = format(int.from_bytes(hashes, 'big'), '0{}b'.format(len(hashes) * 8))
+    half = len(shingles) / 2
+    fingerprint = 0
+    for bit in range(64):
+        fingerprint = (fingerprint << 1) | (bits[bit::64].count('1') > half)
+    return fingerprint
+
+# SimHashIndex class definition
+# Finds stored fingerprints within a Hamming distance of a fingerprint without comparing to all of them. The
+# 64 bits are split into maxDistance + 1 bands; two fingerprints differing in at most maxDistance bits are
+# equal in at least one band, so only the fingerprints sharing a band value are compared.
+class SimHashIndex:
+    def __init__(self, maxDistance = 3):
+        self._maxDistance = maxDistance
+        # Bit offsets and masks of the bands
+        self._bands = []
+        bandCount = maxDistance + 1
+        for band in range(bandCount):
+            start = band * 64 // bandCount
+            end = (band + 1) * 64 // bandCount
+            self._bands.append((start, (1 << (end - start)) - 1))
+        # One table per band, from band value to the fingerprints and their keys
+        self._tables = [{} for _ in self._bands]
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, fingerprint, key):
+        for table, (start, mask) in zip(self._tables, self._bands):
+            table.setdefault((fingerprint >> start) & mask, []).append((fingerprint, key))
+        self._size += 1
+
+    def find(self, fingerprint, excludeKey = None):
+        # Return the key of a stored fingerprint within the maximum distance, or None. Fingerprints stored under
+        # excludeKey are passed over
+        for table, (start, mask) in zip(self._tables, self._bands):
+            for candidate, key in table.get((fingerprint >> start) & mask, ()):
+                if key != excludeKey and bin(candidate ^ fingerprint).count('1') <= self._maxDistance:
+                    return key
+        return None
+
+# DuplicateDetector class definition
+# Remembers the articles seen, and recognizes exact duplicates by their content hash and near duplicates by
+# their SimHash. An article is never a duplicate of an earlier version under its own url. With a store, the
+# hash and fingerprint of each article remembered are written to it as a record, so the next run loads the
+# records instead of hashing all stored articles again.
+class DuplicateDetector:
+    def __init__(self, maxDistance = 3, store = None):
+        # Url of the first article with each content hash
+        self._hashes = {}
+        self._nearIndex = SimHashIndex(maxDistance)
+        self._store = store
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def check(self, articleEntry):
+        # Return the url of the article this is a duplicate of, or None after remembering the article
+        url = articleEntry['url']
+        digest = contentHash(articleEntry)
+        original = self._hashes.get(digest)
+        if original == url:
+            # The same text as stored under the url before
+            return None
+        if original is not None:
+            return original
+        fingerprint = simHash(articleEntry)
+        original = self._nearIndex.find(fingerprint, url)
+        if original is not None:
+            return original
+        self._remember(url, digest, fingerprint)
+        if self._store is not None:
+            self._store.write({'url': url, 'hash': digest.hex(), 'simHash': format(fingerprint, '016x')})
+        return None
+
+    def addAll(self, articleEntries):
+        # Remember articles stored by earlier runs, hashing each of them
+        for articleEntry in articleEntries:
+            self.check(articleEntry)
+
+    def load(self, records):
+        # Remember the records written to the store by earlier runs
+        for record in records:
+            self._remember(record['url'], bytes.fromhex(record['hash']), int(record['simHash'], 16))
+
+    def _remember(self, url, digest, fingerprint):
+        self._hashes.setdefault(digest, url)
+        self._nearIndex.add(fingerprint, url)
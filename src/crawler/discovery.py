@@ -0,0 +1,163 @@
+# Imports
+import zlib
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from xml.etree.ElementTree import XMLPullParser, ParseError
+
+CHUNK_SIZE = 64 * 1024 # Bytes fed to the XML parser at a time
+MAX_DOCUMENT_BYTES = 50 * 1024 * 1024 # Largest sitemap read, uncompressed, the limit of the sitemaps protocol
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+# Elements holding a link in sitemaps, sitemap indexes, RSS and Atom feeds, and the dates of the link
+ENTRY_TAGS = ('url', 'sitemap', 'item', 'entry')
+DATE_TAGS = ('lastmod', 'updated', 'pubDate', 'published', 'date', 'publication_date')
+
+# Kinds of the discovered links
+PAGE = 'page'
+SITEMAP = 'sitemap'
+
+def parseLastmod(text):
+    # Return a W3C datetime of a sitemap or Atom feed, or an RFC 822 date of an RSS feed, as a Unix time, or None
+    if not text:
+        return None
+    text = text.strip()
+    try:
+        date = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except ValueError:
+        try:
+            date = parsedate_to_datetime(text)
+        except (TypeError, ValueError):
+            return None
+    # Dates without a time zone are taken to be in UTC
+    if date.tzinfo is None:
+        date = date.replace(tzinfo = timezone.utc)
+    return date.timestamp()
+
+def _localName(tag):
+    # Strip the namespace of a tag, so sitemaps, RSS and Atom feeds are read the same with or without one
+    return tag.rsplit('}', 1)[-1]
+
+# LinkParser class definition
+# Parses a sitemap, sitemap index, RSS or Atom feed fed in chunks as it downloads, returning (kind, url, lastmod)
+# of each page or nested sitemap as soon as its element ends. Gzipped sitemaps (.xml.gz) are decompressed as
+# they are fed. Entries are removed from the tree once read, so a sitemap of 50,000 urls never grows a tree. A
+# malformed document, or one larger than maxBytes once decompressed, ends the links instead of raising.
+class LinkParser:
+    def __init__(self, maxBytes = MAX_DOCUMENT_BYTES):
+        self._maxBytes = maxBytes
+        self._parser = XMLPullParser(events = ('start', 'end'))
+        # Decompressor of a gzipped document, known from the first bytes fed
+        self._decompressor = None
+        self._started = False
+        self._done = False
+        # Bytes of XML parsed so far
+        self._size = 0
+        # Open elements, the parent of an entry is removing it
+        self._stack = []
+        self._url = self._lastmod = None
+
+    def feed(self, chunk):
+        # Parse the chunk, returns the links whose elements ended in it
+        if self._done or not chunk:
+            return []
+        if not self._started:
+            self._started = True
+            if chunk[:2] == GZIP_MAGIC:
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            if self._decompressor:
+                # Never decompress more than the size limit allows, guarding against gzip bombs
+                chunk = self._decompressor.decompress(chunk, self._maxBytes - self._size + 1)
+            return self._parse(chunk)
+        except (ParseError, zlib.error):
+            self._done = True
+            return []
+
+    def close(self):
+        # Returns the links of the end of the document
+        links = []
+        if not self._done and self._decompressor:
+            try:
+                links = self._parse(self._decompressor.flush())
+            except (ParseError, zlib.error):
+                pass
+        self._done = True
+        return links
+
+    def _parse(self, data):
+        self._size += len(data)
+        if self._size > self._maxBytes:
+            self._done = True
+            return []
+        self._parser.feed(data)
+        links = []
+        for event, element in self._parser.read_events():
+            tag = _localName(element.tag)
+            if event == 'start':
+                self._stack.append(element)
+                # Forget the link and date of the channel or feed itself
+                if tag in ENTRY_TAGS:
+                    self._url = self._lastmod = None
+                continue
+            self._stack.pop()
+            if tag == 'loc' or (tag == 'link' and element.text and element.text.strip()):
+                # <loc> of sitemaps, <link>url</link> of RSS. The first one wins, image sitemaps add an
+                # <image:loc> to the entry
+                self._url = self._url or element.text.strip()
+            elif tag == 'link':
+                # <link href="url"/> of Atom, the alternate link is the page
+                if element.get('rel', 'alternate') == 'alternate' and element.get('href'):
+                    self._url = self._url or element.get('href')
+            elif tag in DATE_TAGS:
+                # The first date of an entry wins, Atom gives updated before published
+                self._lastmod = self._lastmod or parseLastmod(element.text)
+            elif tag in ENTRY_TAGS:
+                if self._url:
+                    links.append(((SITEMAP if tag == 'sitemap' else PAGE), self._url, self._lastmod))
+                self._url = self._lastmod = None
+                if self._stack:
+                    self._stack[-1].remove(element)
+        return links
+
+def iterLinks(data):
+    # Parse a whole document, yielding (kind, url, lastmod) of each page or nested sitemap
+    parser = LinkParser()
+    for start in range(0, len(data), CHUNK_SIZE):
+        yield from parser.feed(data[start:start + CHUNK_SIZE])
+    yield from parser.close()
+
+# SitemapDiscovery class definition
+# Finds the pages of a newspaper from its sitemaps and feeds. Sitemap indexes are followed to the sitemaps
+# they list, skipping the nested sitemaps whose lastmod has not changed since they were last read. The fetch
+# function is called with a url and a function taking each piece of the document as it downloads, and returns
+# false if the document could not be downloaded. The document is parsed while it downloads.
+class SitemapDiscovery:
+    MAX_SITEMAPS = 1000 # Most sitemaps read in one discovery, guarding against sitemap index loops
+
+    def __init__(self, fetch):
+        self._fetch = fetch
+        # Lastmod of each nested sitemap when it was last read
+        self._sitemapLastmods = {}
+
+    def discover(self, urls):
+        # Yield (url, lastmod) of each page found in the sitemaps and feeds, and the sitemaps they link to
+        pending = [(url, None) for url in urls]
+        seen = set(urls)
+        fetched = 0
+        while pending and fetched < self.MAX_SITEMAPS:
+            sitemapUrl, sitemapLastmod = pending.pop(0)
+            fetched += 1
+            parser = LinkParser()
+            links = []
+            if not self._fetch(sitemapUrl, lambda chunk: links.extend(parser.feed(chunk))):
+                continue
+            links += parser.close()
+            if sitemapLastmod is not None:
+                self._sitemapLastmods[sitemapUrl] = sitemapLastmod
+            for kind, url, lastmod in links:
+                if kind == PAGE:
+                    yield url, lastmod
+                elif url not in seen and (lastmod is None or self._sitemapLastmods.get(url) != lastmod):
+                    seen.add(url)
+                    pending.append((url, lastmod))
@@ -0,0 +1,147 @@
+# Imports
+from collections import deque
+from .urlstatus import URLStatus
+
+# Frontier class definition
+# The frontier holds the crawl queue. Entries are kept in insertion order in a list, and indexed by URL
+# in a dict, so membership tests and status updates never scan the queue.
+class Frontier:
+    # Statuses that are served by getNext, all other statuses are final
+    SERVE_STATUSES = (
+        URLStatus.PENDING,
+        URLStatus.CHANGED
+    )
+
+    class QueueIsEmpty(Exception):
+        pass
+
+    def __init__(self, entries = None):
+        # Queue entries in insertion order
+        self._entries = []
+        # Look-up of queue entries by URL
+        self._index = {}
+        # Number of entries in each status
+        self._statusCounts = {}
+        # Position of the next entry to inspect in getNext
+        self._cursor = 0
+        # Urls of finished entries to serve again, before the entries after the cursor
+        self._requeued = deque()
+        # Optional journal logging every change
+        self._journal = None
+        # Load any existing entries
+        if entries:
+            self.load(entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, url):
+        return url in self._index
+
+    def load(self, entries):
+        # Add each stored entry, keeping its status
+        for entry in entries:
+            self._insert(entry['url'], entry['status'], entry.get('depth', 0), entry.get('lastmod'))
+
+    def setJournal(self, journal):
+        self._journal = journal
+
+    def add(self, url, depth = 0, lastmod = None):
+        # Validate that the link is not already in the queue
+        if url in self._index:
+            # Link already in queue, return false to indicate failure
+            return False
+        # Add the url to the queue, depth is the number of links followed from a front page and lastmod the
+        # time the page was last changed, if a sitemap or feed told
+        self._insert(url, URLStatus.PENDING, depth, lastmod)
+        if self._journal is not None:
+            self._journal.logAdd(url, depth, lastmod)
+        # Return true to indicate success
+        return True
+
+    def addMany(self, urls, depth = 0):
+        # Keep track of queued items
+        queuedItems = 0
+        # Add each url, counting the ones that were not already queued
+        for url in urls:
+            if self.add(url, depth):
+                queuedItems += 1
+        return queuedItems
+
+    def getEntry(self, url):
+        # Return the queue entry of the url, or None if the url is not queued
+        return self._index.get(url)
+
+    def updateStatus(self, queueEntry, status):
+        # Find the queue entry
+        entry = self._index[queueEntry['url']]
+        # Move the entry between the status counts
+        self._statusCounts[entry['status']] -= 1
+        self._statusCounts[status] = self._statusCounts.get(status, 0) + 1
+        # Update the status
+        entry['status'] = status
+        if self._journal is not None:
+            self._journal.logStatus(entry['url'], status)
+
+    def setLastmod(self, queueEntry, lastmod):
+        entry = self._index[queueEntry['url']]
+        entry['lastmod'] = lastmod
+        if self._journal is not None:
+            self._journal.logLastmod(entry['url'], lastmod)
+
+    def requeue(self, queueEntry, status = URLStatus.PENDING):
+        # Download a finished entry again, before the entries not served yet. A downloaded article that changed
+        # is queued with the changed status
+        self.updateStatus(queueEntry, status)
+        self._requeued.append(queueEntry['url'])
+
+    def getNext(self):
+        # Serve the requeued entries first
+        while self._requeued:
+            queueEntry = self._index[self._requeued.popleft()]
+            if queueEntry['status'] in Frontier.SERVE_STATUSES:
+                return queueEntry
+        # Get the length of the queue
+        queueLength = len(self._entries)
+        # Keep incrementing the cursor, until the next element to serve is found
+        while self._cursor < queueLength:
+            # Get the queue entry
+            queueEntry = self._entries[self._cursor]
+            # Increment the cursor
+            self._cursor += 1
+            # Check the status of the entry
+            if queueEntry['status'] in Frontier.SERVE_STATUSES:
+                # Return the queueEntry
+                return queueEntry
+        # Raise exception if the queue is exhausted
+        raise Frontier.QueueIsEmpty()
+
+    def getIndex(self):
+        return self._cursor
+
+    def countByStatus(self, status):
+        return self._statusCounts.get(status, 0)
+
+    def getEntries(self):
+        # Return the entries in insertion order, used when storing the queue
+        return self._entries
+
+    def _insert(self, url, status, depth = 0, lastmod = None):
+        # Skip duplicate entries, the first one wins
+        if url in self._index:
+            return None
+        # Create the entry
+        entry = {
+            'url': url,
+            'status': status,
+            'depth': depth
+        }
+        # The lastmod is only stored when known, keeping the stored queue small
+        if lastmod is not None:
+            entry['lastmod'] = lastmod
+        # Store the entry in the queue and the index
+        self._entries.append(entry)
+        self._index[url] = entry
+        # Count the status
+        self._statusCounts[status] = self._statusCounts.get(status, 0) + 1
+        return entry
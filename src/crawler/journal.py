@@ -0,0 +1,108 @@
+# Imports
+import json, os
+
+# Include classes and subfolders
+from .frontier import Frontier
+from .output import JSONLinesOutput, readJSONLines
+
+# QueueJournal class definition
+# Write-ahead log of the queue. Every enqueue and status change is appended to the journal as one JSON line,
+# so a crashed crawl can be resumed from the last snapshot of the queue and the journal written after it.
+# When the journal grows as long as the queue, a new snapshot is written and the journal is started over.
+# Events are held in memory until flush, so the crawler can hold back the events of pages whose articles are
+# not yet written to the output.
+class QueueJournal:
+    ADD = 'a'
+    STATUS = 's'
+    LASTMOD = 'm'
+
+    SNAPSHOT_MIN_EVENTS = 10000 # Never compact a journal shorter than this
+
+    def __init__(self, snapshotFile, journalFile, fsyncEvery = 0):
+        self._snapshotFile = snapshotFile
+        self._journalFile = journalFile
+        self._fsyncEvery = fsyncEvery
+        # Number of events in the journal since the last snapshot, and the events not yet written
+        self._events = 0
+        self._pending = []
+        self._journal = None
+
+    def loadFrontier(self, frontierFactory = Frontier):
+        # Load the snapshot and replay the journal on top of it, in time linear in the number of events
+        try:
+            with open(self._snapshotFile, "r") as queueFile:
+                frontier = frontierFactory(json.load(queueFile))
+        except FileNotFoundError:
+            frontier = frontierFactory()
+        self._events = QueueJournal._replay(self._journalFile, frontier)
+        return frontier
+
+    def load(self, frontierFactory = Frontier):
+        # Load the frontier, and log the changes made from now on
+        frontier = self.loadFrontier(frontierFactory)
+        self._journal = JSONLinesOutput(self._journalFile, flushEvery = 0, fsyncEvery = self._fsyncEvery)
+        frontier.setJournal(self)
+        return frontier
+
+    def logAdd(self, url, depth = 0, lastmod = None):
+        self._log([QueueJournal.ADD, url, depth] if lastmod is None else [QueueJournal.ADD, url, depth, lastmod])
+
+    def logLastmod(self, url, lastmod):
+        self._log([QueueJournal.LASTMOD, url, lastmod])
+
+    def logStatus(self, url, status):
+        self._log([QueueJournal.STATUS, url, status])
+
+    def flush(self):
+        # Write the events logged since the last flush. Called after each page, once its article is written, so
+        # at most the events of the pages not yet in the output are lost in a crash
+        for event in self._pending:
+            self._journal.write(event)
+        self._pending = []
+        self._journal.flush()
+
+    def needsSnapshot(self, frontier):
+        return self._events >= max(QueueJournal.SNAPSHOT_MIN_EVENTS, len(frontier))
+
+    def snapshot(self, frontier):
+        # Write the new snapshot next to the old one and rename it, so a crash leaves either snapshot intact
+        with open(self._snapshotFile + '.tmp', "w") as queueFile:
+            json.dump(frontier.getEntries(), queueFile)
+            queueFile.flush()
+            os.fsync(queueFile.fileno())
+        os.replace(self._snapshotFile + '.tmp', self._snapshotFile)
+        # Start the journal over. A crash before this point replays events the snapshot already holds,
+        # which gives the same queue
+        self._journal.close()
+        self._journal = JSONLinesOutput(self._journalFile, flushEvery = 0, fsyncEvery = self._fsyncEvery)
+        self._journal.truncate()
+        self._events = 0
+        self._pending = []
+
+    def close(self):
+        if self._journal is not None:
+            self.flush()
+            self._journal.close()
+
+    def _log(self, event):
+        self._pending.append(event)
+        self._events += 1
+
+    @staticmethod
+    def _replay(journalFile, frontier):
+        # Apply each event of the journal to the frontier, returns the number of events
+        events = 0
+        try:
+            for event in readJSONLines(journalFile):
+                if event[0] == QueueJournal.ADD:
+                    frontier.add(event[1], event[2] if len(event) > 2 else 0, event[3] if len(event) > 3 else None)
+                elif event[0] in (QueueJournal.STATUS, QueueJournal.LASTMOD):
+                    queueEntry = frontier.getEntry(event[1])
+                    if queueEntry is not None and event[0] == QueueJournal.STATUS:
+                        frontier.updateStatus(queueEntry, event[2])
+                    elif queueEntry is not None:
+                        frontier.setLastmod(queueEntry, event[2])
+                events += 1
+        except FileNotFoundError:
+            pass
+        return events
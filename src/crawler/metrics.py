@@ -0,0 +1,183 @@
+# Imports
+import bisect, json, os, threading, time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+
+# Histogram class definition
+# Counts observations in fixed buckets, like a Prometheus histogram. Observing a value costs a binary search,
+# and quantiles are estimated from the buckets.
+class Histogram:
+    def __init__(self, buckets = LATENCY_BUCKETS):
+        self._buckets = buckets
+        self._counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self._counts[bisect.bisect_left(self._buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def getBuckets(self):
+        # Cumulative count of the observations at most each bucket bound
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(self._buckets, self._counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        return buckets
+
+    def getQuantile(self, quantile):
+        # Estimate the quantile by linear interpolation inside its bucket
+        if not self.count:
+            return None
+        rank = quantile * self.count
+        lowerBound = 0.0
+        cumulative = 0
+        for bound, count in zip(self._buckets, self._counts):
+            if count and cumulative + count >= rank:
+                if bound == float('inf'):
+                    return lowerBound
+                return lowerBound + (bound - lowerBound) * (rank - cumulative) / count
+            cumulative += count
+            lowerBound = bound
+        return lowerBound
+
+# Metrics class definition
+# Counters, gauges and latency histograms of a crawl, safe to update from the worker threads. A metric is
+# identified by its name and optional labels, e.g. observe('parse_seconds', 0.01, stage = 'title'). The
+# metrics can be rendered in the Prometheus text format, or as a JSON snapshot with rates and quantiles.
+class Metrics:
+    def __init__(self, prefix = 'crawler_'):
+        self._prefix = prefix
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._startTime = time.time()
+        # Counters and time of the last snapshot, used for the rates
+        self._lastSnapshotCounters = {}
+        self._lastSnapshotTime = self._startTime
+
+    def increment(self, name, amount = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def setCounter(self, name, value, **labels):
+        # Set a counter kept elsewhere, e.g. the bytes received by the transport
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] = value
+
+    def setGauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        # Observe the seconds spent in the body
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def toPrometheus(self):
+        # Render the metrics in the Prometheus text exposition format
+        lines = []
+        with self._lock:
+            for kind, metrics in (('counter', self._counters), ('gauge', self._gauges)):
+                for name in sorted(set(key[0] for key in metrics)):
+                    lines.append('# TYPE ' + self._prefix + name + ' ' + kind)
+                    for key in sorted(key for key in metrics if key[0] == name):
+                        lines.append(self._prefix + name + Metrics._formatLabels(key[1]) + ' ' + repr(metrics[key]))
+            for name in sorted(set(key[0] for key in self._histograms)):
+                lines.append('# TYPE ' + self._prefix + name + ' histogram')
+                for key in sorted(key for key in self._histograms if key[0] == name):
+                    histogram = self._histograms[key]
+                    for bound, count in histogram.getBuckets():
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(self._prefix + name + '_bucket' + Metrics._formatLabels(key[1] + (('le', le),)) + ' ' + str(count))
+                    lines.append(self._prefix + name + '_sum' + Metrics._formatLabels(key[1]) + ' ' + repr(histogram.sum))
+                    lines.append(self._prefix + name + '_count' + Metrics._formatLabels(key[1]) + ' ' + str(histogram.count))
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        # Return the metrics as a dict, with the rate of each counter since the last snapshot
+        now = time.time()
+        with self._lock:
+            interval = now - self._lastSnapshotTime
+            counters = {}
+            rates = {}
+            for key, value in self._counters.items():
+                name = Metrics._formatName(key)
+                counters[name] = value
+                if interval > 0:
+                    rates[name] = (value - self._lastSnapshotCounters.get(key, 0)) / interval
+            histograms = {}
+            for key, histogram in self._histograms.items():
+                histograms[Metrics._formatName(key)] = {
+                    'count': histogram.count,
+                    'sum': histogram.sum,
+                    'p50': histogram.getQuantile(0.5),
+                    'p99': histogram.getQuantile(0.99)
+                }
+            self._lastSnapshotCounters = dict(self._counters)
+            self._lastSnapshotTime = now
+            return {
+                'time': now,
+                'uptimeSeconds': now - self._startTime,
+                'counters': counters,
+                'rates': rates,
+                'gauges': {Metrics._formatName(key): value for key, value in self._gauges.items()},
+                'histograms': histograms
+            }
+
+    def writeSnapshot(self, fileName):
+        # Write the snapshot next to the old one and rename it, so readers never see a partial file
+        with open(fileName + '.tmp', "w") as outfile:
+            json.dump(self.snapshot(), outfile)
+        os.replace(fileName + '.tmp', fileName)
+
+    def serve(self, port, host = '127.0.0.1'):
+        # Serve the Prometheus text format on http://host:port/metrics from a daemon thread
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.toPrometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        server.daemon_threads = True
+        threading.Thread(target = server.serve_forever, daemon = True).start()
+        return server
+
+    @staticmethod
+    def _formatLabels(labels):
+        if not labels:
+            return ''
+        return '{' + ','.join(name + '="' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"' for name, value in labels) + '}'
+
+    @staticmethod
+    def _formatName(key):
+        # Name of a metric in the JSON snapshot, e.g. 'parse_seconds{stage="title"}'
+        return key[0] + Metrics._formatLabels(key[1])
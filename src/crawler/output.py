@@ -0,0 +1,200 @@
+# Imports
+import json, os, sys
+
+# Include classes and subfolders
+from .archive import ArchiveOutput, isArchive, iterArchive
+
+# JSONArrayOutput class definition
+# Writes the articles to a single JSON array. Each write loads and rewrites the whole file, so this is only
+# suited for small crawls, but the file can be read directly with json.load.
+class JSONArrayOutput:
+    def __init__(self, fileName):
+        self._fileName = fileName
+
+    def write(self, articleEntry):
+        # Open the output file
+        try:
+            # Try creating the file
+            with open(self._fileName, "x") as outfile:
+                # Dump the new data
+                json.dump([articleEntry], outfile)
+        except FileExistsError: # If the file exists, an exception is thrown
+            with open(self._fileName, "r+") as outfile:
+                # Load the current data from the file
+                entries = json.load(outfile)
+                # Add new data to the entry
+                entries.append(articleEntry)
+                # Reset the file pointer
+                outfile.seek(0)
+                # Dump the new data
+                json.dump(entries, outfile)
+
+    def flush(self):
+        pass
+
+    def getPendingCount(self):
+        # Every write rewrites the file
+        return 0
+
+    def get(self, url):
+        # Return the last article written with the url, or None. The whole file is loaded
+        try:
+            with open(self._fileName, "r") as infile:
+                entries = json.load(infile)
+        except FileNotFoundError:
+            return None
+        for articleEntry in reversed(entries):
+            if articleEntry['url'] == url:
+                return articleEntry
+        return None
+
+    def close(self):
+        pass
+
+# JSONLinesOutput class definition
+# Appends each article as one JSON object per line. Writing an article costs one append, and a crash can at
+# most lose or truncate the last line.
+class JSONLinesOutput:
+    def __init__(self, fileName, flushEvery = 1, fsyncEvery = 0):
+        self._fileName = fileName
+        # Number of articles between each flush of the write buffer, 0 only flushes on close
+        self._flushEvery = flushEvery
+        # Number of articles between each fsync to disk, 0 only syncs on close
+        self._fsyncEvery = fsyncEvery
+        # Articles written since the last flush and fsync
+        self._unflushed = 0
+        self._unsynced = 0
+        # File offsets of the entries of each url, built by the first look-up, and the offset indexed up to
+        self._offsets = None
+        self._indexedTo = 0
+        # Open the file for appending
+        self._outfile = open(self._fileName, "a+", encoding = 'utf-8')
+        # If a crash cut the last line short, start the next article on a new line. The last byte is read, not
+        # the last character, as the cut can fall inside a multibyte character
+        if self._outfile.tell() > 0:
+            with open(self._fileName, "rb") as infile:
+                infile.seek(-1, os.SEEK_END)
+                if infile.read(1) != b'\n':
+                    self._outfile.write('\n')
+
+    def write(self, articleEntry):
+        # Append the entry as a single line
+        self._outfile.write(json.dumps(articleEntry, ensure_ascii = False) + '\n')
+        self._unflushed += 1
+        self._unsynced += 1
+        # Flush and sync according to the policy
+        if self._flushEvery and self._unflushed >= self._flushEvery:
+            self.flush()
+        if self._fsyncEvery and self._unsynced >= self._fsyncEvery:
+            self._sync()
+
+    def flush(self):
+        self._outfile.flush()
+        self._unflushed = 0
+
+    def getPendingCount(self):
+        # Articles written since the last flush, which a crash can lose
+        return self._unflushed
+
+    def get(self, url):
+        # Return the last entry written with the url, or None
+        entries = self.getAll(url)
+        return entries[-1] if entries else None
+
+    def getAll(self, url):
+        # Return the entries written with the url, in the order they were written. The first look-up reads the
+        # whole file to index the offsets of the entries by url, the next only read the lines added since
+        self.flush()
+        if self._offsets is None:
+            self._offsets = {}
+            self._indexedTo = 0
+        with open(self._fileName, "rb") as infile:
+            infile.seek(self._indexedTo)
+            offset = self._indexedTo
+            for line in infile:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash
+                    entry = None
+                if isinstance(entry, dict) and 'url' in entry:
+                    self._offsets.setdefault(entry['url'], []).append(offset)
+                offset += len(line)
+            self._indexedTo = offset
+            entries = []
+            for offset in self._offsets.get(url, ()):
+                infile.seek(offset)
+                entries.append(json.loads(infile.readline()))
+        return entries
+
+    def truncate(self):
+        # Remove all written articles
+        self.flush()
+        self._outfile.seek(0)
+        self._outfile.truncate()
+        self._offsets = None
+
+    def close(self):
+        if not self._outfile.closed:
+            self._sync()
+            self._outfile.close()
+
+    def _sync(self):
+        self.flush()
+        os.fsync(self._outfile.fileno())
+        self._unsynced = 0
+
+# Output formats selectable by name
+OUTPUT_FORMATS = {
+    'json': JSONArrayOutput,
+    'jsonl': JSONLinesOutput,
+    'archive': ArchiveOutput
+}
+
+def readJSONLines(fileName):
+    # Yield each article in a JSON Lines file. The lines are read as bytes and decoded one at a time, so a line
+    # cut inside a multibyte character only loses that line
+    with open(fileName, "rb") as infile:
+        for line in infile:
+            # Skip empty lines
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # A line cut short by a crash is skipped, only the last line of a run can be affected
+                continue
+
+def iterArticles(fileName):
+    # Iterate the articles of any output format, a JSON array starts with a bracket and is loaded at once
+    if isArchive(fileName):
+        return iterArchive(fileName)
+    with open(fileName, "r", encoding = 'utf-8', errors = 'replace') as infile:
+        if infile.read(64).lstrip().startswith('['):
+            infile.seek(0)
+            return iter(json.load(infile))
+    return readJSONLines(fileName)
+
+def readArticles(fileName):
+    # Read the articles of any output format into a list
+    return list(iterArticles(fileName))
+
+def convertJSONLinesToArray(inFileName, outFileName):
+    # Stream the articles of a JSON Lines file into a JSON array file, without holding all articles in memory
+    articles = 0
+    with open(outFileName, "w", encoding = 'utf-8') as outfile:
+        outfile.write('[')
+        for articleEntry in readJSONLines(inFileName):
+            if articles:
+                outfile.write(', ')
+            json.dump(articleEntry, outfile)
+            articles += 1
+        outfile.write(']')
+    return articles
+
+# Convert a JSON Lines file to a JSON array file
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('Usage: python -m src.crawler.output articles.jsonl articles.json')
+        sys.exit(1)
+    print('Converted articles: ' + str(convertJSONLinesToArray(sys.argv[1], sys.argv[2])))
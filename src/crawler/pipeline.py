@@ -0,0 +1,29 @@
+# Parse stage of the crawl pipeline. The function is kept at module level, so it can run in a worker process
+# of a ProcessPoolExecutor; the newspaper class is pickled by reference and the result is a PageResult.
+
+# PageResult class definition
+# What the crawler keeps of a parsed page: the article entry (title, content and metainfo, or None for an
+# index page), the links of the page and the seconds spent in each parse step. The slots keep the many
+# results in flight small, and the page itself is released before the result is returned.
+class PageResult:
+    __slots__ = ('articleEntry', 'linkedArticles', 'timings')
+
+    def __init__(self, articleEntry, linkedArticles, timings):
+        self.articleEntry = articleEntry
+        self.linkedArticles = linkedArticles
+        self.timings = timings
+
+def parsePage(newspaper, articleUrl, articleHtml, extraction = None):
+    # Build the newspaper page from the already fetched HTML, and the extraction made while it was fetched
+    newspage = newspaper(articleUrl, articleHtml)
+    if extraction is not None:
+        newspage.setExtraction(extraction)
+    try:
+        # Get the articleEntry (title, content and metainfo) and the related articles
+        articleEntry = newspage.getArticleEntry()
+        linkedArticles = newspage.measure('links', newspage.getLinkedArticles)
+    finally:
+        # Free the HTML and the parse tree now, instead of when the cycle collector finds the tree
+        newspage.release()
+    # The seconds spent in each step are returned with the result, as the metrics live in the crawler process
+    return PageResult(articleEntry, linkedArticles, newspage.getTimings())
@@ -0,0 +1,139 @@
+# Imports
+import threading, time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+def parseRetryAfter(value):
+    # Return the seconds to wait from a Retry-After header, given in seconds or as an HTTP date, or None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+# AdaptivePoliteness class definition
+# Limits the fetches to each host with a token bucket, refilled at one token per delay. The delay of each host
+# adapts to the responses reported with report: it is shortened while the responses are fast, lengthened when
+# the response time rises well above the fastest seen, and doubled on a 429 or 503 answer, after which no fetch
+# is started until the Retry-After time has passed. The delay never goes below the robots.txt Crawl-delay of
+# the host, set with setCrawlDelay.
+class AdaptivePoliteness:
+    SPEED_UP = 0.95 # Factor of the delay after a fast response
+    SLOW_DOWN = 1.25 # Factor of the delay after a slow response
+    BACK_OFF = 2 # Factor of the delay after a 429 or 503 answer
+    MIN_BACK_OFF_DELAY = 0.1 # Delay in seconds after the first 429 or 503 answer, if the delay was shorter
+    MIN_SLOW_DOWN_DELAY = 0.01 # Delay in seconds after the first slow response, if the delay was shorter
+    SLOW_FACTOR = 2 # A response is slow when it takes this many times the fastest average response time,
+    SLOW_MARGIN = 0.05 # plus this many seconds, so the jitter of fast hosts is not taken for slowness
+    LATENCY_WEIGHT = 0.2 # Weight of each response time in the moving average
+    THROTTLE_STATUSES = (429, 503)
+
+    # _Host class definition
+    # The limiter state of a host
+    class _Host:
+        def __init__(self, delay, burst):
+            self.delay = delay
+            self.minDelay = 0.0
+            self.tokens = burst
+            self.refillTime = time.monotonic()
+            self.blockedUntil = 0.0
+            self.active = 0
+            self.latency = None
+            self.fastestLatency = None
+
+    def __init__(self, initialDelay, minDelay = 0.0, maxDelay = 60.0, maxPerHost = 1, burst = 1):
+        # Delay in seconds between fetches to a new host, and the range the delay adapts within
+        self._initialDelay = initialDelay
+        self._minDelay = minDelay
+        self._maxDelay = maxDelay
+        # Maximum number of fetches in flight to the same host, and the number of tokens a host can save up
+        self._maxPerHost = maxPerHost
+        self._burst = burst
+        self._hosts = {}
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self, netloc):
+        # Hold a fetch slot for the host while the body runs
+        self.acquire(netloc)
+        try:
+            yield
+        finally:
+            self.release(netloc)
+
+    def acquire(self, netloc):
+        with self._condition:
+            host = self._getHost(netloc)
+            while True:
+                now = time.monotonic()
+                # Wait for a free slot on the host
+                if host.active >= self._maxPerHost:
+                    self._condition.wait()
+                    continue
+                # Wait while the host asked us to back off
+                if now < host.blockedUntil:
+                    self._condition.wait(host.blockedUntil - now)
+                    continue
+                # Refill the bucket, and wait for a token
+                if host.delay > 0:
+                    host.tokens = min(self._burst, host.tokens + (now - host.refillTime) / host.delay)
+                    host.refillTime = now
+                    if host.tokens < 1:
+                        self._condition.wait((1 - host.tokens) * host.delay)
+                        continue
+                    host.tokens -= 1
+                host.active += 1
+                return
+
+    def release(self, netloc):
+        with self._condition:
+            self._hosts[netloc].active -= 1
+            # Wake the fetches waiting for a slot
+            self._condition.notify_all()
+
+    def report(self, netloc, latency, statusCode = 200, retryAfter = None):
+        # Adapt the delay of the host to a response, latency is the response time in seconds and retryAfter the
+        # seconds from the Retry-After header
+        with self._condition:
+            host = self._getHost(netloc)
+            if statusCode in AdaptivePoliteness.THROTTLE_STATUSES:
+                self._setDelay(host, max(host.delay * AdaptivePoliteness.BACK_OFF, AdaptivePoliteness.MIN_BACK_OFF_DELAY))
+                if retryAfter:
+                    host.blockedUntil = max(host.blockedUntil, time.monotonic() + retryAfter)
+                return
+            # Keep a moving average of the response time, and the fastest average seen
+            if host.latency is None:
+                host.latency = latency
+            else:
+                host.latency += (latency - host.latency) * AdaptivePoliteness.LATENCY_WEIGHT
+            host.fastestLatency = host.latency if host.fastestLatency is None else min(host.fastestLatency, host.latency)
+            if host.latency > host.fastestLatency * AdaptivePoliteness.SLOW_FACTOR + AdaptivePoliteness.SLOW_MARGIN:
+                self._setDelay(host, max(host.delay * AdaptivePoliteness.SLOW_DOWN, AdaptivePoliteness.MIN_SLOW_DOWN_DELAY))
+            else:
+                self._setDelay(host, host.delay * AdaptivePoliteness.SPEED_UP)
+
+    def setCrawlDelay(self, netloc, crawlDelay):
+        # Never fetch from the host faster than the robots.txt Crawl-delay
+        with self._condition:
+            host = self._getHost(netloc)
+            host.minDelay = crawlDelay
+            self._setDelay(host, host.delay)
+
+    def getDelay(self, netloc):
+        with self._condition:
+            return self._getHost(netloc).delay
+
+    def _getHost(self, netloc):
+        host = self._hosts.get(netloc)
+        if host is None:
+            host = self._hosts[netloc] = AdaptivePoliteness._Host(self._initialDelay, self._burst)
+        return host
+
+    def _setDelay(self, host, delay):
+        # The Crawl-delay floor is applied last, so it holds even above the maximum delay
+        host.delay = max(host.minDelay, min(self._maxDelay, max(self._minDelay, delay)))
@@ -0,0 +1,104 @@
+# Imports
+import cProfile, contextlib, io, os, pstats, time, tracemalloc
+
+# StageProfiler class definition
+# Profiles the stages of a crawl, like the download, the parsing and applying the result of each page. Each
+# stage has a cProfile profile of its own, enabled only while the stage runs, and tracemalloc follows the
+# memory allocated in it: the peak above the memory at the start of the stage and the memory still held at its
+# end. The traced memory is sampled every SAMPLE_INTERVAL pages, and snapshots of the allocations at the start
+# and the end of the crawl tell where memory is kept. The stages must run in one thread, one at a time, as
+# cProfile only profiles the thread that enabled it and tracemalloc counts the allocations of all threads.
+class StageProfiler:
+    SAMPLE_INTERVAL = 100 # Pages between each sample of the traced memory
+    TRACE_FRAMES = 10 # Frames kept of the traceback of each allocation
+    TOP_LINES = 30 # Functions and allocation sites listed in the reports
+
+    def __init__(self, reportDir, sampleInterval = SAMPLE_INTERVAL):
+        self._reportDir = reportDir
+        self._sampleInterval = sampleInterval
+        # cProfile profile and counters of each stage, in the order the stages were first run
+        self._profiles = {}
+        self._stages = {}
+        # Pages counted, (pages, traced bytes) of each sample, and the allocation snapshots at the start and the end
+        self._pages = 0
+        self._samples = []
+        self._firstSnapshot = None
+        self._lastSnapshot = None
+
+    def start(self):
+        tracemalloc.start(self.TRACE_FRAMES)
+        self._firstSnapshot = tracemalloc.take_snapshot()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        # Profile the code run in the block as the stage of the name
+        profile = self._profiles.get(name)
+        if profile is None:
+            profile = self._profiles[name] = cProfile.Profile()
+            self._stages[name] = {'calls': 0, 'seconds': 0.0, 'peakBytes': 0, 'retainedBytes': 0}
+        sizeBefore = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            seconds = time.perf_counter() - start
+            size, peak = tracemalloc.get_traced_memory()
+            counters = self._stages[name]
+            counters['calls'] += 1
+            counters['seconds'] += seconds
+            counters['peakBytes'] = max(counters['peakBytes'], peak - sizeBefore)
+            counters['retainedBytes'] += size - sizeBefore
+
+    def sample(self):
+        # Count a page, sampling the traced memory on the interval
+        self._pages += 1
+        if self._pages % self._sampleInterval == 0:
+            self._samples.append((self._pages, tracemalloc.get_traced_memory()[0]))
+
+    def stop(self):
+        # Stop tracing and write the reports, returns the file names of the reports
+        self._lastSnapshot = tracemalloc.take_snapshot()
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        os.makedirs(self._reportDir, exist_ok = True)
+        fileNames = []
+        # The profile of each stage, as a pstats file for tools like snakeviz and as text
+        for name, profile in self._profiles.items():
+            statsFileName = os.path.join(self._reportDir, name + '.prof')
+            profile.dump_stats(statsFileName)
+            textFileName = os.path.join(self._reportDir, name + '.txt')
+            with open(textFileName, 'w', encoding = 'utf-8') as textFile:
+                stats = pstats.Stats(profile, stream = textFile)
+                stats.sort_stats('cumulative').print_stats(self.TOP_LINES)
+                stats.sort_stats('tottime').print_stats(self.TOP_LINES)
+            fileNames += [statsFileName, textFileName]
+        memoryFileName = os.path.join(self._reportDir, 'memory.txt')
+        with open(memoryFileName, 'w', encoding = 'utf-8') as memoryFile:
+            memoryFile.write(self._formatMemory(size, peak))
+        fileNames.append(memoryFileName)
+        return fileNames
+
+    def _formatMemory(self, size, peak):
+        report = io.StringIO()
+        report.write('Pages: {}  traced memory: {:.1f} KiB  peak: {:.1f} KiB\n\n'.format(self._pages, size / 1024, peak / 1024))
+        report.write('{:>12} {:>8} {:>12} {:>14} {:>18} {:>18}\n'.format('stage', 'calls', 'seconds', 'ms per call', 'peak KiB per call', 'retained KiB'))
+        for name, counters in self._stages.items():
+            report.write('{:>12} {:>8} {:>12.3f} {:>14.3f} {:>18.1f} {:>18.1f}\n'.format(
+                name, counters['calls'], counters['seconds'], counters['seconds'] * 1000 / max(counters['calls'], 1),
+                counters['peakBytes'] / 1024, counters['retainedBytes'] / 1024))
+        report.write('\nTraced memory every {} pages\n'.format(self._sampleInterval))
+        for pages, sampleSize in self._samples:
+            report.write('{:>8} pages {:>12.1f} KiB\n'.format(pages, sampleSize / 1024))
+        # Where the memory held at the end was allocated, and how it grew during the crawl
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, '<frozen importlib._bootstrap>')]
+        lastSnapshot = self._lastSnapshot.filter_traces(filters)
+        report.write('\nLargest allocation sites at the end of the crawl\n')
+        for statistic in lastSnapshot.statistics('lineno')[:self.TOP_LINES]:
+            report.write(str(statistic) + '\n')
+        report.write('\nGrowth of the allocations since the start of the crawl\n')
+        for statistic in lastSnapshot.compare_to(self._firstSnapshot.filter_traces(filters), 'lineno')[:self.TOP_LINES]:
+            report.write(str(statistic) + '\n')
+        return report.getvalue()
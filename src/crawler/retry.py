@@ -0,0 +1,103 @@
+# Imports
+import heapq, itertools, random, time
+import requests
+
+# Include classes and subfolders
+from .urlstatus import URLStatus
+
+# PageError class definition
+# Raised when a page is answered with an HTTP error status
+class PageError(Exception):
+    def __init__(self, statusCode, retryAfter = None):
+        super().__init__('HTTP ' + str(statusCode))
+        self.statusCode = statusCode
+        # Seconds the server asked us to wait, from the Retry-After header
+        self.retryAfter = retryAfter
+
+# Answers that may succeed when asked again later
+RETRY_STATUSES = (408, 425, 429, 500, 502, 503, 504)
+
+# Errors of the request itself, asking again gives the same error
+INVALID_URL_ERRORS = (
+    requests.exceptions.InvalidURL,
+    requests.exceptions.InvalidSchema,
+    requests.exceptions.MissingSchema,
+    requests.exceptions.URLRequired
+)
+
+# Errors of the connection or the transfer, which are often gone on the next attempt
+TRANSIENT_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.ContentDecodingError
+)
+
+def classifyError(error):
+    # Return the queue status of a page that failed with the error, and whether the page should be retried
+    if isinstance(error, PageError):
+        if error.statusCode in RETRY_STATUSES:
+            return URLStatus.FAILED, True
+        if 400 <= error.statusCode < 500:
+            return URLStatus.UNAVALIABLE, False
+        return URLStatus.FAILED, False
+    if isinstance(error, INVALID_URL_ERRORS):
+        return URLStatus.INVALID, False
+    if isinstance(error, requests.exceptions.TooManyRedirects):
+        return URLStatus.UNAVALIABLE, False
+    if isinstance(error, TRANSIENT_ERRORS):
+        return URLStatus.FAILED, True
+    # Any other error, like a page the newspaper fails to parse, happens again on the next attempt
+    return URLStatus.FAILED, False
+
+# RetryQueue class definition
+# Holds the urls of pages that failed with a transient error until they are due to be downloaded again. Each
+# attempt of a url waits twice as long as the one before, up to MAX_DELAY, and at least the Retry-After time of
+# the server. Urls are kept in a heap of (due time, sequence, url), and the attempts are counted per url.
+# The attempts are only kept in memory, so after a restart a pending url gets MAX_ATTEMPTS new attempts.
+class RetryQueue:
+    BASE_DELAY = 30 # Seconds before the first retry
+    MAX_DELAY = 60 * 60 # Longest wait between two attempts
+    MAX_ATTEMPTS = 4 # Attempts of a url, including the first download, before it is given up
+    JITTER = 0.1 # Delays are spread by up to this share, so failed pages of a host are not retried together
+
+    def __init__(self, baseDelay = BASE_DELAY, maxDelay = MAX_DELAY, maxAttempts = MAX_ATTEMPTS):
+        self._baseDelay = baseDelay
+        self._maxDelay = maxDelay
+        self._maxAttempts = maxAttempts
+        # Heap of (due time, sequence, url), and the number of failed attempts of each url
+        self._heap = []
+        self._sequence = itertools.count()
+        self._attempts = {}
+
+    def __len__(self):
+        return len(self._heap)
+
+    def schedule(self, url, retryAfter = None):
+        # Schedule the next attempt of a failed url, returns false if the url has used all its attempts
+        attempts = self._attempts.get(url, 0) + 1
+        if attempts >= self._maxAttempts:
+            self._attempts.pop(url, None)
+            return False
+        self._attempts[url] = attempts
+        delay = min(self._maxDelay, self._baseDelay * 2 ** (attempts - 1))
+        delay *= 1 + random.uniform(0, RetryQueue.JITTER)
+        heapq.heappush(self._heap, (time.time() + max(delay, retryAfter or 0), next(self._sequence), url))
+        return True
+
+    def getNext(self):
+        # Return the url of the next attempt that is due, or None
+        if self._heap and self._heap[0][0] <= time.time():
+            return heapq.heappop(self._heap)[2]
+        return None
+
+    def getNextTime(self):
+        # Time the next attempt is due, or None if no url is waiting
+        return self._heap[0][0] if self._heap else None
+
+    def getAttempts(self, url):
+        return self._attempts.get(url, 0)
+
+    def forget(self, url):
+        # Called when a url succeeded
+        self._attempts.pop(url, None)
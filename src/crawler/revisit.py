@@ -0,0 +1,192 @@
+# Imports
+import difflib, heapq, itertools, json, os, re, time
+
+# Include classes and subfolders
+from .dedup import contentHash
+from .output import JSONLinesOutput
+
+# Words with the whitespace after them, joining the tokens of a text gives the text back
+TOKEN_PATTERN = re.compile(r'\S+\s*|\s+')
+
+def getVersionsFileName(fileName):
+    # Name of the versions file of an output, 'articles.json' becomes 'articles.versions.jsonl'
+    base, dot, extension = fileName.rpartition('.')
+    if not base or '/' in extension:
+        base = fileName
+    return base + '.versions.jsonl'
+
+def makeDiff(oldText, newText):
+    # Changes turning the old text into the new, as [start, end, text] replacing the tokens start to end of
+    # the old text with the text. Tokens are words with their whitespace, so a changed sentence in a long
+    # article is stored as a few words
+    oldTokens = TOKEN_PATTERN.findall(oldText)
+    newTokens = TOKEN_PATTERN.findall(newText)
+    matcher = difflib.SequenceMatcher(None, oldTokens, newTokens, autojunk = False)
+    return [[start, end, ''.join(newTokens[newStart:newEnd])] for tag, start, end, newStart, newEnd in matcher.get_opcodes() if tag != 'equal']
+
+def applyDiff(oldText, diff):
+    # Apply a diff of makeDiff to the old text, from the end so the positions of the earlier changes hold
+    tokens = TOKEN_PATTERN.findall(oldText)
+    for start, end, text in reversed(diff):
+        tokens[start:end] = [text]
+    return ''.join(tokens)
+
+def applyVersion(articleEntry, versionRecord):
+    # Return the article as changed by a version record, the article is not changed
+    articleEntry = dict(articleEntry)
+    if 'title' in versionRecord:
+        articleEntry['title'] = versionRecord['title']
+    if 'content' in versionRecord:
+        articleEntry['content'] = versionRecord['content']
+    elif 'diff' in versionRecord:
+        articleEntry['content'] = applyDiff(articleEntry['content'], versionRecord['diff'])
+    return articleEntry
+
+def makeVersionRecord(url, version, oldEntry, newEntry, fingerprint):
+    # Record of a changed article, holding the new title if it changed and the diff of the content, or the
+    # whole content if that is shorter than the diff
+    versionRecord = {
+        'url': url,
+        'version': version,
+        'time': time.time(),
+        'fingerprint': fingerprint.hex()
+    }
+    if newEntry['title'] != oldEntry['title']:
+        versionRecord['title'] = newEntry['title']
+    if newEntry['content'] != oldEntry['content']:
+        diff = makeDiff(oldEntry['content'], newEntry['content'])
+        if len(json.dumps(diff, ensure_ascii = False)) < len(newEntry['content']):
+            versionRecord['diff'] = diff
+        else:
+            versionRecord['content'] = newEntry['content']
+    return versionRecord
+
+# VersionStore class definition
+# The versions of the stored articles. An article is stored once in the output, and each change to it is
+# appended to the versions file as a version record. The current version of an article is read back from the
+# output with the records of the url applied, so no text is kept in memory. The versions file is opened when
+# the first version is written, if no earlier run wrote one.
+class VersionStore:
+    def __init__(self, output, fileName):
+        self._output = output
+        self._fileName = fileName
+        self._versions = JSONLinesOutput(fileName) if os.path.exists(fileName) else None
+
+    def getCurrent(self, url):
+        # Return the current version of the stored article and its version number, or (None, 0)
+        articleEntry = self._output.get(url)
+        if articleEntry is None:
+            return None, 0
+        version = 1
+        if self._versions is not None:
+            for versionRecord in self._versions.getAll(url):
+                articleEntry = applyVersion(articleEntry, versionRecord)
+                version = versionRecord['version']
+        return articleEntry, version
+
+    def update(self, url, articleEntry):
+        # Append a version record if the text of the article changed since its current version, and return it,
+        # else None. A page without an article any more, or an article that was never stored, is no new version
+        if not articleEntry:
+            return None
+        currentEntry, version = self.getCurrent(url)
+        if currentEntry is None:
+            return None
+        fingerprint = contentHash(articleEntry)
+        if fingerprint == contentHash(currentEntry):
+            return None
+        versionRecord = makeVersionRecord(url, version + 1, currentEntry, articleEntry, fingerprint)
+        if self._versions is None:
+            self._versions = JSONLinesOutput(self._fileName)
+        self._versions.write(versionRecord)
+        return versionRecord
+
+    def close(self):
+        if self._versions is not None:
+            self._versions.close()
+
+# RevisitScheduler class definition
+# Articles are edited and updated for hours after they are published. The scheduler has each recent article
+# downloaded again after each of the intervals in turn, counted from the download before, and then forgets it.
+# An article is recent if its lastmod is at most maxAge old, or without a lastmod, if it was found at most
+# maxDepth links from the front page, so old articles found through deep links are not revisited. Only the
+# fingerprint of the last version of each article is kept, a changed article is handed to the VersionStore,
+# which reads the last version back from the output. Urls are kept in a heap of (due time, sequence, url).
+# Like the retries, the revisits are only kept in memory.
+class RevisitScheduler:
+    INTERVALS = (10 * 60, 60 * 60, 6 * 60 * 60) # Seconds from a download to the next revisit
+    MAX_AGE = 24 * 60 * 60 # Seconds since its lastmod an article is revisited, None for any age
+    MAX_DEPTH = 2 # Links from the front page an article without a lastmod is revisited, None for any depth
+
+    def __init__(self, versions, intervals = INTERVALS, maxAge = MAX_AGE, maxDepth = MAX_DEPTH):
+        self._versions = versions
+        self._intervals = intervals
+        self._maxAge = maxAge
+        self._maxDepth = maxDepth
+        self._heap = []
+        self._sequence = itertools.count()
+        # Revisits made and fingerprint of the last version of each article being revisited
+        self._articles = {}
+
+    def __len__(self):
+        return len(self._articles)
+
+    def __contains__(self, url):
+        return url in self._articles
+
+    def isRecent(self, lastmod = None, depth = 0):
+        if lastmod is not None:
+            return self._maxAge is None or time.time() - lastmod <= self._maxAge
+        return self._maxDepth is None or depth <= self._maxDepth
+
+    def add(self, url, articleEntry, lastmod = None, depth = 0):
+        # Start revisiting a newly downloaded article if it is recent, returns true if it is
+        if not self._intervals or not self.isRecent(lastmod, depth):
+            return False
+        self._articles[url] = {
+            'revisits': 0,
+            'fingerprint': contentHash(articleEntry)
+        }
+        self._schedule(url)
+        return True
+
+    def getNext(self):
+        # Return the url of an article due to be revisited, or None
+        if self._heap and self._heap[0][0] <= time.time():
+            return heapq.heappop(self._heap)[2]
+        return None
+
+    def getNextTime(self):
+        # Time of the next revisit, or None if no article is waiting
+        return self._heap[0][0] if self._heap else None
+
+    def update(self, url, articleEntry):
+        # Record the revisit of an article, returns the version record written if the text changed since the
+        # last version, else None
+        article = self._articles.get(url)
+        if article is None:
+            return None
+        versionRecord = None
+        fingerprint = contentHash(articleEntry) if articleEntry else article['fingerprint']
+        if fingerprint != article['fingerprint']:
+            versionRecord = self._versions.update(url, articleEntry)
+            article['fingerprint'] = fingerprint
+        self._next(url)
+        return versionRecord
+
+    def skip(self, url):
+        # The revisit failed, the article is downloaded again after the next interval
+        if url in self._articles:
+            self._next(url)
+
+    def _next(self, url):
+        article = self._articles[url]
+        article['revisits'] += 1
+        if article['revisits'] < len(self._intervals):
+            self._schedule(url)
+        else:
+            del self._articles[url]
+
+    def _schedule(self, url):
+        dueTime = time.time() + self._intervals[self._articles[url]['revisits']]
+        heapq.heappush(self._heap, (dueTime, next(self._sequence), url))
@@ -0,0 +1,107 @@
+# Imports
+import heapq, itertools, time
+
+# Include classes and subfolders
+from .urlstatus import URLStatus
+from .frontier import Frontier
+
+def scoreByDepth(url, depth):
+    # Serve the pages closest to the front page first
+    return depth
+
+# PriorityFrontier class definition
+# A frontier served in order of a score instead of insertion order, lowest score first. The entries to serve
+# are kept in a heap of (score, sequence, url), so add and getNext take O(log n) time, and entries with the
+# same score are served in insertion order. The scorer is called with the url and the link depth of each new
+# entry. Index pages close to the front page are queued again on an interval, so new articles linked from them
+# are found while the crawl is running.
+class PriorityFrontier(Frontier):
+    REPOLL_INTERVAL = 10 * 60 # Seconds between each download of an index page
+
+    REPOLL_MAX_DEPTH = 1 # Index pages deeper than this are only downloaded once
+
+    def __init__(self, entries = None, scorer = None):
+        self._scorer = scorer or scoreByDepth
+        # Heap of the entries to serve, and the urls in it
+        self._heap = []
+        self._scheduled = set()
+        # Heap of (due time, sequence, url) of the index pages to download again
+        self._repolls = []
+        self._sequence = itertools.count()
+        # Number of entries served by getNext
+        self._served = 0
+        # True while stored entries are loaded, the heap is then built once at the end
+        self._loading = False
+        super().__init__(entries)
+
+    def load(self, entries):
+        # Insert the stored entries and build the heap once, instead of pushing each entry
+        self._loading = True
+        try:
+            super().load(entries)
+        finally:
+            self._loading = False
+        heapq.heapify(self._heap)
+
+    def updateStatus(self, queueEntry, status):
+        super().updateStatus(queueEntry, status)
+        entry = self.getEntry(queueEntry['url'])
+        if status == URLStatus.ISINDEX:
+            self._scheduleRepoll(entry, time.time() + self.REPOLL_INTERVAL)
+        elif status in Frontier.SERVE_STATUSES:
+            self._push(entry)
+
+    def requeue(self, queueEntry, status = URLStatus.PENDING):
+        # Setting a status that is served pushes the entry to the heap
+        self.updateStatus(queueEntry, status)
+
+    def getNext(self):
+        # Queue the index pages that are due again
+        now = time.time()
+        while self._repolls and self._repolls[0][0] <= now:
+            url = heapq.heappop(self._repolls)[2]
+            entry = self.getEntry(url)
+            if entry['status'] == URLStatus.ISINDEX:
+                self.updateStatus(entry, URLStatus.PENDING)
+        # Pop entries until one still waiting to be served is found
+        while self._heap:
+            url = heapq.heappop(self._heap)[2]
+            self._scheduled.discard(url)
+            queueEntry = self.getEntry(url)
+            if queueEntry['status'] in Frontier.SERVE_STATUSES:
+                self._served += 1
+                return queueEntry
+        # Raise exception if the queue is exhausted
+        raise Frontier.QueueIsEmpty()
+
+    def getIndex(self):
+        return self._served
+
+    def getNextRepollTime(self):
+        # Time of the next index page download, or None if no index page is waiting
+        return self._repolls[0][0] if self._repolls else None
+
+    def _insert(self, url, status, depth = 0, lastmod = None):
+        entry = super()._insert(url, status, depth, lastmod)
+        if entry is None:
+            return None
+        if status in Frontier.SERVE_STATUSES:
+            self._push(entry)
+        elif status == URLStatus.ISINDEX:
+            # Index pages of a stored queue are downloaded again right away
+            self._scheduleRepoll(entry, time.time())
+        return entry
+
+    def _push(self, entry):
+        if entry['url'] in self._scheduled:
+            return
+        self._scheduled.add(entry['url'])
+        item = (self._scorer(entry['url'], entry['depth']), next(self._sequence), entry['url'])
+        if self._loading:
+            self._heap.append(item)
+        else:
+            heapq.heappush(self._heap, item)
+
+    def _scheduleRepoll(self, entry, dueTime):
+        if entry['depth'] <= self.REPOLL_MAX_DEPTH:
+            heapq.heappush(self._repolls, (dueTime, next(self._sequence), entry['url']))
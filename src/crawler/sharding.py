@@ -0,0 +1,169 @@
+# Imports
+import bisect, hashlib, os, sqlite3, time
+from urllib.parse import urlparse
+
+# Include classes and subfolders
+from .output import OUTPUT_FORMATS, iterArticles
+
+# Statements creating the tables of a coordination database
+SCHEMA = [
+    # Links handed from one shard to another, each url is handed over once
+    'CREATE TABLE IF NOT EXISTS handoff (id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT NOT NULL UNIQUE, shard INTEGER NOT NULL, depth INTEGER NOT NULL, lastmod REAL)',
+    'CREATE INDEX IF NOT EXISTS handoff_shard ON handoff (shard, id)',
+    # Whether each shard is idle, and the id of the last handoff it received
+    'CREATE TABLE IF NOT EXISTS shards (shard INTEGER PRIMARY KEY, idle INTEGER NOT NULL, cursor INTEGER NOT NULL, updated REAL NOT NULL)'
+]
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+# HashRing class definition
+# Consistent hashing of keys to shards. Each shard is placed on a ring of 64 bit hashes at a number of virtual
+# points, and a key belongs to the shard of the first point at or after its hash. Adding a shard only moves
+# the keys that land on its points, about 1/shards of them, to the new shard.
+class HashRing:
+    REPLICAS = 100 # Virtual points of each shard, spreading the keys evenly
+
+    def __init__(self, shards, replicas = REPLICAS):
+        points = sorted((_hash(str(shard) + '#' + str(replica)), shard) for shard in range(shards) for replica in range(replicas))
+        self._hashes = [point[0] for point in points]
+        self._shards = [point[1] for point in points]
+
+    def getShard(self, key):
+        index = bisect.bisect_left(self._hashes, _hash(key))
+        return self._shards[index % len(self._shards)]
+
+# ShardRouter class definition
+# Picks the shard of a url. With the 'host' key all pages of a newspaper belong to the same shard, so the
+# crawl delay and connection limits of the newspaper hold for the whole crawl. With the 'url' key the pages
+# of a single newspaper are spread over all shards, and the limits hold per shard.
+class ShardRouter:
+    KEYS = ('host', 'url')
+
+    def __init__(self, shards, key = 'host'):
+        if key not in ShardRouter.KEYS:
+            raise ValueError('Unknown shard key: ' + str(key))
+        self._ring = HashRing(shards)
+        self._key = key
+
+    def getShard(self, url):
+        return self._ring.getShard(urlparse(url).netloc.lower() if self._key == 'host' else url)
+
+# SQLiteCoordinator class definition
+# Coordinates the shards of a crawl through a SQLite file, so several worker processes on one machine can
+# crawl together. Links of other shards are buffered by send and written in one transaction by flush, and
+# read by their shard with receive. A url is only handed over once, unless it is sent again with a later
+# lastmod. The crawl is finished when every shard is idle and has received all links handed to it. Another
+# transport, like a Redis server shared by several machines, can replace it by implementing the same methods.
+class SQLiteCoordinator:
+    TIMEOUT = 30 # Seconds to wait for the write lock of another shard
+
+    def __init__(self, fileName, shard, shards, key = 'host'):
+        self._shard = shard
+        self._shards = shards
+        self._router = ShardRouter(shards, key)
+        self._connection = sqlite3.connect(fileName, timeout = SQLiteCoordinator.TIMEOUT, check_same_thread = False)
+        self._connection.execute('PRAGMA journal_mode = WAL')
+        self._connection.execute('PRAGMA synchronous = NORMAL')
+        for statement in SCHEMA:
+            self._connection.execute(statement)
+        self._connection.commit()
+        # Links waiting to be written by flush, the id of the last link received, and the last reported state
+        self._outbox = []
+        self._cursor = 0
+        self._idle = None
+        self.setIdle(False)
+
+    def getShard(self):
+        return self._shard
+
+    def getShardCount(self):
+        return self._shards
+
+    def isLocal(self, url):
+        # True if the url belongs to this shard
+        return self._router.getShard(url) == self._shard
+
+    def send(self, links):
+        # Buffer (url, depth, lastmod) of links belonging to other shards
+        self._outbox.extend(links)
+
+    def flush(self):
+        # Hand the buffered links to their shards in one transaction
+        if not self._outbox:
+            return
+        with self._connection:
+            # A later lastmod hands a url over again, under a new id
+            self._connection.executemany(
+                'DELETE FROM handoff WHERE url = ? AND lastmod < ?',
+                ((url, lastmod) for url, depth, lastmod in self._outbox if lastmod is not None)
+            )
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO handoff (url, shard, depth, lastmod) VALUES (?, ?, ?, ?)',
+                ((url, self._router.getShard(url), depth, lastmod) for url, depth, lastmod in self._outbox)
+            )
+        self._outbox = []
+
+    def receive(self):
+        # Return (url, depth, lastmod) of the links handed to this shard since the last call
+        rows = self._connection.execute(
+            'SELECT id, url, depth, lastmod FROM handoff WHERE shard = ? AND id > ? ORDER BY id',
+            (self._shard, self._cursor)
+        ).fetchall()
+        if rows:
+            self._cursor = rows[-1][0]
+            self.setIdle(False)
+        return [row[1:] for row in rows]
+
+    def setIdle(self, idle):
+        # Report the state of this shard, only written when it changes
+        if idle == self._idle:
+            return
+        self._idle = idle
+        with self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO shards (shard, idle, cursor, updated) VALUES (?, ?, ?, ?)',
+                (self._shard, int(idle), self._cursor, time.time())
+            )
+
+    def isFinished(self):
+        # Called by an idle shard. The links are flushed before the state is written, so when every shard is
+        # idle and has received every link handed to it, no link is in flight
+        self.flush()
+        self.setIdle(True)
+        with self._connection:
+            shards = self._connection.execute('SELECT shard, idle, cursor FROM shards').fetchall()
+            if len(shards) < self._shards or not all(idle for shard, idle, cursor in shards):
+                return False
+            lastIds = dict(self._connection.execute('SELECT shard, MAX(id) FROM handoff GROUP BY shard').fetchall())
+        return all(cursor >= lastIds.get(shard, 0) for shard, idle, cursor in shards)
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+def getShardFileName(fileName, shard):
+    # Name of the file of a shard, 'articles.json' becomes 'articles.shard-0.json'
+    base, dot, extension = fileName.rpartition('.')
+    if not base or '/' in extension:
+        return fileName + '.shard-' + str(shard)
+    return base + '.shard-' + str(shard) + dot + extension
+
+def mergeOutputs(fileNames, outFileName, outputFormat = 'jsonl'):
+    # Add the articles of the shard outputs to one output, skipping the urls already in it, so the outputs
+    # can be merged again after each run. Returns the number of articles added
+    urls = set(articleEntry['url'] for articleEntry in iterArticles(outFileName)) if os.path.exists(outFileName) else set()
+    output = OUTPUT_FORMATS[outputFormat](outFileName)
+    added = 0
+    try:
+        for fileName in fileNames:
+            if not os.path.exists(fileName):
+                continue
+            for articleEntry in iterArticles(fileName):
+                if articleEntry['url'] not in urls:
+                    urls.add(articleEntry['url'])
+                    output.write(articleEntry)
+                    added += 1
+    finally:
+        output.close()
+    return added
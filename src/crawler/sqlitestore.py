@@ -0,0 +1,264 @@
+# Imports
+import json, sqlite3, sys
+from collections import deque
+
+# Include classes and subfolders
+from .urlstatus import URLStatus
+from .frontier import Frontier
+from .journal import QueueJournal
+from .output import iterArticles
+
+# Statements creating the tables of a crawl database
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS queue (id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT NOT NULL UNIQUE, status INTEGER NOT NULL, lastmod REAL)',
+    'CREATE INDEX IF NOT EXISTS queue_status ON queue (status, id)',
+    'CREATE TABLE IF NOT EXISTS articles (id INTEGER PRIMARY KEY AUTOINCREMENT, newspaper TEXT, url TEXT, metainfo TEXT, title TEXT, content TEXT)',
+    'CREATE INDEX IF NOT EXISTS articles_url ON articles (url)',
+    'CREATE TABLE IF NOT EXISTS fingerprints (id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT, hash TEXT, simhash TEXT)',
+    'CREATE INDEX IF NOT EXISTS fingerprints_url ON fingerprints (url)'
+]
+
+# Columns added after the first version of a table, added to older databases when opened
+COLUMNS = [
+    ('queue', 'lastmod', 'REAL')
+]
+
+BATCH_SIZE = 10000 # Rows inserted in each batch by the importers
+
+def openDatabase(fileName):
+    # Open the crawl database in WAL mode, so readers do not block the crawler
+    connection = sqlite3.connect(fileName, check_same_thread = False)
+    connection.execute('PRAGMA journal_mode = WAL')
+    connection.execute('PRAGMA synchronous = NORMAL')
+    for statement in SCHEMA:
+        connection.execute(statement)
+    for table, column, columnType in COLUMNS:
+        if column not in [row[1] for row in connection.execute('PRAGMA table_info(' + table + ')')]:
+            connection.execute('ALTER TABLE ' + table + ' ADD COLUMN ' + column + ' ' + columnType)
+    connection.commit()
+    return connection
+
+# SQLiteFrontier class definition
+# A frontier stored in SQLite, with the same interface as Frontier. Only the cursor is held in memory, so the
+# resident memory does not grow with the queue. Changes are made durable by committing the connection.
+class SQLiteFrontier:
+    SERVE_STATUSES = Frontier.SERVE_STATUSES
+
+    QueueIsEmpty = Frontier.QueueIsEmpty
+
+    def __init__(self, connection):
+        self._connection = connection
+        # Id of the last entry served by getNext
+        self._cursor = 0
+        # Urls of finished entries to serve again, before the entries after the cursor
+        self._requeued = deque()
+        self._serveStatuses = ', '.join(str(status) for status in SQLiteFrontier.SERVE_STATUSES)
+
+    def __len__(self):
+        return self._connection.execute('SELECT COUNT(*) FROM queue').fetchone()[0]
+
+    def __contains__(self, url):
+        return self.getEntry(url) is not None
+
+    def load(self, entries):
+        # Insert stored entries in batches, keeping their status
+        self._connection.executemany(
+            'INSERT OR IGNORE INTO queue (url, status, lastmod) VALUES (?, ?, ?)',
+            ((entry['url'], entry['status'], entry.get('lastmod')) for entry in entries)
+        )
+
+    def setJournal(self, journal):
+        # The database is its own journal
+        pass
+
+    def add(self, url, depth = 0, lastmod = None):
+        # Insert the url unless it is already queued, returns true if it was added. The queue is served in
+        # insertion order, so the depth is not stored
+        return self._connection.execute('INSERT OR IGNORE INTO queue (url, status, lastmod) VALUES (?, ?, ?)', (url, URLStatus.PENDING, lastmod)).rowcount == 1
+
+    def addMany(self, urls, depth = 0):
+        # Insert all urls in one batch, returns the number of new queue items
+        changesBefore = self._connection.total_changes
+        self._connection.executemany('INSERT OR IGNORE INTO queue (url, status) VALUES (?, ?)', ((url, URLStatus.PENDING) for url in urls))
+        return self._connection.total_changes - changesBefore
+
+    def getEntry(self, url):
+        row = self._connection.execute('SELECT url, status, lastmod FROM queue WHERE url = ?', (url,)).fetchone()
+        return SQLiteFrontier._toEntry(row) if row else None
+
+    def updateStatus(self, queueEntry, status):
+        self._connection.execute('UPDATE queue SET status = ? WHERE url = ?', (status, queueEntry['url']))
+        queueEntry['status'] = status
+
+    def setLastmod(self, queueEntry, lastmod):
+        self._connection.execute('UPDATE queue SET lastmod = ? WHERE url = ?', (lastmod, queueEntry['url']))
+        queueEntry['lastmod'] = lastmod
+
+    def requeue(self, queueEntry, status = URLStatus.PENDING):
+        # Download a finished entry again, before the entries not served yet. A downloaded article that changed
+        # is queued with the changed status
+        self.updateStatus(queueEntry, status)
+        self._requeued.append(queueEntry['url'])
+
+    def getNext(self):
+        # Serve the requeued entries first
+        while self._requeued:
+            queueEntry = self.getEntry(self._requeued.popleft())
+            if queueEntry is not None and queueEntry['status'] in SQLiteFrontier.SERVE_STATUSES:
+                return queueEntry
+        # Find the next entry to serve after the cursor
+        row = self._connection.execute(
+            'SELECT id, url, status, lastmod FROM queue WHERE id > ? AND status IN (' + self._serveStatuses + ') ORDER BY id LIMIT 1',
+            (self._cursor,)
+        ).fetchone()
+        # Raise exception if the queue is exhausted
+        if row is None:
+            raise SQLiteFrontier.QueueIsEmpty()
+        self._cursor = row[0]
+        return SQLiteFrontier._toEntry(row[1:])
+
+    def getIndex(self):
+        return self._cursor
+
+    def countByStatus(self, status):
+        return self._connection.execute('SELECT COUNT(*) FROM queue WHERE status = ?', (status,)).fetchone()[0]
+
+    def getEntries(self):
+        # Iterate the entries in insertion order, without loading them all
+        for row in self._connection.execute('SELECT url, status, lastmod FROM queue ORDER BY id'):
+            yield SQLiteFrontier._toEntry(row)
+
+    @staticmethod
+    def _toEntry(row):
+        entry = {
+            'url': row[0],
+            'status': row[1]
+        }
+        if row[2] is not None:
+            entry['lastmod'] = row[2]
+        return entry
+
+# SQLiteArticleOutput class definition
+# Stores the articles in the articles table of the crawl database, indexed by URL.
+class SQLiteArticleOutput:
+    def __init__(self, connection, commitEvery = 1):
+        self._connection = connection
+        # Number of articles between each commit, 0 only commits on flush and close
+        self._commitEvery = commitEvery
+        self._uncommitted = 0
+
+    def get(self, url):
+        # Return the last article stored with the url, or None
+        articleEntry = None
+        for articleEntry in readSQLiteArticles(self._connection, url):
+            pass
+        return articleEntry
+
+    def write(self, articleEntry):
+        SQLiteArticleOutput._insert(self._connection, [articleEntry])
+        self._uncommitted += 1
+        if self._commitEvery and self._uncommitted >= self._commitEvery:
+            self.flush()
+
+    def flush(self):
+        self._connection.commit()
+        self._uncommitted = 0
+
+    def close(self):
+        self.flush()
+
+    @staticmethod
+    def _insert(connection, articleEntries):
+        connection.executemany(
+            'INSERT INTO articles (newspaper, url, metainfo, title, content) VALUES (?, ?, ?, ?, ?)',
+            ((
+                articleEntry['newspaper'],
+                articleEntry['url'],
+                json.dumps(articleEntry.get('metainfo'), ensure_ascii = False),
+                articleEntry['title'],
+                articleEntry['content']
+            ) for articleEntry in articleEntries)
+        )
+
+# SQLiteFingerprintOutput class definition
+# Stores the fingerprint records of a DuplicateDetector in the fingerprints table of the crawl database.
+class SQLiteFingerprintOutput:
+    def __init__(self, connection, commitEvery = 1):
+        self._connection = connection
+        # Number of records between each commit, 0 only commits on flush and close
+        self._commitEvery = commitEvery
+        self._uncommitted = 0
+
+    def write(self, record):
+        self._connection.execute('INSERT INTO fingerprints (url, hash, simhash) VALUES (?, ?, ?)', (record['url'], record['hash'], record['simHash']))
+        self._uncommitted += 1
+        if self._commitEvery and self._uncommitted >= self._commitEvery:
+            self.flush()
+
+    def flush(self):
+        self._connection.commit()
+        self._uncommitted = 0
+
+    def close(self):
+        self.flush()
+
+def readSQLiteFingerprints(connection):
+    # Yield the stored fingerprint records, in the order they were written
+    for row in connection.execute('SELECT url, hash, simhash FROM fingerprints ORDER BY id'):
+        yield {
+            'url': row[0],
+            'hash': row[1],
+            'simHash': row[2]
+        }
+
+def readSQLiteArticles(connection, url = None, unfingerprinted = False):
+    # Yield the stored articles in the format of getArticleEntry, optionally only those of one url, or only
+    # those without a fingerprint record, stored before the fingerprints were
+    query = 'SELECT newspaper, url, metainfo, title, content FROM articles'
+    parameters = ()
+    if url is not None:
+        query += ' WHERE url = ?'
+        parameters = (url,)
+    elif unfingerprinted:
+        query += ' WHERE url NOT IN (SELECT url FROM fingerprints)'
+    for row in connection.execute(query + ' ORDER BY id', parameters):
+        yield {
+            'newspaper': row[0],
+            'url': row[1],
+            'metainfo': json.loads(row[2]),
+            'title': row[3],
+            'content': row[4]
+        }
+
+def importQueue(connection, queueFile, journalFile = None):
+    # Import a stored .queue file, and the journal written after it, into the database
+    frontier = QueueJournal(queueFile, journalFile or queueFile + '.journal').loadFrontier()
+    SQLiteFrontier(connection).load(frontier.getEntries())
+    connection.commit()
+    return len(frontier)
+
+def importArticles(connection, articlesFile):
+    # Import an articles file in any output format into the database, in batches
+    articleEntries = iterArticles(articlesFile)
+    imported = 0
+    batch = []
+    for articleEntry in articleEntries:
+        batch.append(articleEntry)
+        if len(batch) >= BATCH_SIZE:
+            SQLiteArticleOutput._insert(connection, batch)
+            imported += len(batch)
+            batch = []
+    SQLiteArticleOutput._insert(connection, batch)
+    imported += len(batch)
+    connection.commit()
+    return imported
+
+# Import an existing queue and articles file into a crawl database
+if __name__ == '__main__':
+    if len(sys.argv) != 4:
+        print('Usage: python -m src.crawler.sqlitestore crawl.db .queue articles.json')
+        sys.exit(1)
+    database = openDatabase(sys.argv[1])
+    print('Imported queue entries: ' + str(importQueue(database, sys.argv[2])))
+    print('Imported articles: ' + str(importArticles(database, sys.argv[3])))
+    database.close()
@@ -0,0 +1,36 @@
+# URLStatus class definition
+class URLStatus:
+    PENDING = 0
+    DOWNLOADED = 1
+    UNSUPPORTED = 2
+    UNAVALIABLE = 3
+    INVALID = 4
+    ISINDEX = 5
+    FAILED = 6
+    DUPLICATE = 7
+    CHANGED = 8
+
+    TEXT_STATUS = {
+        PENDING: 'Pending download',
+        DOWNLOADED: 'Downloaded',
+        UNSUPPORTED: 'The newspaper is unsupported',
+        UNAVALIABLE: 'The URL is inavaliable',
+        INVALID: 'The URL is invalid',
+        ISINDEX: 'The page is an index',
+        FAILED: 'Download failed',
+        DUPLICATE: 'The article is a duplicate',
+        CHANGED: 'The article changed since it was downloaded',
+    }
+
+    # Short names of the statuses, used as metric labels
+    NAME = {
+        PENDING: 'pending',
+        DOWNLOADED: 'downloaded',
+        UNSUPPORTED: 'unsupported',
+        UNAVALIABLE: 'unavaliable',
+        INVALID: 'invalid',
+        ISINDEX: 'index',
+        FAILED: 'failed',
+        DUPLICATE: 'duplicate',
+        CHANGED: 'changed',
+    }
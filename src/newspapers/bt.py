@@ -1,7 +1,6 @@
 # Imports
 from .newspaper import Newspaper as Newspaper
-from urllib.parse import urlparse
-from bs4 import BeautifulSoup
+from urllib.parse import urlparse, urljoin
 
 # BT class definition
 class BT(Newspaper):
@@ -27,60 +26,65 @@ class BT(Newspaper):
         '/tracking/image_gallery/',
         '/search'
     ]
+    TITLE_CLASS = 'article-title'
+    CONTENT_CLASS = 'article-content'
+    CONTENT_SKIP_RULES = [
+        'Foto: ',
+        'Vis mere'
+    ]
+    NORMALIZE_WHITESPACE = True
+    UNICODE_FORM = 'NFC'
+    # Added to the score of the articles in a catagory, lower is downloaded sooner
+    CATAGORY_PRIORITY = {
+        'samfund': -1,
+        'politik': -1,
+        'udland': -1
+    }
 
-    def __init__(self, articleUrl):
+    def __init__(self, articleUrl, articleHtml = None):
         # Call the super constructor
-        super(type(self), self).__init__(
+        super().__init__(
             self.NEWSPAPER_NAME,
             self.NEWSPAPER_URL,
             self.EXCLUDE_SUBPATHS,
-            articleUrl
+            articleUrl,
+            articleHtml
         )
 
     def getTitle(self):
         # Get the title from the title class, strip it of newlines and return the title
-        articleTitle = self._articleSoup.find(class_ = 'article-title')
+        articleTitle = self.extractPage().title
         # Validate that the article title was found, else the page is an index page
         if articleTitle:
-            return articleTitle.text.strip()
+            return articleTitle.strip()
         else:
             return None
 
     def getContent(self):
-        # Get the article content
-        articleContent = self._articleSoup.find(class_='article-content')
-        # Validate that the article content was found, else the page is an index page
-        if articleContent:
-            # Get the article content
-            contentArray = articleContent.find_all('p')
-            # Create a temporaty variable for the article content
-            articleContentText = ""
-            # Loop through each article element
-            for content in contentArray:
-                # Skip the entry if it contains the phrase 'Foto: '
-                try:
-                    content.text.index('Foto: ')
-                    continue
-                except: pass
-                try:
-                    content.text.index('Vis mere')
-                    continue
-                except: pass
-                # Get the text of the HTML tage, and append it to the article content. Add a space
-                articleContentText += content.text.strip() + " "
-            # Return the article content
-            return articleContentText
-        else:
-            return None
+        # Join the text of the article content paragraphs, skipping photo credits and 'Vis mere' links. None if
+        # the content was not found, then the page is an index page
+        return self.extractText(self.extractPage().paragraphs)
 
     def getMetaInfo(self):
         return {
             'catagory': self._getCatagory()
         }
 
+    @classmethod
+    def scoreUrl(_class, url, depth):
+        # Download the articles of the news catagories before the rest at the same depth
+        score = super().scoreUrl(url, depth)
+        if _class.getUrlClass(url) == 'article':
+            score += _class.CATAGORY_PRIORITY.get(_class._getCatagoryFromUrl(url), 0)
+        return score
+
     def _getCatagory(self):
+        return self._getCatagoryFromUrl(self._articleUrl)
+
+    @staticmethod
+    def _getCatagoryFromUrl(articleUrl):
         # Parse the link
-        parsedUrl = urlparse(self._articleUrl)
+        parsedUrl = urlparse(articleUrl)
         # All BT articles belong to a catagory. The catagory is shown in the link with '/samfund/some-very-clickbate-article'
         try:
             # Get the index of the last / to isolate catagory
@@ -92,32 +96,26 @@ class BT(Newspaper):
             return None
 
     def getLinkedArticles(self):
-        # Create a temp var to store links
+        # Create a temp var to store links, and a set of the links for fast look-up
         linkedArticles = []
-        # Find all link tags
-        for link in self._articleSoup.find_all('a'):
-            # Store the article article url
-            articleUrl = link.get('href')
-            # All links that start with a slash are local pages, add https://www.bt.dk to these
-            try:
-                # Try finding the leading slash
-                articleUrl.index('/', 0, 1)
-                # If the leading slash was found, append the newspaper url
-                articleUrl = BT.NEWSPAPER_URL + articleUrl
-            except:
-                pass
+        seenArticles = set()
+        # Find the href of all link tags
+        for articleUrl in self.extractPage().links:
+            # Resolve relative links against the article URL
+            articleUrl = urljoin(self._articleUrl, articleUrl)
             # Parse the link
             parsedUrl = urlparse(articleUrl)
             # Remove all links outside BT
-            if parsedUrl.netloc == self.getNetloc():
+            if parsedUrl.netloc.lower() == self.getNetloc():
                 # Get the subpath, the part of the link: '/somesubpath/somearticle'
                 subpath = self._getArticleSubPath(parsedUrl.path)
                 # Remove all links that are in the excluded subpaths
-                if not (subpath in self._exclude_subpaths or subpath == None):
+                if not (subpath == None or self.isExcludedPath(parsedUrl.path)):
                     # Validate that the article is not already in relatedLinks
-                    if articleUrl not in linkedArticles:
+                    if articleUrl not in seenArticles:
                         # Append the article link
                         linkedArticles.append(articleUrl)
+                        seenArticles.add(articleUrl)
                     else:
                         # Continue
                         continue
@@ -0,0 +1,178 @@
+# Imports
+import hashlib, json, os, threading, time
+from collections import OrderedDict
+
+# ResponseCache class definition
+# On-disk cache of downloaded pages. Each page is stored as a body file and a small meta file holding the URL,
+# the validators (ETag and Last-Modified) and the time the page was stored. The cache is bounded by the total
+# size of the bodies, and the least recently used pages are evicted first.
+class ResponseCache:
+    MAX_BYTES = 512 * 1024 * 1024 # Maximum total size of the cached bodies
+
+    # CacheEntry class definition
+    class CacheEntry:
+        def __init__(self, url, etag, lastModified, contentType, storedAt, size):
+            self.url = url
+            self.etag = etag
+            self.lastModified = lastModified
+            self.contentType = contentType
+            self.storedAt = storedAt
+            self.size = size
+
+        def getAge(self):
+            return time.time() - self.storedAt
+
+        def toDict(self):
+            return {
+                'url': self.url,
+                'etag': self.etag,
+                'lastModified': self.lastModified,
+                'contentType': self.contentType,
+                'storedAt': self.storedAt,
+                'size': self.size
+            }
+
+    def __init__(self, directory, maxBytes = MAX_BYTES):
+        self._directory = directory
+        self._maxBytes = maxBytes
+        # Entries by URL, ordered from least to most recently used
+        self._entries = OrderedDict()
+        self._totalBytes = 0
+        self._lock = threading.Lock()
+        # Counters for the cache metrics
+        self._hits = 0
+        self._revalidated = 0
+        self._misses = 0
+        self._bytesServed = 0
+        # Load the entries stored by earlier runs
+        os.makedirs(self._directory, exist_ok = True)
+        self._loadEntries()
+
+    def lookup(self, url):
+        # Return the entry of the url, or None if the url is not cached
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                # Mark the entry as most recently used
+                self._entries.move_to_end(url)
+            return entry
+
+    def getValidators(self, entry):
+        # Headers for a conditional GET of the cached page
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.lastModified:
+                headers['If-Modified-Since'] = entry.lastModified
+        return headers
+
+    def readBody(self, entry, revalidated = False):
+        # Read the cached body, None if the file has gone missing
+        try:
+            with open(self._getPath(entry.url, '.body'), 'rb') as bodyFile:
+                body = bodyFile.read()
+        except FileNotFoundError:
+            self.remove(entry.url)
+            return None
+        with self._lock:
+            if revalidated:
+                self._revalidated += 1
+            else:
+                self._hits += 1
+            self._bytesServed += len(body)
+        return body
+
+    def store(self, url, headers, body):
+        # Store the page, replacing any earlier version
+        entry = ResponseCache.CacheEntry(
+            url,
+            headers.get('ETag'),
+            headers.get('Last-Modified'),
+            headers.get('Content-Type'),
+            time.time(),
+            len(body)
+        )
+        # Like the meta file, the body is written to a temporary file and renamed, so a crash never leaves a
+        # partial body next to valid validators
+        bodyPath = self._getPath(url, '.body')
+        with open(bodyPath + '.tmp', 'wb') as bodyFile:
+            bodyFile.write(body)
+        os.replace(bodyPath + '.tmp', bodyPath)
+        self._writeMeta(entry)
+        with self._lock:
+            self._misses += 1
+            self._insert(entry)
+            self._evict()
+
+    def refresh(self, entry):
+        # The server confirmed the cached page is unchanged, restart its time to live
+        entry.storedAt = time.time()
+        self._writeMeta(entry)
+
+    def remove(self, url):
+        with self._lock:
+            entry = self._entries.pop(url, None)
+            if entry is not None:
+                self._totalBytes -= entry.size
+                self._deleteFiles(url)
+
+    def getMetrics(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._totalBytes,
+                'hits': self._hits,
+                'revalidated': self._revalidated,
+                'misses': self._misses,
+                'bytesServed': self._bytesServed
+            }
+
+    def _insert(self, entry):
+        # Replace an earlier entry of the same url
+        previous = self._entries.pop(entry.url, None)
+        if previous is not None:
+            self._totalBytes -= previous.size
+        self._entries[entry.url] = entry
+        self._totalBytes += entry.size
+
+    def _evict(self):
+        # Remove the least recently used entries until the cache fits its size
+        while self._totalBytes > self._maxBytes and len(self._entries) > 1:
+            url, entry = self._entries.popitem(last = False)
+            self._totalBytes -= entry.size
+            self._deleteFiles(url)
+
+    def _loadEntries(self):
+        # Read all meta files, and order the entries by the time they were stored
+        entries = []
+        for fileName in os.listdir(self._directory):
+            if not fileName.endswith('.meta'):
+                continue
+            try:
+                with open(os.path.join(self._directory, fileName), 'r') as metaFile:
+                    entries.append(ResponseCache.CacheEntry(**json.load(metaFile)))
+            except (ValueError, TypeError):
+                # Skip meta files that were cut short
+                continue
+        for entry in sorted(entries, key = lambda entry: entry.storedAt):
+            self._insert(entry)
+        self._evict()
+
+    def _writeMeta(self, entry):
+        # Write to a temporary file and rename it, so a crash never leaves a partial meta file
+        metaPath = self._getPath(entry.url, '.meta')
+        with open(metaPath + '.tmp', 'w') as metaFile:
+            json.dump(entry.toDict(), metaFile)
+        os.replace(metaPath + '.tmp', metaPath)
+
+    def _deleteFiles(self, url):
+        for extension in ('.meta', '.body'):
+            try:
+                os.remove(self._getPath(url, extension))
+            except FileNotFoundError:
+                pass
+
+    def _getPath(self, url, extension):
+        # Name the files by the hash of the url
+        return os.path.join(self._directory, hashlib.sha1(url.encode('utf-8')).hexdigest() + extension)
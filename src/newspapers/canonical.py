@@ -0,0 +1,53 @@
+# Imports
+import fnmatch, re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Ports that are left out of canonical URLs
+DEFAULT_PORTS = {
+    'http': 80,
+    'https': 443
+}
+
+# URLCanonicalizer class definition
+# Rewrites URLs to one canonical form, so the variants of a URL are only queued and downloaded once. The scheme
+# and host are lowercased, default ports, fragments and matching query parameters are removed, the remaining
+# query parameters are sorted and a trailing slash is removed from the path.
+class URLCanonicalizer:
+    def __init__(self, stripParams = (), scheme = None, stripTrailingSlash = True, keepFragment = False):
+        # Query parameters to remove, as names or glob patterns like 'utm_*', compiled into one regex
+        self._stripParams = re.compile('|'.join(fnmatch.translate(pattern) for pattern in stripParams)) if stripParams else None
+        # Scheme to use for all URLs, e.g. 'https', or None to keep the scheme
+        self._scheme = scheme
+        self._stripTrailingSlash = stripTrailingSlash
+        self._keepFragment = keepFragment
+
+    def canonicalize(self, url):
+        try:
+            parts = urlsplit(url.strip())
+            port = parts.port
+        except ValueError:
+            # Leave URLs that can not be parsed, like ones with an invalid port, as they are
+            return url
+        scheme = (self._scheme or parts.scheme).lower()
+        # Lowercase the host and leave out the default port. An IPv6 host keeps its brackets, and a user name and
+        # password are kept as they are
+        netloc = parts.hostname or ''
+        if ':' in netloc:
+            netloc = '[' + netloc + ']'
+        if '@' in parts.netloc:
+            netloc = parts.netloc.rpartition('@')[0] + '@' + netloc
+        if port is not None and port != DEFAULT_PORTS.get(scheme):
+            netloc += ':' + str(port)
+        # Remove the trailing slash, but keep the root path
+        path = parts.path or '/'
+        if self._stripTrailingSlash and len(path) > 1:
+            path = path.rstrip('/') or '/'
+        # Remove the stripped query parameters and sort the rest
+        query = parts.query
+        if query:
+            params = parse_qsl(query, keep_blank_values = True)
+            if self._stripParams:
+                params = [param for param in params if not self._stripParams.match(param[0])]
+            query = urlencode(sorted(params))
+        fragment = parts.fragment if self._keepFragment else ''
+        return urlunsplit((scheme, netloc, path, query, fragment))
@@ -8,20 +8,27 @@ from bs4 import BeautifulSoup
 class Examplenewspaper(Newspaper):
     NEWSPAPER_NAME = 'B.T.' # Newspaper name to apper in output file # CHANGE ME!
     NEWSPAPER_URL = 'https://www.bt.dk' # Newspaper URL # CHANGE ME!
-    EXCLUDE_SUBPATHS = [ # Paths of newspaper to avoid when crawling
+    EXCLUDE_SUBPATHS = [ # Paths of newspaper to avoid when crawling, as prefixes, globs or 're:' regexes
         '/rabatkode/',
         '/content/',
         '/cookiedeklaration'
     ] # CHANGE ME!
+    CONTENT_SKIP_RULES = [ # Content paragraphs to leave out, as phrases or 're:' regexes
+        'Foto: ',
+        'Vis mere'
+    ] # CHANGE ME!
+    SITEMAP_URLS = [] # Sitemaps listing the articles, like 'https://www.bt.dk/sitemap.xml' # CHANGE ME!
+    FEED_URLS = [] # RSS or Atom feeds listing the articles # CHANGE ME!
 
     # Class constructor, leave unchanged
-    def __init__(self, articleUrl):
+    def __init__(self, articleUrl, articleHtml = None):
         # Call the super constructor
         super(type(self), self).__init__(
             self.NEWSPAPER_NAME,
             self.NEWSPAPER_URL,
             self.EXCLUDE_SUBPATHS,
-            articleUrl
+            articleUrl,
+            articleHtml
         )
 
     """Returns the title of the article.
@@ -46,25 +53,8 @@ class Examplenewspaper(Newspaper):
         articleContent = self._articleSoup.find(class_='article-content')
         # Validate that the article content was found, else the page is an index page
         if articleContent:
-            # Get the article content
-            contentArray = articleContent.find_all('p')
-            # Create a temporaty variable for the article content
-            articleContentText = ""
-            # Loop through each article element
-            for content in contentArray:
-                # Skip the entry if it contains the phrase 'Foto: '
-                try:
-                    content.text.index('Foto: ')
-                    continue
-                except: pass
-                try:
-                    content.text.index('Vis mere')
-                    continue
-                except: pass
-                # Get the text of the HTML tage, and append it to the article content. Add a space
-                articleContentText += content.text.strip() + " "
-            # Return the article content
-            return articleContentText
+            # Join the text of the paragraphs, leaving out those matching CONTENT_SKIP_RULES
+            return self.extractText(articleContent.find_all('p'))
         else:
             return None
 
@@ -93,7 +83,7 @@ class Examplenewspaper(Newspaper):
                 # Get the subpath, the part of the link: '/somesubpath/somearticle'
                 subpath = self._getArticleSubPath(parsedUrl.path)
                 # Remove all links that are in the excluded subpaths
-                if not (subpath in self._exclude_subpaths or subpath == None):
+                if not (subpath == None or self.isExcludedPath(parsedUrl.path)):
                     # Validate that the article is not already in relatedLinks
                     if articleUrl not in linkedArticles:
                         # Append the article link
@@ -0,0 +1,65 @@
+# Imports
+import fnmatch, re
+
+# PathMatcher class definition
+# Matches URL paths against a set of rules, compiled once. A rule is either
+# - a prefix, like '/podcast' or '/rabatkode/', matching every path starting with it,
+# - a glob, like '/*/image_gallery/*', matching the whole path, or
+# - a regex prefixed with 're:', like 're:/\d{4}/', matched at the start of the path.
+# Prefix rules are kept in a set and looked up by the path prefixes of the rule lengths, so the cost per path
+# does not depend on the number of prefix rules. Globs with a path segment without wildcards are indexed by
+# that segment, and only tried on paths containing it. The other globs and the regexes are combined into a
+# single regex.
+class PathMatcher:
+    GLOB_CHARACTERS = '*?['
+    REGEX_PREFIX = 're:'
+
+    def __init__(self, rules):
+        self._prefixes = set()
+        # Compiled globs by one of their literal path segments
+        self._segmentGlobs = {}
+        patterns = []
+        for rule in rules:
+            if rule.startswith(PathMatcher.REGEX_PREFIX):
+                patterns.append(rule[len(PathMatcher.REGEX_PREFIX):])
+            elif any(character in rule for character in PathMatcher.GLOB_CHARACTERS):
+                # A glob that only ends with a star is a prefix
+                if rule.endswith('*') and not any(character in rule[:-1] for character in PathMatcher.GLOB_CHARACTERS):
+                    self._prefixes.add(rule[:-1])
+                else:
+                    segment = PathMatcher._getLiteralSegment(rule)
+                    if segment:
+                        self._segmentGlobs.setdefault(segment, []).append(re.compile(fnmatch.translate(rule)))
+                    else:
+                        patterns.append(fnmatch.translate(rule))
+            else:
+                self._prefixes.add(rule)
+        # Distinct prefix lengths, the only path prefixes that need a look-up
+        self._prefixLengths = sorted(set(len(prefix) for prefix in self._prefixes))
+        self._pattern = re.compile('|'.join('(?:' + pattern + ')' for pattern in patterns)) if patterns else None
+
+    def __bool__(self):
+        return bool(self._prefixes) or bool(self._segmentGlobs) or self._pattern is not None
+
+    def matches(self, path):
+        # Check the prefixes of the path with the length of a prefix rule
+        pathLength = len(path)
+        for prefixLength in self._prefixLengths:
+            if prefixLength > pathLength:
+                break
+            if path[:prefixLength] in self._prefixes:
+                return True
+        # Check the globs indexed by the segments of the path
+        if self._segmentGlobs:
+            for segment in path.split('/'):
+                for glob in self._segmentGlobs.get(segment, ()):
+                    if glob.match(path):
+                        return True
+        # Check the remaining globs and regexes
+        return self._pattern is not None and self._pattern.match(path) is not None
+
+    @staticmethod
+    def _getLiteralSegment(glob):
+        # Return the longest path segment of the glob without wildcards, or None
+        segments = [segment for segment in glob.split('/') if segment and not any(character in segment for character in PathMatcher.GLOB_CHARACTERS)]
+        return max(segments, key = len) if segments else None
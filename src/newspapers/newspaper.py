@@ -1,16 +1,80 @@
 # Imports
+import threading, time
 import requests
 from urllib.parse import urlparse
-from bs4 import BeautifulSoup
+from urllib.robotparser import RobotFileParser
 from abc import ABC, abstractmethod
+from .transport import Transport
+from .canonical import URLCanonicalizer
+from .matcher import PathMatcher
+from .text import TextExtractor
+from . import parser
 
 # Newspaper class definition
 class Newspaper(ABC):
-    
+    # Transport shared by all newspapers, created on first use
+    _transport = None
+    _transportLock = threading.Lock()
+    # Seconds a cached page may be used without asking the server, index pages are checked more often
+    CACHE_TTL = {
+        'index': 5 * 60,
+        'article': 24 * 60 * 60
+    }
+    # Content types of pages that are parsed, other pages are dropped when their headers arrive, and the
+    # largest page body in bytes that is downloaded
+    PAGE_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+    MAX_PAGE_BYTES = 5 * 1024 * 1024
+    # Parser backend, None picks the fastest installed of 'selectolax', 'lxml' and 'html.parser'
+    PARSER_BACKEND = None
+    # Classes of the title and content elements, used by extractPage
+    TITLE_CLASS = None
+    CONTENT_CLASS = None
+    # Query parameters removed from article URLs, as names or glob patterns
+    STRIP_QUERY_PARAMS = [
+        'utm_*',
+        'fbclid',
+        'gclid',
+        'mc_cid',
+        'mc_eid',
+        '_ga'
+    ]
+    STRIP_TRAILING_SLASH = True
+    # Canonicalizer of each newspaper class, created on first use
+    _canonicalizers = {}
+    # Paths of the newspaper to avoid when crawling, and if set the only paths to crawl. The rules are
+    # prefixes, globs or 're:' regexes, see PathMatcher
+    EXCLUDE_SUBPATHS = []
+    INCLUDE_SUBPATHS = None
+    # Exclude and include matchers of each newspaper class, compiled on first use
+    _pathMatchers = {}
+    # Boilerplate content pieces to leave out, as phrases or 're:' regexes, and the normalization of the text,
+    # see TextExtractor
+    CONTENT_SKIP_RULES = []
+    NORMALIZE_WHITESPACE = False
+    UNICODE_FORM = None
+    # Text extractor of each newspaper class, created on first use
+    _textExtractors = {}
+    # Seconds a downloaded robots.txt is used, and the robots.txt of each newspaper class, read on first use
+    ROBOTS_TTL = 24 * 60 * 60
+    _robots = {}
+    _robotsLock = threading.Lock()
+    # Sitemaps, sitemap indexes and RSS or Atom feeds listing the articles, and whether to also read the
+    # sitemaps listed in the robots.txt. Newspapers found through these can set FOLLOW_LINKS to False, so
+    # the links of the downloaded pages are not queued and index pages are never downloaded
+    SITEMAP_URLS = []
+    FEED_URLS = []
+    ROBOTS_SITEMAPS = False
+    FOLLOW_LINKS = True
+    # Added to the link depth when scheduling a page, pages with the lowest score are downloaded first
+    URL_CLASS_PRIORITY = {
+        'index': -1,
+        'article': 0
+    }
+
     class URLDoesNotMatchNewspaper(Exception):
         pass
 
-    def __init__(self, newspaperName, newspaperUrl, exclude_subpaths, articleUrl):
+    def __init__(self, newspaperName, newspaperUrl, exclude_subpaths, articleUrl, articleHtml = None):
         # Store the variables
         self._newspaperName = newspaperName
         self._newspaperUrl = newspaperUrl
@@ -19,8 +83,67 @@ class Newspaper(ABC):
         # Validate that the URL is from the respective newspaper
         if self.getNetloc() not in self._articleUrl:
             raise Newspaper.URLDoesNotMatchNewspaper()
-        # Parse the HTML soup
-        self._articleSoup = Newspaper._getPageSoup(self._articleUrl)
+        # Download the HTML unless it was already fetched, it is only parsed when needed
+        self._articleHtml = articleHtml if articleHtml is not None else self.getPageHtml(self._articleUrl)
+        self._soup = None
+        self._extraction = None
+        # Seconds spent in each parse step and extractor, see measure
+        self._timings = {}
+        self._nestedSeconds = 0.0
+
+    @property
+    def _articleSoup(self):
+        # Parse the HTML soup on first use
+        if self._soup is None:
+            self._soup = self.measure('soup', lambda: parser.makeSoup(self._articleHtml, self.PARSER_BACKEND))
+        return self._soup
+
+    def extractPage(self):
+        # Extract the title, content paragraphs and links in a single pass, without building a soup
+        if self._extraction is None:
+            self._extraction = self.measure('extract', lambda: parser.extractPage(self._articleHtml, self.TITLE_CLASS, self.CONTENT_CLASS, self.PARSER_BACKEND))
+        return self._extraction
+
+    def release(self):
+        # Free the HTML and the parse tree once the page has been extracted, after which it can not be extracted
+        # again. A soup tree is full of reference cycles between its elements, so it is decomposed instead of
+        # waiting for the cycle collector to find it. The soup object does not link to its first element, so
+        # decomposing it alone would leave the tree, its children are decomposed first
+        if self._soup is not None:
+            for element in list(self._soup.contents):
+                element.decompose()
+            self._soup.decompose()
+        self._soup = None
+        self._extraction = None
+        self._articleHtml = None
+
+    def setExtraction(self, extraction):
+        # Use an extraction made while the page was downloaded, see makeExtractor
+        self._extraction = extraction
+
+    def extractText(self, pieces):
+        # Join the text of the content pieces, strings or soup elements, leaving out the boilerplate. Returns
+        # None if pieces is None
+        extractor = Newspaper._textExtractors.get(type(self))
+        if extractor is None:
+            extractor = TextExtractor(self.CONTENT_SKIP_RULES, self.NORMALIZE_WHITESPACE, self.UNICODE_FORM)
+            Newspaper._textExtractors[type(self)] = extractor
+        return extractor.extract(pieces)
+
+    def measure(self, name, function):
+        # Call the function and add its run time to the timing of the name. Time spent in measured calls
+        # inside it, like the parse on first use, is only counted for the inner name
+        nestedBefore = self._nestedSeconds
+        start = time.perf_counter()
+        try:
+            return function()
+        finally:
+            elapsed = time.perf_counter() - start
+            self._timings[name] = self._timings.get(name, 0.0) + elapsed - (self._nestedSeconds - nestedBefore)
+            self._nestedSeconds = nestedBefore + elapsed
+
+    def getTimings(self):
+        return self._timings
 
     def getNewspaperName(self):
         return self._newspaperName
@@ -49,14 +172,14 @@ class Newspaper(ABC):
 
     def getArticleEntry(self):
         # Get the article title and content
-        title = self.getTitle()
-        content = self.getContent()
+        title = self.measure('title', self.getTitle)
+        content = self.measure('content', self.getContent)
         # Return the articleEntry or null if the title or content is None
         if title and content:
             return {
                 'newspaper': self.getNewspaperName(),
                 'url': self.getArticleUrl(),
-                'metainfo': self.getMetaInfo(),
+                'metainfo': self.measure('metainfo', self.getMetaInfo),
                 'title': title,
                 'content': content
             }
@@ -80,13 +203,117 @@ class Newspaper(ABC):
             return None
 
     @staticmethod
-    def _getPageSoup(articleUrl):
-        # Download the webpage
-        req = requests.get(articleUrl)
-        # Get the HTML
-        html = req.content
-        # Parse the HTML soup
-        return BeautifulSoup(html, 'html.parser')
+    def getTransport():
+        # Create the shared transport on first use
+        with Newspaper._transportLock:
+            if Newspaper._transport is None:
+                Newspaper._transport = Transport()
+            return Newspaper._transport
+
+    @staticmethod
+    def setTransport(transport):
+        # Replace the shared transport, e.g. with one configured for a local test server
+        Newspaper._transport = transport
+
+    @classmethod
+    def getUrlClass(_class, url):
+        # Pages less than two levels deep, like the front page or '/samfund/', are index pages
+        if urlparse(url).path.rstrip('/').count('/') < 2:
+            return 'index'
+        return 'article'
+
+    @classmethod
+    def scoreUrl(_class, url, depth):
+        # Score of a queued page, used by the priority frontier. Depth is the number of links from the front page
+        return depth + _class.URL_CLASS_PRIORITY[_class.getUrlClass(url)]
+
+    @classmethod
+    def getPage(_class, articleUrl, onChunk = None, revalidate = False):
+        # Download the webpage, a cached copy may be used for the time to live of the page class, or with
+        # revalidate only if the server tells it is unchanged. Pages of other content types or larger than
+        # MAX_PAGE_BYTES raise a RequestException, and onChunk is called with each piece of the body as it arrives
+        return Newspaper.getTransport().get(
+            articleUrl,
+            0 if revalidate else _class.CACHE_TTL[_class.getUrlClass(articleUrl)],
+            _class.PAGE_CONTENT_TYPES,
+            _class.MAX_PAGE_BYTES,
+            onChunk
+        )
+
+    @classmethod
+    def makeExtractor(_class):
+        # Return an IncrementalExtractor to feed the page to while it downloads, or None if the newspaper does
+        # not use extractPage or the parser backend cannot parse incrementally
+        if _class.TITLE_CLASS and _class.CONTENT_CLASS and parser.canExtractIncrementally(_class.PARSER_BACKEND):
+            return parser.IncrementalExtractor(_class.TITLE_CLASS, _class.CONTENT_CLASS)
+        return None
+
+    @classmethod
+    def getPageHtml(_class, articleUrl):
+        # Return the HTML
+        return _class.getPage(articleUrl).content
+
+    @classmethod
+    def getCrawlDelay(_class):
+        # Return the Crawl-delay in seconds of the robots.txt of the newspaper, or None
+        robots = _class._getRobots()
+        crawlDelay = robots.crawl_delay('*') if robots else None
+        return float(crawlDelay) if crawlDelay is not None else None
+
+    @classmethod
+    def getDiscoveryUrls(_class):
+        # Return the sitemaps and feeds to find the articles of the newspaper in
+        urls = list(_class.SITEMAP_URLS) + list(_class.FEED_URLS)
+        robots = _class._getRobots() if _class.ROBOTS_SITEMAPS else None
+        if robots and robots.site_maps():
+            urls.extend(url for url in robots.site_maps() if url not in urls)
+        return urls
+
+    @classmethod
+    def _getRobots(_class):
+        # The robots.txt is downloaded once per newspaper class, None if the newspaper has none
+        with Newspaper._robotsLock:
+            if _class not in Newspaper._robots:
+                Newspaper._robots[_class] = _class._readRobots()
+            return Newspaper._robots[_class]
+
+    @classmethod
+    def _readRobots(_class):
+        try:
+            response = Newspaper.getTransport().get(_class.NEWSPAPER_URL.rstrip('/') + '/robots.txt', _class.ROBOTS_TTL)
+        except requests.RequestException:
+            return None
+        if response.status_code != 200:
+            return None
+        robots = RobotFileParser()
+        robots.parse(response.text.splitlines())
+        return robots
+
+    @classmethod
+    def isExcludedPath(_class, path):
+        # Compile the rules of the newspaper class once
+        matchers = Newspaper._pathMatchers.get(_class)
+        if matchers is None:
+            matchers = (PathMatcher(_class.EXCLUDE_SUBPATHS), PathMatcher(_class.INCLUDE_SUBPATHS or []))
+            Newspaper._pathMatchers[_class] = matchers
+        excludeMatcher, includeMatcher = matchers
+        # With include rules, paths not matching any of them are excluded
+        if includeMatcher and not includeMatcher.matches(path):
+            return True
+        return excludeMatcher.matches(path)
+
+    @classmethod
+    def canonicalizeUrl(_class, url):
+        # Rewrite the URL to its canonical form, using the scheme of the newspaper URL
+        canonicalizer = Newspaper._canonicalizers.get(_class)
+        if canonicalizer is None:
+            canonicalizer = URLCanonicalizer(
+                _class.STRIP_QUERY_PARAMS,
+                urlparse(_class.NEWSPAPER_URL).scheme,
+                _class.STRIP_TRAILING_SLASH
+            )
+            Newspaper._canonicalizers[_class] = canonicalizer
+        return canonicalizer.canonicalize(url)
 
     @classmethod
     def getNetloc(_class):
@@ -0,0 +1,245 @@
+# Imports
+import time
+from html.parser import HTMLParser
+from bs4 import BeautifulSoup
+from bs4.dammit import EncodingDetector, UnicodeDammit
+
+# Optional parser backends, used when installed
+try:
+    import lxml.etree
+except ImportError:
+    lxml = None
+try:
+    from selectolax.lexbor import LexborHTMLParser as SelectolaxParser
+except ImportError:
+    try:
+        # Versions before 1.0 only have the Modest engine
+        from selectolax.parser import HTMLParser as SelectolaxParser
+    except ImportError:
+        SelectolaxParser = None
+
+# Backends in order of preference
+BACKENDS = ['selectolax', 'lxml', 'html.parser']
+
+def getAvailableBackends():
+    available = []
+    if SelectolaxParser is not None:
+        available.append('selectolax')
+    if lxml is not None:
+        available.append('lxml')
+    available.append('html.parser')
+    return available
+
+def getBackend(backend = None):
+    # Return the backend if it is available, else the fastest available backend
+    available = getAvailableBackends()
+    if backend in available:
+        return backend
+    return available[0]
+
+def makeSoup(html, backend = None):
+    # Build a BeautifulSoup tree, with lxml as the tree builder if it is available
+    useLxml = lxml is not None and getBackend(backend) != 'html.parser'
+    return BeautifulSoup(html, 'lxml' if useLxml else 'html.parser')
+
+# PageExtraction class definition
+# The parts of a page the newspapers need: the title text, the paragraph texts of the article content and the
+# href of every link. title is None if no title element was found, paragraphs is None if no content element
+# was found. The slots keep an extraction small while the page is in flight.
+class PageExtraction:
+    __slots__ = ('title', 'paragraphs', 'links')
+
+    def __init__(self, title, paragraphs, links):
+        self.title = title
+        self.paragraphs = paragraphs
+        self.links = links
+
+def extractPage(html, titleClass, contentClass, backend = None):
+    # Extract the title, content paragraphs and links in a single pass over the page
+    backend = getBackend(backend)
+    if backend == 'selectolax':
+        return _extractWithSelectolax(html, titleClass, contentClass)
+    target = _ExtractionTarget(titleClass, contentClass)
+    if backend == 'lxml':
+        # lxml calls the target for each element, without building a tree
+        parser = _makeLxmlParser(target, html)
+        parser.feed(html)
+        return parser.close()
+    # Fall back to the pure Python parser, which needs text
+    if isinstance(html, bytes):
+        html = UnicodeDammit(html, is_html = True).unicode_markup
+    parser = _StreamingParser(target)
+    parser.feed(html)
+    parser.close()
+    return target.close()
+
+def canExtractIncrementally(backend = None):
+    # lxml is the only backend that parses a page as it arrives, so pages are only parsed while they download
+    # when lxml is the backend. selectolax parses a whole page faster than lxml parses it in pieces
+    return getBackend(backend) == 'lxml'
+
+# IncrementalExtractor class definition
+# Extracts the title, content paragraphs and links of a page from the pieces of its body, fed as they are
+# downloaded. The page is decoded with the charset declared in its first piece, or UTF-8. Gives the same
+# PageExtraction as extractPage, without waiting for the whole page.
+class IncrementalExtractor:
+    def __init__(self, titleClass, contentClass):
+        self._target = _ExtractionTarget(titleClass, contentClass)
+        # Created with the encoding of the page when the first piece arrives
+        self._parser = None
+        # Seconds spent parsing, apart from the time waiting for the pieces
+        self._seconds = 0.0
+
+    def feed(self, chunk):
+        start = time.perf_counter()
+        if self._parser is None:
+            self._parser = _makeLxmlParser(self._target, chunk)
+        self._parser.feed(chunk)
+        self._seconds += time.perf_counter() - start
+
+    def close(self):
+        start = time.perf_counter()
+        try:
+            extraction = self._parser.close() if self._parser is not None else self._target.close()
+        except lxml.etree.XMLSyntaxError:
+            # Nothing lxml could read, like an empty page
+            extraction = self._target.close()
+        self._seconds += time.perf_counter() - start
+        return extraction
+
+    def getSeconds(self):
+        return self._seconds
+
+def _makeLxmlParser(target, html):
+    # lxml reads undeclared pages as Latin-1, so bytes are decoded with the charset declared at the start of the
+    # page, or UTF-8
+    if not isinstance(html, bytes):
+        return lxml.etree.HTMLParser(target = target)
+    try:
+        return lxml.etree.HTMLParser(target = target, encoding = _getDeclaredEncoding(html))
+    except LookupError:
+        # A charset lxml does not know
+        return lxml.etree.HTMLParser(target = target, encoding = 'utf-8')
+
+def _getDeclaredEncoding(html):
+    # The charset declared at the start of the page, or UTF-8
+    return EncodingDetector.find_declared_encoding(html, is_html = True) or 'utf-8'
+
+def _extractWithSelectolax(html, titleClass, contentClass):
+    # Lexbor reads bytes as UTF-8, so they are decoded with the charset declared by the page, like for lxml
+    if isinstance(html, bytes):
+        try:
+            html = html.decode(_getDeclaredEncoding(html), errors = 'replace')
+        except LookupError:
+            # A charset Python does not know
+            html = html.decode('utf-8', errors = 'replace')
+    tree = SelectolaxParser(html)
+    titleNode = tree.css_first('.' + titleClass)
+    contentNode = tree.css_first('.' + contentClass)
+    return PageExtraction(
+        titleNode.text() if titleNode is not None else None,
+        [paragraph.text() for paragraph in contentNode.css('p')] if contentNode is not None else None,
+        [node.attributes['href'] for node in tree.css('a[href]')]
+    )
+
+# _ExtractionTarget class definition
+# Receives start, end and data events for the elements of a page, and collects the parts of a PageExtraction.
+# The title and content elements are followed by counting nested elements with the same tag, so unclosed and
+# void elements elsewhere on the page do not matter.
+class _ExtractionTarget:
+    def __init__(self, titleClass, contentClass):
+        self._titleClass = titleClass
+        self._contentClass = contentClass
+        # Collected parts
+        self._title = None
+        self._paragraphs = None
+        self._links = []
+        # Tag and nesting depth of the open title and content elements
+        self._titleTag = None
+        self._titleDepth = 0
+        self._contentTag = None
+        self._contentDepth = 0
+        # Text pieces of the open title and paragraph
+        self._titleText = None
+        self._paragraphText = None
+
+    def start(self, tag, attrib):
+        # Collect the link
+        if tag == 'a':
+            href = attrib.get('href')
+            if href is not None:
+                self._links.append(href)
+        # Follow the nesting of the open title and content elements
+        if self._titleDepth and tag == self._titleTag:
+            self._titleDepth += 1
+        if self._contentDepth:
+            if tag == self._contentTag:
+                self._contentDepth += 1
+            if tag == 'p':
+                # A new paragraph implicitly closes the previous one
+                self._endParagraph()
+                self._paragraphText = []
+        # Open the first title and content elements
+        classes = attrib.get('class')
+        if classes:
+            classes = classes.split()
+            if self._title is None and self._titleDepth == 0 and self._titleClass in classes:
+                self._titleTag = tag
+                self._titleDepth = 1
+                self._titleText = []
+            if self._paragraphs is None and self._contentDepth == 0 and self._contentClass in classes:
+                self._contentTag = tag
+                self._contentDepth = 1
+                self._paragraphs = []
+
+    def end(self, tag):
+        if self._titleDepth and tag == self._titleTag:
+            self._titleDepth -= 1
+            if self._titleDepth == 0:
+                self._title = ''.join(self._titleText)
+                self._titleText = None
+        if self._contentDepth:
+            if tag == 'p':
+                self._endParagraph()
+            if tag == self._contentTag:
+                self._contentDepth -= 1
+                if self._contentDepth == 0:
+                    self._endParagraph()
+
+    def data(self, data):
+        if self._titleText is not None:
+            self._titleText.append(data)
+        if self._paragraphText is not None:
+            self._paragraphText.append(data)
+
+    def close(self):
+        # Close elements left open at the end of the page
+        if self._titleText is not None:
+            self._title = ''.join(self._titleText)
+        self._endParagraph()
+        return PageExtraction(self._title, self._paragraphs, self._links)
+
+    def _endParagraph(self):
+        if self._paragraphText is not None:
+            self._paragraphs.append(''.join(self._paragraphText))
+            self._paragraphText = None
+
+# _StreamingParser class definition
+# Forwards the events of the standard library parser to an extraction target.
+class _StreamingParser(HTMLParser):
+    def __init__(self, target):
+        super().__init__(convert_charrefs = True)
+        self._target = target
+
+    def handle_starttag(self, tag, attrs):
+        self._target.start(tag, dict(attrs))
+
+    def handle_startendtag(self, tag, attrs):
+        self._target.start(tag, dict(attrs))
+        self._target.end(tag)
+
+    def handle_endtag(self, tag):
+        self._target.end(tag)
+
+    def handle_data(self, data):
+        self._target.data(data)
@@ -0,0 +1,44 @@
+# Imports
+import re, unicodedata
+
+# TextExtractor class definition
+# Joins the text pieces of an article, like its content paragraphs, into one text. Pieces matching one of the
+# skip rules are left out; a rule is either a phrase, like 'Foto: ', matching pieces containing it, or a regex
+# prefixed with 're:', searched in the piece. Phrases are checked with the in operator, which is several times
+# faster than a regex search, and the regexes are combined into a single regex. Pieces may be strings
+# or BeautifulSoup elements, whose text is computed once. The text can be normalized by collapsing whitespace
+# and by a Unicode normalization form like 'NFC'.
+class TextExtractor:
+    REGEX_PREFIX = 're:'
+
+    def __init__(self, skipRules = (), normalizeWhitespace = False, unicodeForm = None, separator = ' '):
+        self._skipPhrases = tuple(rule for rule in skipRules if not rule.startswith(TextExtractor.REGEX_PREFIX))
+        patterns = [rule[len(TextExtractor.REGEX_PREFIX):] for rule in skipRules if rule.startswith(TextExtractor.REGEX_PREFIX)]
+        self._skipPattern = re.compile('|'.join(patterns)) if patterns else None
+        self._normalizeWhitespace = normalizeWhitespace
+        self._unicodeForm = unicodeForm
+        self._separator = separator
+
+    def extract(self, pieces):
+        # Return the joined text of the pieces, or None if pieces is None
+        if pieces is None:
+            return None
+        texts = []
+        for piece in pieces:
+            # Compute the text of an element once
+            text = piece if isinstance(piece, str) else piece.get_text()
+            if self._isSkipped(text):
+                continue
+            text = ' '.join(text.split()) if self._normalizeWhitespace else text.strip()
+            if text:
+                texts.append(text)
+        text = self._separator.join(texts)
+        if self._unicodeForm:
+            text = unicodedata.normalize(self._unicodeForm, text)
+        return text
+
+    def _isSkipped(self, text):
+        for phrase in self._skipPhrases:
+            if phrase in text:
+                return True
+        return self._skipPattern is not None and self._skipPattern.search(text) is not None
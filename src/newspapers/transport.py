@@ -0,0 +1,195 @@
+# Imports
+import threading, time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry, make_headers
+
+# Transport class definition
+# Shared HTTP transport for all newspapers. A single session pools the connections to each host, retries
+# server errors and connection errors with backoff, and accepts compressed responses. Bodies are streamed, so
+# a response of an unwanted content type or beyond the size limit is dropped before its body is downloaded.
+# A 429 or 503 answer asks to slow down, so it is not retried here but returned to the crawler, whose rate
+# limiter backs off and whose retry queue waits for the Retry-After time.
+class Transport:
+    TIMEOUT = (5, 30) # Connect and read timeout in seconds
+    RETRIES = 3 # Number of retries on server and connection errors
+    BACKOFF_FACTOR = 0.5 # Retries wait 0.5, 1, 2, ... seconds
+    RETRY_STATUSES = (500, 502, 504)
+    POOL_CONNECTIONS = 10 # Number of hosts to keep a connection pool for
+    POOL_MAXSIZE = 10 # Number of connections to keep open to each host
+    CHUNK_SIZE = 64 * 1024 # Bytes of the body read at a time
+
+    # Raised when the Content-Type of a response is not one of the accepted types
+    class ContentTypeNotAccepted(requests.RequestException):
+        pass
+
+    # Raised when the body of a response is larger than the size limit
+    class ResponseTooLarge(requests.RequestException):
+        pass
+
+    def __init__(self, timeout = TIMEOUT, retries = RETRIES, backoffFactor = BACKOFF_FACTOR, poolConnections = POOL_CONNECTIONS, poolMaxsize = POOL_MAXSIZE, cache = None):
+        self._timeout = timeout
+        # Optional ResponseCache, used for conditional GETs
+        self._cache = cache
+        # Retry policy for server errors and connection errors
+        retry = Retry(
+            total = retries,
+            backoff_factor = backoffFactor,
+            status_forcelist = self.RETRY_STATUSES,
+            allowed_methods = ['GET'],
+            raise_on_status = False,
+            # Never sleep a Retry-After while the caller holds a download slot of the host
+            respect_retry_after_header = False
+        )
+        # Create the session with a pooled adapter for both schemes
+        self._adapter = HTTPAdapter(pool_connections = poolConnections, pool_maxsize = poolMaxsize, max_retries = retry)
+        self._session = requests.Session()
+        self._session.mount('http://', self._adapter)
+        self._session.mount('https://', self._adapter)
+        # Ask for every compression the installed urllib3 can decode (gzip, deflate and br if brotli is installed)
+        self._session.headers.update(make_headers(accept_encoding = True))
+        # Connection pools seen so far, and the byte counters
+        self._pools = {}
+        self._bytesReceived = 0
+        self._bytesDecoded = 0
+        # Seconds until the response headers arrived (DNS, connect and server time), and reading the body
+        self._responseSeconds = 0.0
+        self._transferSeconds = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, url, maxAge = None, contentTypes = None, maxBytes = None, onChunk = None):
+        # Download the page. With contentTypes the page must have one of the types (or no Content-Type), with
+        # maxBytes its body must not be larger, and onChunk is called with each piece of the body as it arrives
+        limits = (contentTypes, maxBytes, onChunk)
+        # Without a cache, just download the page
+        if self._cache is None:
+            return self._download(url, None, *limits)
+        # Serve the cached page without a request while it is younger than maxAge seconds
+        entry = self._cache.lookup(url)
+        if entry is not None and maxAge is not None and entry.getAge() < maxAge:
+            body = self._cache.readBody(entry)
+            if body is not None:
+                response = Transport._makeCachedResponse(url, entry, body, *limits)
+                # No request was made for the page
+                response.fromCache = True
+                return response
+            entry = None
+        # Download the page, asking the server to only send it if it changed
+        response = self._download(url, self._cache.getValidators(entry), *limits)
+        if response.status_code == 304 and entry is not None:
+            # Unchanged, serve the cached page
+            body = self._cache.readBody(entry, revalidated = True)
+            if body is not None:
+                self._cache.refresh(entry)
+                return Transport._makeCachedResponse(url, entry, body, *limits)
+            # The cached body is gone, download the page again
+            response = self._download(url, None, *limits)
+        if response.status_code == 200:
+            self._cache.store(url, response.headers, response.content)
+        return response
+
+    def getCache(self):
+        return self._cache
+
+    def getMetrics(self):
+        with self._lock:
+            # Requests and new connections made by all connection pools
+            requestCount = sum(pool.num_requests for pool in self._pools.values())
+            connections = sum(pool.num_connections for pool in self._pools.values())
+            return {
+                'requests': requestCount,
+                'connections': connections,
+                'connectionReuseRate': 1 - connections / requestCount if requestCount else 0.0,
+                'bytesReceived': self._bytesReceived,
+                'bytesDecoded': self._bytesDecoded,
+                'bytesSavedByCompression': self._bytesDecoded - self._bytesReceived,
+                'responseSeconds': self._responseSeconds,
+                'transferSeconds': self._transferSeconds
+            }
+
+    def close(self):
+        self._session.close()
+
+    def _download(self, url, headers = None, contentTypes = None, maxBytes = None, onChunk = None):
+        # Download the headers of the page, the body is read below
+        start = time.perf_counter()
+        response = self._session.get(url, headers = headers, timeout = self._timeout, stream = True)
+        content = b''
+        try:
+            if response.status_code >= 400:
+                # The body of an error is not used, a short one is read to keep the connection open
+                contentLength = Transport._getContentLength(response)
+                if contentLength is not None and contentLength <= Transport.CHUNK_SIZE:
+                    content = response.content
+            else:
+                # A page that will be rejected is dropped before its body is downloaded
+                if 200 <= response.status_code < 300:
+                    Transport._checkHeaders(response, contentTypes, maxBytes)
+                content = Transport._readBody(response, maxBytes, onChunk)
+        finally:
+            # Count the bytes on the wire and after decompression, also of a rejected page
+            self._count(response, content, time.perf_counter() - start)
+            response.close()
+        response._content = content
+        return response
+
+    @staticmethod
+    def _getContentLength(response):
+        # The Content-Length of the response, or None if it is not known
+        contentLength = response.headers.get('Content-Length', '')
+        return int(contentLength) if contentLength.isdigit() else None
+
+    @staticmethod
+    def _checkHeaders(response, contentTypes, maxBytes):
+        # Reject the page by its headers, before the body is downloaded
+        contentType = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if contentTypes and contentType and contentType not in contentTypes:
+            raise Transport.ContentTypeNotAccepted('Content-Type ' + contentType + ' not accepted', response = response)
+        contentLength = Transport._getContentLength(response)
+        if maxBytes is not None and contentLength is not None and contentLength > maxBytes:
+            raise Transport.ResponseTooLarge('Content-Length above ' + str(maxBytes) + ' bytes', response = response)
+
+    @staticmethod
+    def _readBody(response, maxBytes, onChunk):
+        # Read the decompressed body in chunks, stopping as soon as it grows beyond maxBytes
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(Transport.CHUNK_SIZE):
+            size += len(chunk)
+            if maxBytes is not None and size > maxBytes:
+                raise Transport.ResponseTooLarge('Body above ' + str(maxBytes) + ' bytes', response = response)
+            chunks.append(chunk)
+            if onChunk is not None:
+                onChunk(chunk)
+        return b''.join(chunks)
+
+    @staticmethod
+    def _makeCachedResponse(url, entry, body, contentTypes = None, maxBytes = None, onChunk = None):
+        # Build a response holding the cached page, checked like a downloaded page
+        response = requests.Response()
+        response.url = url
+        response.status_code = 200
+        response._content = body
+        if entry.contentType:
+            response.headers['Content-Type'] = entry.contentType
+        Transport._checkHeaders(response, contentTypes, None)
+        if maxBytes is not None and len(body) > maxBytes:
+            raise Transport.ResponseTooLarge('Body above ' + str(maxBytes) + ' bytes', response = response)
+        if onChunk is not None:
+            onChunk(body)
+        return response
+
+    def _count(self, response, content, seconds):
+        # Bytes pulled over the wire, before decompression
+        received = response.raw.tell() if response.raw else len(content)
+        # The elapsed time of the response ends when the headers are parsed
+        responseSeconds = min(response.elapsed.total_seconds(), seconds)
+        with self._lock:
+            # Keep track of the pool that served the response, it counts requests and connections
+            pool = getattr(response.raw, '_pool', None)
+            if pool is not None:
+                self._pools[id(pool)] = pool
+            self._bytesReceived += received
+            self._bytesDecoded += len(content)
+            self._responseSeconds += responseSeconds
+            self._transferSeconds += seconds - responseSeconds